@@ -4,7 +4,3 @@ from django.apps import AppConfig
 class AttendanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'attendance'
-
-    def ready(self):
-        from .tasks import start_scheduler
-        start_scheduler()
\ No newline at end of file
@@ -0,0 +1,74 @@
+# attendance/management/commands/benchmark_attendance.py
+import os
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import compare, load_baseline, run_benchmarks, save_baseline
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'attendance_baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure wall time, query count and peak memory of the attendance report and "
+        "dashboard computations and compare them with a saved baseline. Exits with an "
+        "error when a metric regressed, so it can gate a deployment."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Jalali year (default: current)')
+        parser.add_argument('--month', type=int, help='Jalali month (default: current)')
+        parser.add_argument('--date', help='Gregorian day of the daily benchmarks, YYYY-MM-DD (default: today)')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case (default: %(default)s)')
+        parser.add_argument(
+            '--only', action='append', metavar='NAME', help='Only run this case (may be repeated)',
+        )
+        parser.add_argument(
+            '--baseline', default=DEFAULT_BASELINE, help='Baseline JSON file (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true', help='Write the results as the new baseline',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Allowed growth of wall time and peak memory, as a fraction (default: %(default)s)',
+        )
+
+    def handle(self, *args, **opts):
+        year, month = opts['year'], opts['month']
+        if (year is None) != (month is None):
+            raise CommandError("--year and --month go together.")
+        att_date = None
+        if opts['date']:
+            try:
+                att_date = date.fromisoformat(opts['date'])
+            except ValueError:
+                raise CommandError(f"Invalid --date {opts['date']!r}.")
+
+        results = run_benchmarks(year, month, att_date, repeat=max(opts['repeat'], 1), only=opts['only'])
+        baseline = load_baseline(opts['baseline'])
+
+        width = max(len(name) for name in results) if results else 10
+        self.stdout.write(f"{'case':<{width}}  {'wall s':>8}  {'median s':>8}  {'queries':>7}  {'peak KiB':>9}  baseline")
+        for name, m in results.items():
+            base = baseline.get(name)
+            ref = f"{base['wall']:.4f}s / {base['queries']}q / {base['peak_kb']} KiB" if base else "—"
+            self.stdout.write(
+                f"{name:<{width}}  {m['wall']:>8.4f}  {m['wall_median']:>8.4f}  {m['queries']:>7}  {m['peak_kb']:>9}  {ref}"
+            )
+
+        if opts['save_baseline']:
+            os.makedirs(os.path.dirname(opts['baseline']) or '.', exist_ok=True)
+            save_baseline(opts['baseline'], {**baseline, **results})
+            self.stdout.write(self.style.SUCCESS(f"✅ Baseline saved to {opts['baseline']}"))
+            return
+
+        regressions = compare(results, baseline, tolerance=opts['tolerance'])
+        for name, metric, was, now in regressions:
+            self.stderr.write(f"❌ {name}: {metric} {was} → {now}")
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmark regression(s) against {opts['baseline']}.")
+        if baseline:
+            self.stdout.write(self.style.SUCCESS("✅ No regressions against the baseline."))
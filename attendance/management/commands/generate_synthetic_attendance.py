@@ -0,0 +1,56 @@
+# attendance/management/commands/generate_synthetic_attendance.py
+from django.core.management.base import BaseCommand
+
+from core.synthetic import clear_workload, generate_workload
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a synthetic organisation for benchmarks and load tests: departments, "
+        "employees, shifts with 12×7 schedules (including overnight shifts), vacations, "
+        "public holidays and months of realistic punches ending today."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=10, help='Departments (default: %(default)s)')
+        parser.add_argument('--employees', type=int, default=500, help='Employees (default: %(default)s)')
+        parser.add_argument(
+            '--shifts', type=int, default=4,
+            help='Shifts; every fourth one is overnight (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--months', type=int, default=3,
+            help='Jalali months of punches, ending with the current one (default: %(default)s)',
+        )
+        parser.add_argument('--holidays', type=int, default=2, help='Public holidays (default: %(default)s)')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed (default: %(default)s)')
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Remove previously generated synthetic data first',
+        )
+        parser.add_argument(
+            '--clear-only', action='store_true',
+            help='Only remove previously generated synthetic data',
+        )
+
+    def handle(self, *args, **opts):
+        if opts['clear'] or opts['clear_only']:
+            removed = clear_workload()
+            self.stdout.write(self.style.WARNING(f"🗑️ Removed {removed} synthetic employees and their data."))
+            if opts['clear_only']:
+                return
+
+        counts = generate_workload(
+            departments=max(opts['departments'], 1),
+            employees=opts['employees'],
+            shifts=max(opts['shifts'], 1),
+            months=max(opts['months'], 1),
+            holidays=opts['holidays'],
+            seed=opts['seed'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Created {counts['departments']} departments, {counts['employees']} employees, "
+            f"{counts['shifts']} shifts ({counts['schedules']} schedules), {counts['vacations']} vacations, "
+            f"{counts['holidays']} holidays and {counts['logs']} punches."
+        ))
@@ -0,0 +1,61 @@
+# attendance/management/commands/manage_log_partitions.py
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from attendance.partitions import (
+    PARTITIONS_AHEAD, current_month, detach_partition, ensure_default_partition, ensure_partitions,
+    list_partitions, partitions_older_than, shift_month,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly AttendanceLog partitions and optionally detach "
+        "(archive) or drop old ones. Run daily from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead', type=int, default=PARTITIONS_AHEAD,
+            help='Jalali months to create in advance (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--detach-older-than', type=int, metavar='MONTHS',
+            help='Detach partitions that ended more than MONTHS months ago',
+        )
+        parser.add_argument(
+            '--drop', action='store_true',
+            help='Drop detached partitions instead of keeping them as archive tables',
+        )
+        parser.add_argument('--list', action='store_true', help='Only list attached partitions')
+
+    def handle(self, *args, **opts):
+        if connection.vendor != 'postgresql':
+            self.stderr.write("AttendanceLog partitioning requires PostgreSQL.")
+            return
+
+        with connection.cursor() as cursor:
+            if opts['list']:
+                for name in list_partitions(cursor):
+                    self.stdout.write(name)
+                return
+
+            # 1) Pre-create the current and upcoming months
+            this_month = current_month()
+            with transaction.atomic():
+                ensure_default_partition(cursor)
+                created = ensure_partitions(cursor, this_month, shift_month(*this_month, opts['ahead']))
+            for name in created:
+                self.stdout.write(self.style.SUCCESS(f"Created {name}"))
+
+            # 2) Detach (and optionally drop) old months
+            if opts['detach_older_than'] is not None:
+                cutoff = shift_month(*this_month, -opts['detach_older_than'])
+                for name in partitions_older_than(cursor, *cutoff):
+                    with transaction.atomic():
+                        detach_partition(cursor, name, drop=opts['drop'])
+                    action = "Dropped" if opts['drop'] else "Detached"
+                    self.stdout.write(self.style.WARNING(f"{action} {name}"))
+
+        if not created:
+            self.stdout.write("Partitions up to date.")
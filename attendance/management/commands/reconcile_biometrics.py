@@ -0,0 +1,45 @@
+# attendance/management/commands/reconcile_biometrics.py
+from django.core.management.base import BaseCommand
+
+from attendance.models import Device
+from core.biometric_reconcile import reconcile_device
+from core.device_sessions import acquire_session
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring the enabled attendance devices in line with the biometric records, "
+        "pushing only users whose card or fingerprint templates differ. Run nightly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--device', type=int, action='append', dest='devices', metavar='ID',
+            help='Only reconcile this device (may be repeated)',
+        )
+        parser.add_argument(
+            '--remove-archived', action='store_true',
+            help='Also remove the fingerprints and cards of archived employees from the devices',
+        )
+
+    def handle(self, *args, **opts):
+        devices = Device.objects.filter(status=Device.Status.ENABLED, device_type=Device.DeviceType.ATTENDANCE)
+        if opts['devices']:
+            devices = devices.filter(pk__in=opts['devices'])
+
+        for device in devices:
+            session = acquire_session(device)
+            if session is None:
+                self.stderr.write(f"❌ Device {device.name} offline—skipping.")
+                continue
+            try:
+                summary = reconcile_device(device, session, remove_archived=opts['remove_archived'])
+            except Exception as e:
+                self.stderr.write(f"❌ Failed to reconcile {device.name}: {e}")
+                continue
+
+            source = "device inventory" if summary['read'] else "ledger"
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {device.name} ({source}): {summary['users']} users / {summary['templates']} templates pushed, "
+                f"{summary['removed']} archived removed, {summary['failed']} failed"
+            ))
@@ -0,0 +1,101 @@
+# attendance/management/commands/run_device_simulator.py
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from attendance.models import Device
+from libraries.zksim.server import build_fleet, serve_fleet
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve simulated ZKTeco terminals on consecutive local ports for load and "
+        "sync testing, with generated users, fingerprint templates and punches and "
+        "injected latency, packet loss and offline devices. Stop with Ctrl+C."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1, help='Number of devices (default: %(default)s)')
+        parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: %(default)s)')
+        parser.add_argument(
+            '--base-port', type=int, default=14370,
+            help='Port of the first device; the others follow consecutively (default: %(default)s)',
+        )
+        parser.add_argument('--users', type=int, default=200, help='Users per device (default: %(default)s)')
+        parser.add_argument(
+            '--templates', type=int, default=2, help='Fingerprint templates per user (default: %(default)s)',
+        )
+        parser.add_argument('--logs', type=int, default=5000, help='Punches per device (default: %(default)s)')
+        parser.add_argument(
+            '--first-user-id', type=int, default=1,
+            help='Device user ID of the first user, e.g. the lowest employee ID (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--punch-rate', type=float, default=0,
+            help='New punches per minute added to every device while running (default: %(default)s)',
+        )
+        parser.add_argument('--com-key', type=int, default=0, help='Communication key (default: %(default)s)')
+        parser.add_argument(
+            '--latency', type=float, default=0, help='Milliseconds added to every reply (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--jitter', type=float, default=0, help='Random +/- milliseconds on the latency (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--loss', type=float, default=0,
+            help='Probability (0-1) that a request goes unanswered (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--offline', type=int, default=0, help='Devices (from the last one) that do not listen at all',
+        )
+        parser.add_argument(
+            '--silent', type=int, default=0, help='Devices (before the offline ones) that accept but never answer',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the generated data (default: %(default)s)')
+        parser.add_argument(
+            '--register', action='store_true',
+            help='Create or update a Device row (identifier SIMxxxxx) pointing at each simulated device',
+        )
+
+    def handle(self, *args, **opts):
+        servers = build_fleet(
+            opts['count'], host=opts['host'], base_port=opts['base_port'],
+            users=opts['users'], templates=opts['templates'], logs=opts['logs'],
+            first_user_id=opts['first_user_id'], com_key=opts['com_key'],
+            latency=opts['latency'] / 1000, jitter=opts['jitter'] / 1000, loss=opts['loss'],
+            offline=opts['offline'], silent=opts['silent'], seed=opts['seed'],
+        )
+
+        if opts['register']:
+            for server in servers:
+                Device.objects.update_or_create(
+                    identifier=server.device.serial,
+                    defaults={
+                        'name': f"Simulator {server.device.serial}",
+                        'ip_address': server.host,
+                        'port': server.port,
+                        'com_key': opts['com_key'],
+                        'device_type': Device.DeviceType.ATTENDANCE,
+                        'status': Device.Status.ENABLED,
+                        'description': 'Simulated device (run_device_simulator)',
+                    },
+                )
+            self.stdout.write(self.style.SUCCESS(f"✅ Registered {len(servers)} simulated devices."))
+
+        for server in servers:
+            state = "offline" if server.offline else "silent" if server.silent else "online"
+            self.stdout.write(
+                f"  {server.device.serial}  {server.host}:{server.port}  {state}  "
+                f"users={len(server.device.users)} templates={len(server.device.templates)} "
+                f"logs={len(server.device.logs)}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"🟢 Serving {len(servers)} simulated devices. Ctrl+C to stop."))
+
+        try:
+            asyncio.run(serve_fleet(servers, punch_rate=opts['punch_rate']))
+        except KeyboardInterrupt:
+            pass
+
+        requests = sum(s.requests for s in servers)
+        dropped = sum(s.dropped for s in servers)
+        self.stdout.write(f"Simulator stopped: {requests} requests, {dropped} dropped.")
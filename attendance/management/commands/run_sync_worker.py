@@ -0,0 +1,124 @@
+# attendance/management/commands/run_sync_worker.py
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from config.constants import DEVICE_HEARTBEAT_INTERVAL, POLL_TICK, SYNC_WORKER_LOCK_ID, SYNC_WORKER_STANDBY_RETRY
+from core.device_heartbeat import refresh_device_status
+from core.device_sync import sync_attendance_logs_raw
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the device sync loop. Any number of workers may be started; a "
+        "PostgreSQL advisory lock keeps exactly one active and the others wait "
+        "as standbys, taking over as soon as the leader's connection drops. The "
+        "active worker also refreshes the device heartbeat (DeviceStatus) on "
+        "a thread of its own."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tick', type=int, default=POLL_TICK,
+            help='Seconds between sync cycles of the active worker (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--standby-retry', type=int, default=SYNC_WORKER_STANDBY_RETRY,
+            help='Seconds between lock attempts while on standby (default: %(default)s)',
+        )
+
+    def handle(self, *args, **opts):
+        if connection.vendor != 'postgresql':
+            self.stderr.write("run_sync_worker requires PostgreSQL (advisory locks).")
+            return
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        while not self.stopping:
+            # 1) Standby until this process holds the lock
+            if not self._try_lock():
+                time.sleep(opts['standby_retry'])
+                continue
+            self.stdout.write(self.style.SUCCESS("🟢 Sync worker is active."))
+
+            # 2) Lead until stopped or the lock (i.e. the DB session) is lost
+            try:
+                self._lead(opts['tick'])
+            finally:
+                self._unlock()
+            if not self.stopping:
+                self.stdout.write(self.style.WARNING("🟡 Lost the sync lock, back to standby."))
+
+        self.stdout.write("Sync worker stopped.")
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+    def _lead(self, tick):
+        # probes of offline devices can take DEVICE_FETCH_TIMEOUT; on their own
+        # thread they don't hold back the next sync cycle
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(stop,), name='device-heartbeat', daemon=True).start()
+        try:
+            while not self.stopping:
+                started = time.monotonic()
+                try:
+                    sync_attendance_logs_raw(due_only=True)
+                except Exception as e:
+                    self.stderr.write(f"❌ Sync cycle failed: {e}")
+                if not self._holds_lock():
+                    return
+                # sleep in short steps so SIGTERM is honoured quickly
+                while not self.stopping and time.monotonic() - started < tick:
+                    time.sleep(min(1, tick))
+        finally:
+            stop.set()
+
+    def _heartbeat(self, stop):
+        try:
+            while not stop.is_set():
+                try:
+                    refresh_device_status()
+                except Exception as e:
+                    self.stderr.write(f"❌ Device heartbeat failed: {e}")
+                stop.wait(DEVICE_HEARTBEAT_INTERVAL)
+        finally:
+            connections.close_all()  # this thread's connections
+
+    def _try_lock(self):
+        try:
+            connection.ensure_connection()
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", [SYNC_WORKER_LOCK_ID])
+                return cursor.fetchone()[0]
+        except Exception as e:
+            self.stderr.write(f"⚠️ Could not reach the database: {e}")
+            connection.close()
+            return False
+
+    def _holds_lock(self):
+        # session-level lock: gone if the connection was closed or reset
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' "
+                    "AND objsubid = 1 AND pid = pg_backend_pid() AND granted "
+                    "AND ((classid::bigint << 32) | objid::bigint) = %s)",
+                    [SYNC_WORKER_LOCK_ID],
+                )
+                return cursor.fetchone()[0]
+        except Exception:
+            connection.close()
+            return False
+
+    def _unlock(self):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [SYNC_WORKER_LOCK_ID])
+        except Exception:
+            connection.close()
@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0014_alter_employeevacation_type'),
+        ('employee', '0013_alter_shift_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('is_scheduled', models.BooleanField(default=False, verbose_name='Scheduled')),
+                ('is_holiday', models.BooleanField(default=False, verbose_name='Public Holiday')),
+                ('is_on_leave', models.BooleanField(default=False, verbose_name='On Leave')),
+                ('first_in', models.DateTimeField(blank=True, help_text='First punch inside the clock-in window', null=True, verbose_name='Clock In')),
+                ('first_out', models.DateTimeField(blank=True, help_text='First punch inside the clock-out window (next day for overnight shifts)', null=True, verbose_name='Clock Out')),
+                ('late_in', models.DateTimeField(blank=True, help_text='First punch of the day when it missed the clock-in window by less than the late limit', null=True, verbose_name='Late Clock In')),
+                ('late_out', models.DateTimeField(blank=True, help_text='Last punch of the day when it missed the clock-out window by less than the late limit', null=True, verbose_name='Late Clock Out')),
+                ('absent_marks', models.PositiveSmallIntegerField(default=0, verbose_name='Absent Marks')),
+                ('computed_at', models.DateTimeField(auto_now=True, verbose_name='Computed At')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_attendance', to='employee.employee', verbose_name='Employee')),
+            ],
+            options={
+                'verbose_name': 'Daily Attendance',
+                'verbose_name_plural': 'Daily Attendance',
+                'ordering': ['employee', 'date'],
+                'default_permissions': (),
+                'indexes': [models.Index(fields=['date'], name='attendance__date_370344_idx')],
+                'unique_together': {('employee', 'date')},
+            },
+        ),
+    ]
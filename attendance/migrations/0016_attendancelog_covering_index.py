@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-17 11:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('attendance', '0015_dailyattendance'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='attendancelog',
+            index=models.Index(fields=['employee', 'timestamp'], include=('log_type', 'verification_type', 'device'), name='attlog_emp_ts_covering_idx'),
+        ),
+    ]
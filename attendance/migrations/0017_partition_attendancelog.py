@@ -0,0 +1,84 @@
+# Convert attendance_attendancelog into a table range-partitioned by Jalali month.
+
+from django.db import migrations
+
+from attendance.partitions import (
+    TABLE, PARTITIONS_AHEAD, current_month, ensure_default_partition, ensure_partitions, shift_month,
+)
+
+OLD = f'{TABLE}_old'
+SEQUENCE = f'{TABLE}_seq'
+COLUMNS = '"id", "timestamp", "log_type", "status", "verification_type", "created_at", "device_id", "employee_id"'
+
+# Every constraint/index of the log table; the primary key of a partitioned
+# table must include the partition key.
+CONSTRAINTS = """
+    ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY ({pk});
+    ALTER TABLE "{table}" ADD CONSTRAINT "attlog_employee_ts_device_uniq"
+        UNIQUE ("employee_id", "timestamp", "device_id");
+    ALTER TABLE "{table}" ADD CONSTRAINT "attlog_employee_id_fk"
+        FOREIGN KEY ("employee_id") REFERENCES "employee_employee" ("id") DEFERRABLE INITIALLY DEFERRED;
+    ALTER TABLE "{table}" ADD CONSTRAINT "attlog_device_id_fk"
+        FOREIGN KEY ("device_id") REFERENCES "attendance_device" ("id") DEFERRABLE INITIALLY DEFERRED;
+    CREATE INDEX "attendance__timesta_811a1b_idx" ON "{table}" ("timestamp");
+    CREATE INDEX "attlog_device_id_idx" ON "{table}" ("device_id");
+    CREATE INDEX "attlog_emp_ts_covering_idx" ON "{table}" ("employee_id", "timestamp")
+        INCLUDE ("log_type", "verification_type", "device_id");
+"""
+
+
+def _add_constraints(cursor, pk):
+    for statement in CONSTRAINTS.format(table=TABLE, pk=pk).split(';'):
+        if statement.strip():
+            cursor.execute(statement)
+
+
+def partition_log_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        # 1) Move the plain table aside and create the partitioned parent
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{OLD}"')
+        cursor.execute(f'CREATE TABLE "{TABLE}" (LIKE "{OLD}") PARTITION BY RANGE ("timestamp")')
+        cursor.execute(f'CREATE SEQUENCE "{SEQUENCE}" OWNED BY "{TABLE}"."id"')
+        cursor.execute(f'SELECT setval(%s, COALESCE((SELECT max("id") FROM "{OLD}"), 0) + 1, false)', [SEQUENCE])
+        cursor.execute(f'ALTER TABLE "{TABLE}" ALTER COLUMN "id" SET DEFAULT nextval(\'"{SEQUENCE}"\')')
+
+        # 2) Month partitions for existing rows and the next few months
+        cursor.execute(f'SELECT min("timestamp"), max("timestamp") FROM "{OLD}"')
+        lo, hi = cursor.fetchone()
+        this_month = current_month()
+        first = current_month(lo.date()) if lo else this_month
+        last = max(shift_month(*this_month, PARTITIONS_AHEAD), current_month(hi.date()) if hi else this_month)
+        ensure_default_partition(cursor)
+        ensure_partitions(cursor, first, last)
+
+        # 3) Copy rows, drop the old table, then build constraints and indexes
+        cursor.execute(f'INSERT INTO "{TABLE}" ({COLUMNS}) SELECT {COLUMNS} FROM "{OLD}"')
+        cursor.execute(f'DROP TABLE "{OLD}"')
+        _add_constraints(cursor, pk='"id", "timestamp"')
+
+
+def unpartition_log_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{OLD}"')
+        cursor.execute(f'CREATE TABLE "{TABLE}" (LIKE "{OLD}")')
+        cursor.execute(f'INSERT INTO "{TABLE}" ({COLUMNS}) SELECT {COLUMNS} FROM "{OLD}"')
+        cursor.execute(f'ALTER SEQUENCE "{SEQUENCE}" OWNED BY NONE')
+        cursor.execute(f'DROP TABLE "{OLD}"')
+        cursor.execute(f'ALTER SEQUENCE "{SEQUENCE}" OWNED BY "{TABLE}"."id"')
+        cursor.execute(f'ALTER TABLE "{TABLE}" ALTER COLUMN "id" SET DEFAULT nextval(\'"{SEQUENCE}"\')')
+        _add_constraints(cursor, pk='"id"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0016_attendancelog_covering_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_log_table, unpartition_log_table),
+    ]
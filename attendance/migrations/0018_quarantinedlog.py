@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-17 12:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0017_partition_attendancelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuarantinedLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.CharField(help_text='User ID reported by the device', max_length=50, verbose_name='Device User ID')),
+                ('timestamp', models.DateTimeField(verbose_name='Event Time')),
+                ('status', models.DecimalField(blank=True, decimal_places=0, max_digits=3, null=True, verbose_name='Status')),
+                ('verification_type', models.CharField(choices=[('FP', 'Fingerprint'), ('FA', 'Face'), ('IR', 'Iris'), ('CA', 'Card/RFID'), ('PN', 'Password/PIN'), ('MN', 'Manual Entry')], default='FP', max_length=2, verbose_name='Verification Method')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('device', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quarantined_logs', to='attendance.device', verbose_name='Device')),
+            ],
+            options={
+                'verbose_name': 'Quarantined Log',
+                'verbose_name_plural': 'Quarantined Logs',
+                'ordering': ['-timestamp'],
+                'default_permissions': (),
+                'indexes': [models.Index(fields=['user_id'], name='attendance__user_id_d9f29b_idx')],
+                'unique_together': {('user_id', 'timestamp', 'device')},
+            },
+        ),
+    ]
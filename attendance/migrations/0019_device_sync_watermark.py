@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0018_quarantinedlog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='last_synced_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last Synced At'),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='sync_record_count',
+            field=models.PositiveIntegerField(default=0, help_text='Records in the device log buffer at the last successful sync', verbose_name='Synced Records'),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='sync_watermark',
+            field=models.DateTimeField(blank=True, help_text='Time of the newest punch persisted from this device', null=True, verbose_name='Sync Watermark'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-17 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0019_device_sync_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='last_poll_status',
+            field=models.CharField(blank=True, max_length=10, verbose_name='Last Poll Status'),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='next_poll_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Next Poll At'),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='poll_failures',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Consecutive Poll Failures'),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='poll_interval',
+            field=models.PositiveIntegerField(default=0, help_text='Seconds until the next poll, as planned after the last one', verbose_name='Poll Interval'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2 on 2026-10-17 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0020_device_polling_plan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(db_index=True, verbose_name='Started At')),
+                ('duration', models.FloatField(default=0, verbose_name='Duration (s)')),
+                ('devices_polled', models.PositiveIntegerField(default=0, verbose_name='Devices Polled')),
+                ('devices_failed', models.PositiveIntegerField(default=0, verbose_name='Devices Failed')),
+                ('logs_fetched', models.PositiveIntegerField(default=0, verbose_name='New Logs Fetched')),
+                ('logs_saved', models.PositiveIntegerField(default=0, verbose_name='Logs Saved')),
+                ('logs_quarantined', models.PositiveIntegerField(default=0, verbose_name='Logs Quarantined')),
+            ],
+            options={
+                'verbose_name': 'Sync Run',
+                'verbose_name_plural': 'Sync Runs',
+                'ordering': ['-started_at'],
+                'default_permissions': (),
+            },
+        ),
+        migrations.CreateModel(
+            name='SyncDeviceRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_name', models.CharField(max_length=150, verbose_name='Device Name')),
+                ('outcome', models.CharField(max_length=10, verbose_name='Outcome')),
+                ('error_class', models.CharField(blank=True, max_length=100, verbose_name='Error Class')),
+                ('error_message', models.TextField(blank=True, verbose_name='Error Message')),
+                ('records_fetched', models.PositiveIntegerField(default=0, verbose_name='Records Fetched')),
+                ('new_records', models.PositiveIntegerField(default=0, verbose_name='New Records')),
+                ('timings', models.JSONField(default=dict, verbose_name='Phase Timings')),
+                ('device', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sync_runs', to='attendance.device', verbose_name='Device')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='device_runs', to='attendance.syncrun', verbose_name='Sync Run')),
+            ],
+            options={
+                'verbose_name': 'Sync Device Run',
+                'verbose_name_plural': 'Sync Device Runs',
+                'ordering': ['run', 'device_name'],
+                'default_permissions': (),
+            },
+        ),
+    ]
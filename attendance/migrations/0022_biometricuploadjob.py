@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-17 15:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0021_syncrun_syncdevicerun'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BiometricUploadJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.CharField(max_length=64, unique=True, verbose_name='Task ID')),
+                ('status', models.CharField(choices=[('working', 'Working'), ('success', 'Success'), ('error', 'Error')], default='working', max_length=10, verbose_name='Status')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Employees To Upload')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Employees Uploaded')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Progress (%)')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_jobs', to='attendance.device', verbose_name='Device')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Requested By')),
+            ],
+            options={
+                'verbose_name': 'Biometric Upload Job',
+                'verbose_name_plural': 'Biometric Upload Jobs',
+                'ordering': ['-created_at'],
+                'default_permissions': (),
+            },
+        ),
+    ]
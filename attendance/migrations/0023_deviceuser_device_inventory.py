@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-17 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0022_biometricuploadjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='inventory_fingers',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Reconciled Fingerprints'),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='inventory_users',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Reconciled Users'),
+        ),
+        migrations.CreateModel(
+            name='DeviceUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.CharField(max_length=50, verbose_name='Device User ID')),
+                ('card_hash', models.CharField(blank=True, max_length=40, verbose_name='Card Hash')),
+                ('finger_hashes', models.JSONField(default=dict, help_text='Finger position → hash of the template', verbose_name='Fingerprint Hashes')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory', to='attendance.device', verbose_name='Device')),
+            ],
+            options={
+                'verbose_name': 'Device User',
+                'verbose_name_plural': 'Device Users',
+                'default_permissions': (),
+                'unique_together': {('device', 'user_id')},
+            },
+        ),
+    ]
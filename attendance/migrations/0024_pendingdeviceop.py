@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-17 16:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0023_deviceuser_device_inventory'),
+        ('employee', '0013_alter_shift_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingDeviceOp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(choices=[('upload_fingers', 'Upload Fingerprints'), ('upload_card', 'Upload Card'), ('delete_fingers', 'Delete Fingerprints'), ('delete_card', 'Delete Card')], max_length=20, verbose_name='Operation')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('last_error', models.TextField(blank=True, verbose_name='Last Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_ops', to='attendance.device', verbose_name='Device')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_device_ops', to='employee.employee', verbose_name='Employee')),
+            ],
+            options={
+                'verbose_name': 'Pending Device Operation',
+                'verbose_name_plural': 'Pending Device Operations',
+                'ordering': ['created_at'],
+                'default_permissions': (),
+                'unique_together': {('device', 'employee', 'operation')},
+            },
+        ),
+    ]
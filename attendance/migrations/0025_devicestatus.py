@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-17 17:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0024_pendingdeviceop'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('online', models.BooleanField(default=False, verbose_name='Online')),
+                ('checked_at', models.DateTimeField(verbose_name='Checked At')),
+                ('last_seen_at', models.DateTimeField(blank=True, null=True, verbose_name='Last Seen At')),
+                ('clock_offset', models.FloatField(blank=True, help_text='Device clock minus server clock, in seconds', null=True, verbose_name='Clock Offset')),
+                ('counts', models.JSONField(default=dict, help_text='Counts reported by get_device_info', verbose_name='Capacity Counts')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('device', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='live_status', to='attendance.device', verbose_name='Device')),
+            ],
+            options={
+                'verbose_name': 'Device Status',
+                'verbose_name_plural': 'Device Statuses',
+                'default_permissions': (),
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Unlogged staging table for the COPY-based punch ingest (core.log_ingest).
+
+from django.db import migrations, models
+
+STAGING_TABLE = 'attendance_punch_staging'  # core.log_ingest.STAGING_TABLE
+
+CREATE_STAGING = f"""
+    CREATE UNLOGGED TABLE IF NOT EXISTS "{STAGING_TABLE}" (
+        "employee_id" bigint NULL,
+        "user_id" varchar(50) NOT NULL,
+        "device_id" bigint NULL,
+        "timestamp" timestamp without time zone NOT NULL,  -- AttendanceLog.timestamp is naive (USE_TZ=False)
+        "status" numeric(3, 0) NULL,
+        "verification_type" varchar(2) NOT NULL
+    )
+"""
+
+
+def create_staging(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_STAGING)
+
+
+def drop_staging(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS "{STAGING_TABLE}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0025_devicestatus'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncrun',
+            name='logs_duplicate',
+            field=models.PositiveIntegerField(default=0, verbose_name='Duplicate Logs Skipped'),
+        ),
+        migrations.RunPython(create_staging, drop_staging),
+    ]
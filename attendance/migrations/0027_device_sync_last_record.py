@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0026_punch_staging'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='sync_last_punch',
+            field=models.DateTimeField(blank=True, help_text='Time of the last buffer record at the last successful sync', null=True, verbose_name='Last Synced Punch'),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='sync_last_user_id',
+            field=models.CharField(blank=True, help_text='User ID of the last buffer record at the last successful sync', max_length=32, verbose_name='Last Synced User ID'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0027_device_sync_last_record'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingdeviceop',
+            name='is_failed',
+            field=models.BooleanField(default=False, help_text='Given up after too many failed attempts; no longer replayed', verbose_name='Failed'),
+        ),
+        migrations.AddField(
+            model_name='pendingdeviceop',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, help_text='Not replayed before this time (backoff after failed attempts)', null=True, verbose_name='Next Attempt At'),
+        ),
+    ]
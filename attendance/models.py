@@ -1,3 +1,5 @@
+from datetime import datetime, time, timedelta
+
 from django.db import models
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
@@ -69,6 +71,46 @@ class Device(models.Model):
         blank=True
     )
 
+    # sync watermark: what the last successful sync already persisted
+    sync_record_count = models.PositiveIntegerField(
+        _('Synced Records'),
+        default=0,
+        help_text=_('Records in the device log buffer at the last successful sync')
+    )
+    sync_watermark = models.DateTimeField(
+        _('Sync Watermark'),
+        null=True, blank=True,
+        help_text=_('Time of the newest punch persisted from this device')
+    )
+    sync_last_user_id = models.CharField(
+        _('Last Synced User ID'),
+        max_length=32, blank=True,
+        help_text=_('User ID of the last buffer record at the last successful sync')
+    )
+    sync_last_punch = models.DateTimeField(
+        _('Last Synced Punch'),
+        null=True, blank=True,
+        help_text=_('Time of the last buffer record at the last successful sync')
+    )
+    last_synced_at = models.DateTimeField(_('Last Synced At'), null=True, blank=True)
+
+    # adaptive polling plan (see core.poll_plan)
+    next_poll_at = models.DateTimeField(_('Next Poll At'), null=True, blank=True)
+    poll_interval = models.PositiveIntegerField(
+        _('Poll Interval'),
+        default=0,
+        help_text=_('Seconds until the next poll, as planned after the last one')
+    )
+    poll_failures = models.PositiveSmallIntegerField(
+        _('Consecutive Poll Failures'),
+        default=0
+    )
+    last_poll_status = models.CharField(_('Last Poll Status'), max_length=10, blank=True)
+
+    # biometric counts the device reported after the last reconciliation (see core.biometric_reconcile)
+    inventory_users = models.PositiveIntegerField(_('Reconciled Users'), null=True, blank=True)
+    inventory_fingers = models.PositiveIntegerField(_('Reconciled Fingerprints'), null=True, blank=True)
+
     # row timestamps
     created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Updated At'), auto_now=True)
@@ -159,6 +201,34 @@ class BiometricRecord(models.Model):
         return f"{name} – {self.get_biometric_type_display()}"
 
 
+class AttendanceLogQuerySet(models.QuerySet):
+    """
+    Date filters expressed as half-open timestamp ranges
+    (start <= timestamp < end) so PostgreSQL can range-scan the
+    (employee, timestamp) indexes instead of casting every row to a date.
+    """
+
+    def for_employees(self, employees):
+        """
+        employees: ids, Employee instances or an Employee queryset
+        """
+        if isinstance(employees, models.QuerySet):
+            return self.filter(employee__in=employees)
+        return self.filter(employee_id__in=[getattr(e, 'pk', e) for e in employees])
+
+    def for_range(self, start, end):
+        """
+        Punches from the start of `start` to the end of `end` (dates, inclusive).
+        """
+        return self.filter(
+            timestamp__gte=datetime.combine(start, time.min),
+            timestamp__lt=datetime.combine(end + timedelta(days=1), time.min),
+        )
+
+    def for_day(self, day):
+        return self.for_range(day, day)
+
+
 class AttendanceLog(models.Model):
     class LogType(models.TextChoices):
         CLOCK_IN = 'IN', _('Clock In')
@@ -216,12 +286,23 @@ class AttendanceLog(models.Model):
 
     created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
 
+    objects = AttendanceLogQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Attendance Log')
         verbose_name_plural = _('Attendance Logs')
         ordering = ['-timestamp']
         default_permissions = ()  # disable add/change/delete/view
-        indexes = [models.Index(fields=['timestamp'])]
+        indexes = [
+            models.Index(fields=['timestamp']),
+            # report reads (employee_id, timestamp, log_type, verification_type, device_id)
+            # straight from the index
+            models.Index(
+                fields=['employee', 'timestamp'],
+                include=['log_type', 'verification_type', 'device'],
+                name='attlog_emp_ts_covering_idx',
+            ),
+        ]
         unique_together = [
             ('employee', 'timestamp', 'device')
         ]
@@ -234,6 +315,55 @@ class AttendanceLog(models.Model):
         )
 
 
+class QuarantinedLog(models.Model):
+    """
+    Raw punch whose device user ID matched no Employee at sync time.
+    Kept so the punches can be replayed into AttendanceLog once the employee
+    is enrolled (core.device_sync.replay_quarantined_logs).
+    """
+    device = models.ForeignKey(
+        Device,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='quarantined_logs',
+        verbose_name=_('Device')
+    )
+    user_id = models.CharField(
+        _('Device User ID'),
+        max_length=50,
+        help_text=_('User ID reported by the device')
+    )
+    timestamp = models.DateTimeField(_('Event Time'))
+    status = models.DecimalField(
+        _('Status'),
+        max_digits=3,
+        decimal_places=0,
+        null=True,
+        blank=True
+    )
+    verification_type = models.CharField(
+        _('Verification Method'),
+        max_length=2,
+        choices=AttendanceLog.VerificationType.choices,
+        default=AttendanceLog.VerificationType.FINGERPRINT
+    )
+    created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Quarantined Log')
+        verbose_name_plural = _('Quarantined Logs')
+        ordering = ['-timestamp']
+        default_permissions = ()  # disable add/change/delete/view
+        indexes = [models.Index(fields=['user_id'])]
+        unique_together = [
+            ('user_id', 'timestamp', 'device')
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.timestamp:%Y-%m-%d %H:%M}"
+
+
 class EmployeeVacation(models.Model):
     class VacationType(models.TextChoices):
         PASTIME = 'PT', _('Pastime Leave')
@@ -387,3 +517,286 @@ class DailyLeave(models.Model):
     def get_absolute_url(self):
         # this should resolve to path('daily_leave/', …, name='daily_leave')
         return reverse('daily_leave')
+
+
+class DailyAttendance(models.Model):
+    """
+    Materialized attendance result of one employee on one day.
+
+    Rows are derived from AttendanceLog, ShiftSchedule and EmployeeVacation by
+    core.utils.refresh_daily_attendance; writers of those tables drop the rows
+    they affect and reports recompute missing rows on the next read.
+    """
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='daily_attendance',
+        verbose_name=_('Employee')
+    )
+    date = models.DateField(_('Date'))
+
+    is_scheduled = models.BooleanField(_('Scheduled'), default=False)
+    is_holiday = models.BooleanField(_('Public Holiday'), default=False)
+    is_on_leave = models.BooleanField(_('On Leave'), default=False)
+
+    first_in = models.DateTimeField(
+        _('Clock In'), null=True, blank=True,
+        help_text=_('First punch inside the clock-in window')
+    )
+    first_out = models.DateTimeField(
+        _('Clock Out'), null=True, blank=True,
+        help_text=_('First punch inside the clock-out window (next day for overnight shifts)')
+    )
+    late_in = models.DateTimeField(
+        _('Late Clock In'), null=True, blank=True,
+        help_text=_('First punch of the day when it missed the clock-in window by less than the late limit')
+    )
+    late_out = models.DateTimeField(
+        _('Late Clock Out'), null=True, blank=True,
+        help_text=_('Last punch of the day when it missed the clock-out window by less than the late limit')
+    )
+    absent_marks = models.PositiveSmallIntegerField(_('Absent Marks'), default=0)
+
+    computed_at = models.DateTimeField(_('Computed At'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Daily Attendance')
+        verbose_name_plural = _('Daily Attendance')
+        ordering = ['employee', 'date']
+        default_permissions = ()  # disable add/change/delete/view
+        indexes = [models.Index(fields=['date'])]
+        unique_together = [
+            ('employee', 'date')
+        ]
+
+    def __str__(self):
+        return f"{self.employee.employee_id} – {self.date:%Y-%m-%d}"
+
+
+class SyncRun(models.Model):
+    """
+    One device sync cycle (core.device_sync.sync_attendance_logs_raw).
+    """
+    started_at = models.DateTimeField(_('Started At'), db_index=True)
+    duration = models.FloatField(_('Duration (s)'), default=0)
+    devices_polled = models.PositiveIntegerField(_('Devices Polled'), default=0)
+    devices_failed = models.PositiveIntegerField(_('Devices Failed'), default=0)
+    logs_fetched = models.PositiveIntegerField(_('New Logs Fetched'), default=0)
+    logs_saved = models.PositiveIntegerField(_('Logs Saved'), default=0)
+    logs_quarantined = models.PositiveIntegerField(_('Logs Quarantined'), default=0)
+    logs_duplicate = models.PositiveIntegerField(_('Duplicate Logs Skipped'), default=0)
+
+    class Meta:
+        verbose_name = _('Sync Run')
+        verbose_name_plural = _('Sync Runs')
+        ordering = ['-started_at']
+        default_permissions = ()  # disable add/change/delete/view
+
+    def __str__(self):
+        return f"{self.started_at:%Y-%m-%d %H:%M:%S} ({self.duration:.1f}s)"
+
+
+class SyncDeviceRun(models.Model):
+    """
+    Per-device result of a sync cycle with phase timings in seconds
+    (online, count, fetch, parse, resolve, insert, clear).
+    """
+    run = models.ForeignKey(
+        SyncRun,
+        on_delete=models.CASCADE,
+        related_name='device_runs',
+        verbose_name=_('Sync Run')
+    )
+    device = models.ForeignKey(
+        Device,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sync_runs',
+        verbose_name=_('Device')
+    )
+    device_name = models.CharField(_('Device Name'), max_length=150)
+    outcome = models.CharField(_('Outcome'), max_length=10)
+    error_class = models.CharField(_('Error Class'), max_length=100, blank=True)
+    error_message = models.TextField(_('Error Message'), blank=True)
+    records_fetched = models.PositiveIntegerField(_('Records Fetched'), default=0)
+    new_records = models.PositiveIntegerField(_('New Records'), default=0)
+    timings = models.JSONField(_('Phase Timings'), default=dict)
+
+    class Meta:
+        verbose_name = _('Sync Device Run')
+        verbose_name_plural = _('Sync Device Runs')
+        ordering = ['run', 'device_name']
+        default_permissions = ()  # disable add/change/delete/view
+
+    def __str__(self):
+        return f"{self.device_name} – {self.outcome}"
+
+
+
+class BiometricUploadJob(models.Model):
+    """
+    Background upload of every employee's fingerprints and card to a device
+    (core.biometric_upload). Progress lives here rather than in the cache so
+    any web worker can report it.
+    """
+    class Status(models.TextChoices):
+        WORKING = 'working', _('Working')
+        SUCCESS = 'success', _('Success')
+        ERROR = 'error', _('Error')
+
+    task_id = models.CharField(_('Task ID'), max_length=64, unique=True)
+    device = models.ForeignKey(
+        Device,
+        on_delete=models.CASCADE,
+        related_name='upload_jobs',
+        verbose_name=_('Device')
+    )
+    status = models.CharField(
+        _('Status'), max_length=10,
+        choices=Status.choices, default=Status.WORKING
+    )
+    total = models.PositiveIntegerField(_('Employees To Upload'), default=0)
+    processed = models.PositiveIntegerField(_('Employees Uploaded'), default=0)
+    progress = models.PositiveSmallIntegerField(_('Progress (%)'), default=0)
+    error = models.TextField(_('Error'), blank=True)
+    requested_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL,
+        null=True, blank=True,
+        verbose_name=_('Requested By')
+    )
+    created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('Updated At'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Biometric Upload Job')
+        verbose_name_plural = _('Biometric Upload Jobs')
+        ordering = ['-created_at']
+        default_permissions = ()  # disable add/change/delete/view
+
+    def __str__(self):
+        return f"{self.device} – {self.get_status_display()} ({self.progress}%)"
+
+
+class DeviceUser(models.Model):
+    """
+    A user's card and fingerprint templates on a device, as content hashes,
+    recorded when reconciliation last wrote or read them.
+    """
+    device = models.ForeignKey(
+        Device,
+        on_delete=models.CASCADE,
+        related_name='inventory',
+        verbose_name=_('Device')
+    )
+    user_id = models.CharField(_('Device User ID'), max_length=50)
+    card_hash = models.CharField(_('Card Hash'), max_length=40, blank=True)
+    finger_hashes = models.JSONField(
+        _('Fingerprint Hashes'),
+        default=dict,
+        help_text=_('Finger position → hash of the template')
+    )
+    updated_at = models.DateTimeField(_('Updated At'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Device User')
+        verbose_name_plural = _('Device Users')
+        default_permissions = ()  # disable add/change/delete/view
+        unique_together = [
+            ('device', 'user_id'),
+        ]
+
+    def __str__(self):
+        return f"{self.device} – {self.user_id}"
+
+
+
+class PendingDeviceOp(models.Model):
+    """
+    A per-employee biometric write that could not reach a device; replayed
+    by the sync cycle once the device answers again (core.device_fanout).
+    The payload is rebuilt from BiometricRecord at replay time. Failed
+    replays back off exponentially; after DEVICE_OP_MAX_ATTEMPTS the op is
+    marked failed until the operation is requested again.
+    """
+    class Operation(models.TextChoices):
+        UPLOAD_FINGERS = 'upload_fingers', _('Upload Fingerprints')
+        UPLOAD_CARD = 'upload_card', _('Upload Card')
+        DELETE_FINGERS = 'delete_fingers', _('Delete Fingerprints')
+        DELETE_CARD = 'delete_card', _('Delete Card')
+
+    device = models.ForeignKey(
+        Device,
+        on_delete=models.CASCADE,
+        related_name='pending_ops',
+        verbose_name=_('Device')
+    )
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='pending_device_ops',
+        verbose_name=_('Employee')
+    )
+    operation = models.CharField(_('Operation'), max_length=20, choices=Operation.choices)
+    attempts = models.PositiveSmallIntegerField(_('Attempts'), default=0)
+    last_error = models.TextField(_('Last Error'), blank=True)
+    next_attempt_at = models.DateTimeField(
+        _('Next Attempt At'),
+        null=True, blank=True,
+        help_text=_('Not replayed before this time (backoff after failed attempts)')
+    )
+    is_failed = models.BooleanField(
+        _('Failed'),
+        default=False,
+        help_text=_('Given up after too many failed attempts; no longer replayed')
+    )
+    created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('Updated At'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Pending Device Operation')
+        verbose_name_plural = _('Pending Device Operations')
+        ordering = ['created_at']
+        default_permissions = ()  # disable add/change/delete/view
+        unique_together = [
+            ('device', 'employee', 'operation'),
+        ]
+
+    def __str__(self):
+        return f"{self.device} – {self.employee} – {self.get_operation_display()}"
+
+
+class DeviceStatus(models.Model):
+    """
+    Last heartbeat of a device (core.device_heartbeat): reachability, clock
+    offset and capacity counts, so pages read the fleet state from the DB
+    instead of opening a session per device.
+    """
+    device = models.OneToOneField(
+        Device,
+        on_delete=models.CASCADE,
+        related_name='live_status',
+        verbose_name=_('Device')
+    )
+    online = models.BooleanField(_('Online'), default=False)
+    checked_at = models.DateTimeField(_('Checked At'))
+    last_seen_at = models.DateTimeField(_('Last Seen At'), null=True, blank=True)
+    clock_offset = models.FloatField(
+        _('Clock Offset'),
+        null=True, blank=True,
+        help_text=_('Device clock minus server clock, in seconds')
+    )
+    counts = models.JSONField(
+        _('Capacity Counts'),
+        default=dict,
+        help_text=_('Counts reported by get_device_info')
+    )
+    error = models.TextField(_('Error'), blank=True)
+
+    class Meta:
+        verbose_name = _('Device Status')
+        verbose_name_plural = _('Device Statuses')
+        default_permissions = ()  # disable add/change/delete/view
+
+    def __str__(self):
+        return f"{self.device} – {'online' if self.online else 'offline'}"
@@ -0,0 +1,139 @@
+# attendance/partitions.py
+"""
+Monthly range partitions of the attendance log table.
+
+attendance_attendancelog is partitioned on timestamp by Jalali month, so a
+report over one Jalali month (plus the next day for overnight clock-outs)
+touches one or two partitions. Rows outside every month partition land in
+the DEFAULT partition; ensure_partition moves them into the month partition
+it creates.
+
+Bounds are written as local timestamps; with USE_TZ=False the connection
+time zone is TIME_ZONE, so partitions follow local day boundaries.
+"""
+import re
+from datetime import date, datetime, time, timedelta
+
+from libraries.pdate.persian.jalali_table import JalaliTable
+
+TABLE = 'attendance_attendancelog'
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITIONS_AHEAD = 3  # months created in advance by manage_log_partitions
+
+_NAME_RE = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+
+def partition_name(year, month):
+    return f'{TABLE}_p{year:04d}_{month:02d}'
+
+
+def partition_month(name):
+    """
+    (year, month) of a month partition name, None for other tables.
+    """
+    m = _NAME_RE.match(name)
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+
+def shift_month(year, month, delta):
+    idx = year * 12 + (month - 1) + delta
+    return idx // 12, idx % 12 + 1
+
+
+def current_month(today=None):
+    year, month, _ = JalaliTable.from_gregorian(today or date.today())
+    return year, month
+
+
+def month_range(year, month):
+    """
+    Half-open [start, end) datetimes of a Jalali month.
+    """
+    first, last = JalaliTable.month_bounds(year, month)
+    return datetime.combine(first, time.min), datetime.combine(last + timedelta(days=1), time.min)
+
+
+def _literal(value):
+    return f"'{value:%Y-%m-%d %H:%M:%S}'"
+
+
+def list_partitions(cursor):
+    """
+    Names of the partitions currently attached to the log table.
+    """
+    cursor.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+        """,
+        [TABLE],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def ensure_default_partition(cursor):
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+
+
+def ensure_partition(cursor, year, month, existing=None):
+    """
+    Create and attach the partition of a Jalali month if it is missing.
+    Rows of that month already sitting in the DEFAULT partition are moved
+    into it first (ATTACH refuses overlapping default rows); the DEFAULT
+    partition stays locked against writes until the transaction ends, so no
+    punch arriving meanwhile is left behind.
+    Run inside a transaction. Returns True when a partition was created.
+    """
+    name = partition_name(year, month)
+    if name in (existing if existing is not None else list_partitions(cursor)):
+        return False
+
+    start, end = month_range(year, month)
+    in_range = f'"timestamp" >= {_literal(start)} AND "timestamp" < {_literal(end)}'
+    cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS)')
+    cursor.execute(f'LOCK TABLE "{DEFAULT_PARTITION}" IN SHARE ROW EXCLUSIVE MODE')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE {in_range} RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved'
+    )
+    cursor.execute(
+        f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" '
+        f'FOR VALUES FROM ({_literal(start)}) TO ({_literal(end)})'
+    )
+    return True
+
+
+def ensure_partitions(cursor, first, last):
+    """
+    Ensure every month partition from first to last ((year, month) tuples, inclusive).
+    Returns the names created.
+    """
+    existing = list_partitions(cursor)
+    created = []
+    year, month = first
+    while (year, month) <= last:
+        if ensure_partition(cursor, year, month, existing):
+            created.append(partition_name(year, month))
+        year, month = shift_month(year, month, 1)
+    return created
+
+
+def detach_partition(cursor, name, drop=False):
+    """
+    Detach a month partition; it stays behind as a plain table unless drop=True.
+    """
+    cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+    if drop:
+        cursor.execute(f'DROP TABLE "{name}"')
+
+
+def partitions_older_than(cursor, year, month):
+    """
+    Attached month partitions that end before the given Jalali month.
+    """
+    return [
+        name for name in list_partitions(cursor)
+        if (partition_month(name) or (year, month)) < (year, month)
+    ]
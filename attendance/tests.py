@@ -1,3 +1,79 @@
-from django.test import TestCase
+from datetime import date
+from itertools import count
 
-# Create your tests here.
+import jdatetime
+
+from attendance import views
+from attendance.models import DailyLeave, Device
+from attendance.partitions import current_month
+from core.query_budget import QueryBudgetTestCase
+from employee.models import Employee
+
+_device_numbers = count(1)
+
+
+def add_devices(n):
+    for _ in range(n):
+        i = next(_device_numbers)
+        Device.objects.create(
+            identifier=f'BUDGET{i:05d}', name=f'Budget device {i}', ip_address='127.0.0.1', port=14370 + i,
+            com_key=0, device_type=Device.DeviceType.ATTENDANCE, status=Device.Status.ENABLED,
+        )
+
+
+def add_daily_leaves(admin):
+    DailyLeave.objects.bulk_create([
+        DailyLeave(employee=emp, date=date.today(), reason='budget', head_of_department=admin)
+        for emp in Employee.objects.filter(daily_leaves__isnull=True)
+    ])
+
+
+class QueryBudgetTests(QueryBudgetTestCase):
+    """
+    Every budgeted attendance view stays within its @query_budget and does
+    not run more queries when employees, punches, leaves and devices grow.
+    """
+    workload = dict(departments=2, employees=10, shifts=4, months=1, holidays=1, seed=11)
+    growth = dict(departments=1, employees=15, shifts=4, months=1, holidays=1, seed=12)
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        add_daily_leaves(cls.admin)
+        add_devices(2)
+        cls.year, cls.month = current_month()
+        cls.today = jdatetime.date.fromgregorian(date=date.today()).strftime('%Y/%m/%d')
+
+    def grow(self):
+        super().grow()
+        add_daily_leaves(self.admin)
+        add_devices(3)
+
+    def test_fetch_poll_plan(self):
+        self.check(views.fetch_poll_plan, 'fetch_poll_plan')
+
+    def test_fetch_device_stats(self):
+        self.check(views.fetch_device_stats, 'fetch_device_stats', args=[Device.objects.first().id])
+
+    def test_fetch_fleet_status(self):
+        self.check(views.fetch_fleet_status, 'fetch_fleet_status')
+
+    def test_fetch_public_holidays(self):
+        self.check(views.fetch_public_holidays, 'fetch_public_holidays', {'page': 1, 'page_size': 10})
+
+    def test_fetch_employee_leaves(self):
+        self.check(views.fetch_employee_leaves, 'fetch_employee_leaves', {'page': 1, 'page_size': 10})
+
+    def test_fetch_daily_leaves(self):
+        self.check(views.fetch_daily_leaves, 'fetch_daily_leaves', {'page': 1, 'page_size': 10})
+
+    def test_daily_attendance(self):
+        self.check(views.daily_attendance, 'daily_attendance', {'date': self.today})
+
+    def test_monthly_attendance(self):
+        self.check(views.monthly_attendance, 'monthly_attendance',
+                   {'year': self.year, 'month': self.month, 'page_size': 10})
+
+    def test_attendance_report(self):
+        self.check(views.attendance_report, 'attendance_report',
+                   {'year': self.year, 'month': self.month, 'page_size': 10})
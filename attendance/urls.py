@@ -11,6 +11,10 @@ urlpatterns = [
     path('fetch_device_stats/<int:device_id>', views.fetch_device_stats, name='fetch_device_stats'),
     path('devices/<int:device_id>/status/', views.check_device_status, name='check_device_status'),
     path('devices/sync-time/', views.sync_devices_time, name='sync_devices_time'),
+    path('devices/fleet-status/', views.fetch_fleet_status, name='fetch_fleet_status'),
+    path('devices/poll-plan/', views.fetch_poll_plan, name='fetch_poll_plan'),
+    path('devices/sync-metrics/', views.sync_metrics, name='sync_metrics'),
+    path('devices/sync-history/', views.sync_history, name='sync_history'),
 
     path('devices/delete-users/', views.delete_device_users, name='delete_device_users'),
     path('upload_all_to_device', views.upload_all_biometrics_to_device, name='upload_all_to_device'),
@@ -1,35 +1,49 @@
-from collections import defaultdict
 from datetime import datetime, date
 from datetime import timedelta
 from time import sleep
+import uuid
 
 import jdatetime
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import permission_required, login_required
-from django.core.cache import cache
 from django.core.paginator import Paginator
 from django.db import transaction
 from django.db.models import Max, Sum, Q
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.shortcuts import redirect
 from django.shortcuts import render
+from django.template.loader import render_to_string
 from django.templatetags.static import static
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from django.utils.timezone import now
 from django.utils.translation import gettext as _
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
-from config.constants import MIN_YEAR, PERSIAN_MONTHS, LEAVE_LIMITS, PY_TO_SS_DOW_GREGORIAN, PY_TO_SS_DOW_JALALI
+from config.constants import MIN_YEAR, PERSIAN_MONTHS, LEAVE_LIMITS
+from config.constants import PERMANENT_ABSENT_MIN_DAYS, PERMANENT_ABSENT_WINDOW_DAYS, PERMANENT_ABSENT_MAX_WINDOW_DAYS
 from core.utils import get_daily_attendance, get_monthly_attendance, get_attendance_summary, chunked
-from employee.models import Department, ShiftSchedule, Shift
+from core.utils import get_absence_runs
+from core.utils import invalidate_daily_attendance, invalidate_daily_attendance_for_logs
+from core.schedule_calendar import calendar_for, schedule_for
+from core.biometric_upload import job_state, start_upload_job
+from core.device_fanout import run_on_devices, summarize
+from core.device_heartbeat import device_state, fleet_status
+from core.device_sessions import acquire_session
+from core.poll_plan import poll_plan
+from core.query_budget import query_budget
+from core.sync_metrics import PHASES, prometheus_text, run_history
+from employee.models import Department, Shift
 from employee.models import Employee
 from libraries.pdate.calendar_utils import jalali_datetime_str
+from libraries.pdate.persian.jalali_table import JalaliTable
 from notifications.utils import notify_send
 from users.models import User
-from vendors.build.manager import set_user_templates, is_device_online, DeviceConfig, delete_user_templates, delete_user_card, set_user, get_user_templates, get_user, upload_users_with_templates_hr, delete_device_data, set_device_time, get_device_info, get_device_time, build_emp_finger, build_emp_user
-from .models import AttendanceLog, BiometricRecord
+from vendors.build.manager import get_user_templates, get_user, delete_device_data, set_device_time
+from .models import AttendanceLog, BiometricRecord, BiometricUploadJob, PendingDeviceOp
 from .models import Device, DailyLeave
 from .models import EmployeeVacation
 
@@ -38,7 +52,45 @@ from .models import EmployeeVacation
 @permission_required('core.view_device_list', raise_exception=True)
 def devices(request):
     device = Device.objects.all()
-    return render(request, "attendance/devices.html", {'devices': device})
+    return render(request, "attendance/devices.html", {
+        'devices': device,
+        'poll_plan': poll_plan(device),
+        'fleet_status': fleet_status(),
+    })
+
+
+@login_required(login_url='login')
+@permission_required('core.view_device_list', raise_exception=True)
+@query_budget(2)
+def fetch_poll_plan(request):
+    """
+    Live polling plan of every device (refreshed by the device list page).
+    """
+    return JsonResponse({'success': True, 'data': poll_plan(Device.objects.all())})
+
+
+def sync_metrics(request):
+    """
+    Device sync metrics in the Prometheus text format.
+    Scrapers authenticate with "Authorization: Bearer <SYNC_METRICS_TOKEN>";
+    signed-in users need the device list permission.
+    """
+    token = settings.SYNC_METRICS_TOKEN
+    if not (token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')):
+        if not request.user.is_authenticated:
+            return HttpResponse(status=401)
+        if not request.user.has_perm('core.view_device_list'):
+            return HttpResponse(status=403)
+    return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@login_required(login_url='login')
+@permission_required('core.view_device_list', raise_exception=True)
+def sync_history(request):
+    """
+    Recent device sync runs with per-device phase timings.
+    """
+    return render(request, "attendance/sync_history.html", {'runs': run_history(), 'phases': PHASES})
 
 
 @login_required(login_url='login')
@@ -238,11 +290,16 @@ def view_device(request, device_id):
 
 @login_required(login_url='login')
 @permission_required('core.view_device', raise_exception=True)
+@query_budget(2)
 def fetch_device_stats(request, device_id):
-    device = get_object_or_404(Device, id=device_id)
+    """
+    Capacity counts of a device from its last heartbeat (zeros when unknown).
+    """
+    device = get_object_or_404(Device.objects.select_related('live_status'), id=device_id)
+    state = device_state(device, getattr(device, 'live_status', None))
 
     # If device is disabled → return zeros and skip
-    if device.status == Device.Status.DISABLED:
+    if state.get('skip'):
         data = {
             "users": {"used": 0, "cap": 0},
             "fingers": {"used": 0, "cap": 0},
@@ -251,53 +308,41 @@ def fetch_device_stats(request, device_id):
         }
         return JsonResponse({"success": True, "data": data, "skip": True})
 
-    cfg = DeviceConfig(ip=device.ip_address, port=device.port, com_key=device.com_key)
-
-    try:
-        info = get_device_info(cfg)
-
-        # If info is None or missing counts, treat as failure
-        if not info or "counts" not in info:
-            raise ValueError("Invalid or incomplete device response")
-
-        counts = info.get("counts", {})
-        data = {
-            "users": {"used": counts.get("users", 0), "cap": counts.get("users_cap", 0)},
-            "fingers": {"used": counts.get("fingers", 0), "cap": counts.get("fingers_cap", 0)},
-            "faces": {"used": counts.get("faces", 0), "cap": counts.get("faces_cap", 0)},
-            "cards": {"used": counts.get("cards", 0), "cap": counts.get("users_cap", 0)},  # card cap = user cap
-        }
-        return JsonResponse({"success": True, "data": data})
-
-    except Exception as e:
-        # On any failure, safely return all zeros
-        data = {
-            "users": {"used": 0, "cap": 0},
-            "fingers": {"used": 0, "cap": 0},
-            "faces": {"used": 0, "cap": 0},
-            "cards": {"used": 0, "cap": 0},
-        }
-        return JsonResponse({"success": True, "data": data, "error": str(e)})
+    response = {"success": True, "data": state['data']}
+    if 'error' in state:
+        response['error'] = state['error']
+    return JsonResponse(response)
 
 
 @login_required(login_url='login')
 @permission_required('core.view_device', raise_exception=True)
 def check_device_status(request, device_id):
-    device = get_object_or_404(Device, id=device_id)
+    """
+    Online state and clock of a device from its last heartbeat.
+    """
+    device = get_object_or_404(Device.objects.select_related('live_status'), id=device_id)
+    state = device_state(device, getattr(device, 'live_status', None))
 
-    if device.status == Device.Status.DISABLED:
+    if state.get('skip'):
         return JsonResponse({'skip': True})
 
-    cfg = DeviceConfig(ip=device.ip_address, port=device.port, com_key=device.com_key)
-    try:
-        online = is_device_online(cfg)
-        response = {'online': online}
-        if online:
-            dt = get_device_time(cfg)
-            response['device_time'] = dt.strftime("%Y-%m-%dT%H:%M:%S")
-        return JsonResponse(response)
-    except Exception as e:
-        return JsonResponse({'online': False, 'error': str(e)})
+    response = {'online': state['online']}
+    if 'device_time' in state:
+        response['device_time'] = state['device_time']
+    if 'error' in state:
+        response['error'] = state['error']
+    return JsonResponse(response)
+
+
+@login_required(login_url='login')
+@permission_required('core.view_device_list', raise_exception=True)
+@query_budget(2)
+def fetch_fleet_status(request):
+    """
+    Online state, clock offset and capacity counts of every device in one
+    response, read from the heartbeat table.
+    """
+    return JsonResponse({'success': True, 'data': fleet_status()})
 
 
 @login_required(login_url='login')
@@ -313,12 +358,12 @@ def sync_devices_time(request):
     current_time = now().replace(microsecond=0)
 
     for dev in devices:
-        cfg = DeviceConfig(ip=dev.ip_address, port=dev.port, com_key=dev.com_key)
         try:
-            if not is_device_online(cfg):
+            session = acquire_session(dev)
+            if session is None:
                 failed.append(dev.name)
                 continue
-            success = set_device_time(cfg, current_time)
+            success = session.call(set_device_time, current_time)
             if success:
                 synced.append(dev.name)
             else:
@@ -346,12 +391,11 @@ def delete_device_users(request):
         if device.status == Device.Status.DISABLED:
             return JsonResponse({'success': False, 'error': _('Device is disabled.')})
 
-        cfg = DeviceConfig(ip=device.ip_address, port=device.port, com_key=device.com_key)
-
-        if not is_device_online(cfg):
+        session = acquire_session(device)
+        if session is None:
             return JsonResponse({'success': False, 'error': _('Device is offline.')})
 
-        status = delete_device_data(cfg, clear_all=True)
+        status = session.call(delete_device_data, clear_all=True)
 
         if status:
             return JsonResponse({'success': True, 'message': _('Users deleted successfully from device.')})
@@ -367,19 +411,19 @@ def delete_device_users(request):
 @login_required(login_url='login')
 def check_upload_progress(request):
     task_id = request.GET.get('task_id')
-    data = cache.get(task_id, {})
-    return JsonResponse({
-        'progress': data.get('progress', 0),
-        'status': data.get('status', 'working')  # 'success', 'error', or 'working'
-    })
+    return JsonResponse(job_state(task_id))  # status: 'success', 'error', or 'working'
 
 
 @login_required(login_url='login')
 @require_POST
 @permission_required('core.view_employee_biometric', raise_exception=True)
 def upload_all_biometrics_to_device(request):
+    """
+    Queue a background upload of all fingerprint data to a device; the page
+    follows it through check_upload_progress.
+    """
     device_id = request.POST.get("device_id")
-    task_id = request.POST.get("task_id")
+    task_id = request.POST.get("task_id") or uuid.uuid4().hex
 
     # 1) Validate device
     try:
@@ -390,64 +434,19 @@ def upload_all_biometrics_to_device(request):
     if device.status == Device.Status.DISABLED:
         return JsonResponse({'success': False, 'error': _('Device is currently disabled.')})
 
-    cfg = DeviceConfig(ip=device.ip_address, port=device.port, com_key=device.com_key, timeout=400)
-    if not is_device_online(cfg):
+    if acquire_session(device) is None:
         return JsonResponse({'success': False, 'error': _('Device "%(name)s" is offline.') % {'name': device.name}})
 
-    # 2) Fetch biometric-enabled employees
-    employees = Employee.objects.filter(is_archive=False)
-    total = employees.count()
-    processed = 0
-    user_template_data = []
-
-    for emp in employees:
-        fingerprint_records = emp.biometric_records.filter(
-            biometric_type=BiometricRecord.BiometricType.FINGERPRINT
-        )
-        if not fingerprint_records.exists():
-            continue
-
-        # Card info
-        card_record = emp.biometric_records.filter(
-            biometric_type=BiometricRecord.BiometricType.RFID
-        ).order_by('-created_at').first()
-        try:
-            card = int(card_record.template_data) if card_record else 0
-        except (TypeError, ValueError):
-            card = 0
-
-        # Build ZKUser
-        bio_user = build_emp_user(emp, card)
-
-        fingers = []
-        for rec in fingerprint_records:
-            try:
-                fingers.append(build_emp_finger(emp.employee_id, rec))
-            except Exception:
-                continue
-
-        user_template_data.append((bio_user, fingers))
-        processed += 1
-
-        # ✅ Accurate progress (based on processed user_template_data)
-        if task_id:
-            progress = round((processed / total) * 100)
-            cache.set(task_id, {'progress': min(progress, 99), 'status': 'working'}, timeout=600)
-
-    if not user_template_data:
-        return JsonResponse({'success': False, 'error': _('No fingerprint data found to upload.')})
-
-    # 3) Upload to device
-    success = upload_users_with_templates_hr(cfg, user_template_data)
+    if BiometricUploadJob.objects.filter(task_id=task_id).exists():
+        return JsonResponse({'success': False, 'error': _('This upload has already been started.')})
 
-    if success:
-        if task_id:
-            cache.set(task_id, {'progress': 100, 'status': 'success'}, timeout=600)
-        return JsonResponse({'success': True, 'message': _('All fingerprint data successfully uploaded to %(name)s.') % {'name': device.name}})
-    else:
-        if task_id:
-            cache.set(task_id, {'progress': 100, 'status': 'error'}, timeout=600)
-        return JsonResponse({'success': False, 'error': _('Upload failed. Please check device connection or data integrity.')})
+    # 2) Hand the upload to the background job
+    start_upload_job(device, task_id, user=request.user)
+    return JsonResponse({
+        'success': True,
+        'task_id': task_id,
+        'message': _('Uploading fingerprint data to %(name)s…') % {'name': device.name},
+    })
 
 
 @login_required(login_url='login')
@@ -476,19 +475,19 @@ def download_biometric_data(request):
     # 3) Check online status
     target_dev = None
     for dev in registration_devices:
-        cfg = DeviceConfig(ip=dev.ip_address, port=dev.port, com_key=dev.com_key)
-        if is_device_online(cfg):
-            target_dev = (dev, cfg)
+        session = acquire_session(dev)
+        if session:
+            target_dev = (dev, session)
             break
 
     if not target_dev:
         return JsonResponse({'success': False, 'error': _('No registration device is online.')})
 
-    dev, cfg = target_dev
+    dev, session = target_dev
 
     # 4) Fingerprint
     if option == "finger":
-        templates = get_user_templates(cfg, user_id=employee_id)
+        templates = session.call(get_user_templates, user_id=employee_id)
         count = 0
         for tpl in templates:
             BiometricRecord.objects.update_or_create(
@@ -509,7 +508,7 @@ def download_biometric_data(request):
 
     # 5) Card
     elif option == "card":
-        user = get_user(cfg, user_id=employee_id)
+        user = session.call(get_user, user_id=employee_id)
         if user and user.get("card"):
             BiometricRecord.objects.update_or_create(
                 employee=employee,
@@ -561,60 +560,41 @@ def upload_biometric_data(request):
         return JsonResponse({'success': False, 'error': _('No biometric records found for selected type.')})
 
     # 3) Fetch enabled devices
-    devices = Device.objects.filter(status=Device.Status.ENABLED, device_type=Device.DeviceType.ATTENDANCE)
-    if not devices.exists():
+    devices = list(Device.objects.filter(status=Device.Status.ENABLED, device_type=Device.DeviceType.ATTENDANCE))
+    if not devices:
         return JsonResponse({'success': False, 'error': _('No enabled devices available.')})
 
-    # 4) Check device connectivity
-    device_cfgs = []
-    for dev in devices:
-        cfg = DeviceConfig(ip=dev.ip_address, port=dev.port, com_key=dev.com_key)
-        if not is_device_online(cfg):
-            return JsonResponse({'success': False, 'error': _('Device "%(name)s" is offline.') % {'name': dev.name}})
-        device_cfgs.append((dev, cfg))
-
-    # 5) Determine privilege
-    privilege = 14 if employee.is_device_admin else 0  # 14 = admin, 0 = normal user
-
-    # 6) Upload logic
+    # 4) Write to every device at once; unreachable devices are queued for retry
     if biometric_type == BiometricRecord.BiometricType.FINGERPRINT:
-        # Convert records to Finger objects
-        fingers = []
-        for rec in records:
-            finger = build_emp_finger(employee_id, rec)
-            fingers.append(finger)
-
-        uploaded = 0
-        for dev, cfg in device_cfgs:
-            if set_user_templates(cfg, user_id=employee_id, templates=fingers):
-                uploaded += 1
-
-        if uploaded == 0:
-            return JsonResponse({'success': False, 'error': _('Failed to upload fingerprint templates.')})
-        return JsonResponse({'success': True, 'message': _('%(count)d Fingerprint templates uploaded.') % {'count': uploaded}})
-
+        report = run_on_devices(devices, PendingDeviceOp.Operation.UPLOAD_FINGERS, employee)
+        uploaded, queued = summarize(report)
+        if uploaded == 0 and queued == 0:
+            return JsonResponse({'success': False, 'error': _('Failed to upload fingerprint templates.'), 'devices': report})
+        message = _('Fingerprint templates uploaded to %(count)d devices.') % {'count': uploaded}
 
     elif biometric_type == BiometricRecord.BiometricType.RFID:
         # Use latest card record
         card_record = records.order_by('-created_at').first()
         try:
-            card_number = int(card_record.template_data)
+            int(card_record.template_data)
         except ValueError:
             return JsonResponse({'success': False, 'error': _('Invalid card number format.')})
 
-        uploaded = 0
-        for dev, cfg in device_cfgs:
-            if set_user(cfg, user_id=str(employee_id), name='', privilege=privilege, card=card_number):
-                uploaded += 1
-
-        if uploaded == 0:
-            return JsonResponse({'success': False, 'error': _('Failed to upload card data.')})
-        return JsonResponse({'success': True, 'message': _('Card uploaded to %(count)d devices.') % {'count': uploaded}})
+        report = run_on_devices(devices, PendingDeviceOp.Operation.UPLOAD_CARD, employee)
+        uploaded, queued = summarize(report)
+        if uploaded == 0 and queued == 0:
+            return JsonResponse({'success': False, 'error': _('Failed to upload card data.'), 'devices': report})
+        message = _('Card uploaded to %(count)d devices.') % {'count': uploaded}
 
     elif biometric_type == BiometricRecord.BiometricType.FACE:
         return JsonResponse({'success': False, 'error': _('Face upload is under development.')})
 
-    return JsonResponse({'success': False, 'error': _('Unhandled biometric type.')})
+    else:
+        return JsonResponse({'success': False, 'error': _('Unhandled biometric type.')})
+
+    if queued:
+        message += ' ' + _('%(count)d offline devices will be updated when they are back online.') % {'count': queued}
+    return JsonResponse({'success': True, 'message': message, 'devices': report})
 
 
 @login_required(login_url='login')
@@ -634,53 +614,36 @@ def delete_biometric_data(request):
         return JsonResponse({'success': False, 'error': _('Employee not found.')})
 
     # 2) Get enabled attendance devices
-    devices = Device.objects.filter(
+    devices = list(Device.objects.filter(
         status=Device.Status.ENABLED,
         device_type=Device.DeviceType.ATTENDANCE
-    )
-
-    sleep(0.5)
+    ))
 
-    if not devices.exists():
+    if not devices:
         return JsonResponse({'success': False, 'error': _('No active attendance devices found.')})
 
-    # 3) Check if all are online
-    device_cfgs = []
-    for dev in devices:
-        cfg = DeviceConfig(ip=dev.ip_address, port=dev.port, com_key=dev.com_key)
-        if not is_device_online(cfg):
-            return JsonResponse({'success': False, 'error': _('Device "%(name)s" is offline.') % {'name': dev.name}})
-        device_cfgs.append(cfg)
-
-    # 4) Delete fingerprint data
+    # 3) Delete from every device at once; unreachable devices are queued for retry
     if option == "finger":
-        deleted = 0
-        for cfg in device_cfgs:
-            result = delete_user_templates(cfg, user_id=employee_id)
-            if result:  # result is a dict of fid → bool
-                deleted += 1
-
-        if deleted == 0:
-            return JsonResponse({'success': False, 'error': _('Failed to delete fingerprint templates.')})
-        return JsonResponse({'success': True, 'message': _('Fingerprint templates deleted from %(count)d devices.') % {'count': deleted}})
+        report = run_on_devices(devices, PendingDeviceOp.Operation.DELETE_FINGERS, employee)
+        deleted, queued = summarize(report)
+        if deleted == 0 and queued == 0:
+            return JsonResponse({'success': False, 'error': _('Failed to delete fingerprint templates.'), 'devices': report})
+        message = _('Fingerprint templates deleted from %(count)d devices.') % {'count': deleted}
 
-    # 5) Delete card data
     elif option == "card":
-        deleted = 0
-        for cfg in device_cfgs:
-            test = delete_user_card(cfg, user_id=employee_id)
-            if delete_user_card(cfg, user_id=employee_id):
-                deleted += 1
+        report = run_on_devices(devices, PendingDeviceOp.Operation.DELETE_CARD, employee)
+        deleted, queued = summarize(report)
+        if deleted == 0 and queued == 0:
+            return JsonResponse({'success': False, 'error': _('Failed to delete card data.'), 'devices': report})
+        message = _('Card data removed from %(count)d devices.') % {'count': deleted}
 
-        if deleted == 0:
-            return JsonResponse({'success': False, 'error': _('Failed to delete card data.')})
-        return JsonResponse({'success': True, 'message': _('Card data removed from %(count)d devices.') % {'count': deleted}})
-
-    # 6) Face – Not implemented yet
-    elif option == "face":
+    # 4) Face – Not implemented yet
+    else:
         return JsonResponse({'success': False, 'error': _('Face deletion is under development.')})
 
-    return JsonResponse({'success': False, 'error': _('Unknown biometric type.')})
+    if queued:
+        message += ' ' + _('%(count)d offline devices will be updated when they are back online.') % {'count': queued}
+    return JsonResponse({'success': True, 'message': message, 'devices': report})
 
 
 @login_required(login_url='login')
@@ -744,6 +707,7 @@ def public_holidays(request):
 
 @login_required(login_url='login')
 @permission_required('core.view_public_holiday_list', raise_exception=True)
+@query_budget(2)
 def fetch_public_holidays(request):
     if request.method != 'POST':
         return JsonResponse({'error': _("Invalid request method.")}, status=400)
@@ -781,8 +745,8 @@ def fetch_public_holidays(request):
 
         def in_month(h):
             # convert Gregorian → Jalali
-            j = jdatetime.date.fromgregorian(date=h['start_date'])
-            return j.year == fy and j.month == fm
+            jy, jm, _ = JalaliTable.from_gregorian(h['start_date'])
+            return jy == fy and jm == fm
 
         holidays = [h for h in holidays if in_month(h)]
 
@@ -805,8 +769,8 @@ def fetch_public_holidays(request):
     # 6) build payload (convert back to YYYY/MM/DD)
     data = []
     for h in page_obj:
-        js = jdatetime.date.fromgregorian(date=h['start_date']).strftime('%Y/%m/%d')
-        je = jdatetime.date.fromgregorian(date=h['end_date']).strftime('%Y/%m/%d')
+        js = JalaliTable.format(h['start_date'])
+        je = JalaliTable.format(h['end_date'])
         data.append({
             'id': f"{h['start_date']}|{h['end_date']}",
             'description': h['reason'],
@@ -873,6 +837,7 @@ def add_public_holiday(request):
 
         with transaction.atomic():
             EmployeeVacation.objects.bulk_create(vacations)
+            invalidate_daily_attendance(start=sd_greg, end=ed_greg)
             # ——— NEW: broadcast one public notification ———
             # convert back to Jalali strings once
             j_start = jdatetime.date.fromgregorian(date=sd_greg)
@@ -932,6 +897,7 @@ def delete_public_holiday(request):
         ).delete()
 
         if deleted:
+            invalidate_daily_attendance(start=g_start, end=g_end)
             return JsonResponse({'success': True})
         else:
             return JsonResponse({
@@ -965,6 +931,7 @@ def employee_leave(request):
 
 @login_required(login_url='login')
 @permission_required('core.view_employee_leave_list', raise_exception=True)
+@query_budget(4)
 def fetch_employee_leaves(request):
     """
     AJAX endpoint for DataTables: return EmployeeVacation rows (except GENERAL_HOLIDAY),
@@ -1034,8 +1001,8 @@ def fetch_employee_leaves(request):
         fy, fm = int(filter_year), int(filter_month)
 
         def in_month(v):
-            j = jdatetime.date.fromgregorian(date=v.start_date)
-            return j.year == fy and j.month == fm
+            jy, jm, _ = JalaliTable.from_gregorian(v.start_date)
+            return jy == fy and jm == fm
 
         leaves = [v for v in leaves if in_month(v)]
 
@@ -1083,8 +1050,8 @@ def fetch_employee_leaves(request):
             'photo': eu.profile_photo.url if eu.profile_photo else default_photo,
             'type': v.get_type_display(),
             'days': str(int(v.days_requested)),
-            'start_date': jdatetime.date.fromgregorian(date=v.start_date).strftime('%Y/%m/%d'),
-            'end_date': jdatetime.date.fromgregorian(date=v.end_date).strftime('%Y/%m/%d'),
+            'start_date': JalaliTable.format(v.start_date),
+            'end_date': JalaliTable.format(v.end_date),
             'sup': sup_display,
             'status': v.status,
             'requested_at': v.requested_at.isoformat(),
@@ -1273,6 +1240,8 @@ def delete_employee_leave(request):
 
     # Admins can delete any leave
     if user.account_type == User.ACCOUNT_TYPE_NORMAL:
+        if vac.status == EmployeeVacation.Status.APPROVED:
+            invalidate_daily_attendance(employee_ids=[vac.employee_id], start=vac.start_date, end=vac.end_date)
         vac.delete()
         return JsonResponse({'success': True})
 
@@ -1363,6 +1332,7 @@ def update_employee_leave_status(request):
             lv.processed_by = request.user
             lv.processed_at = timezone.now()
             lv.save()
+            invalidate_daily_attendance(employee_ids=[lv.employee_id], start=lv.start_date, end=lv.end_date)
 
             # ——— send notification back to the employee ———
             emp_user = lv.employee.user
@@ -1428,6 +1398,7 @@ def daily_leave(request):
 
 @login_required(login_url='login')
 @permission_required('core.view_daily_leave_list', raise_exception=True)
+@query_budget(4)
 def fetch_daily_leaves(request):
     if request.method != 'POST':
         return JsonResponse({'error': _("Invalid request method.")}, status=400)
@@ -1484,8 +1455,8 @@ def fetch_daily_leaves(request):
         fy, fm = int(filter_year), int(filter_mon)
 
         def in_month(dl):
-            j = jdatetime.date.fromgregorian(date=dl.date)
-            return j.year == fy and j.month == fm
+            jy, jm, _ = JalaliTable.from_gregorian(dl.date)
+            return jy == fy and jm == fm
 
         leaves = [dl for dl in leaves if dl.date and in_month(dl)]
 
@@ -1544,7 +1515,7 @@ def fetch_daily_leaves(request):
             'employee_id': dl.employee.employee_id,
             'full_name': full,
             'photo': photo,
-            'date': jdatetime.date.fromgregorian(date=dl.date).strftime('%Y/%m/%d') if dl.date else '',
+            'date': JalaliTable.format(dl.date) if dl.date else '',
             'leave_type': dl.get_leave_type_display(),
             'reason': display_reason,
             'head': sup_display,
@@ -1625,18 +1596,8 @@ def update_daily_leave_status(request):
             except Exception:
                 return JsonResponse({'error': 'Invalid leave date.'}, status=400)
 
-            dow_code = PY_TO_SS_DOW_GREGORIAN.get(dl.date.weekday())
-            if dow_code is None:
-                return JsonResponse({'error': 'Could not determine day of week.'}, status=400)
-
-            # Find the active schedule for this shift / year / month / weekday
-            sched = ShiftSchedule.objects.filter(
-                shift=emp.shift,
-                year=jdate.year,
-                month=jdate.month,
-                day_of_week=dow_code,
-                is_active=True
-            ).first()
+            # Find the active schedule for this shift on that day
+            sched = schedule_for(emp.shift_id, dl.date)
 
             if not sched:
                 return JsonResponse({
@@ -1676,6 +1637,8 @@ def update_daily_leave_status(request):
                 t_out = datetime.combine(out_date, sched.out_start_time)
                 make_log(AttendanceLog.LogType.CLOCK_OUT, t_out)
 
+            invalidate_daily_attendance_for_logs([(emp.id, dl.date), (emp.id, dl.date + timedelta(days=1))])
+
         # At this point, either we're rejecting (no logs) or logs succeeded—so update the leave
         dl.status = new_st
         dl.head_of_department = request.user
@@ -1879,6 +1842,7 @@ def make_absent(request):
             return redirect('make_absent')
 
         removed = 0
+        touched = []
         with transaction.atomic():
             for emp_id in emp_ids:
                 emp = get_object_or_404(Employee, employee_id=emp_id, is_archive=False)
@@ -1891,15 +1855,8 @@ def make_absent(request):
                         messages.error(request, f"Invalid date {jy}-{jm}-{di}")
                         continue
 
-                    # map weekday for schedule lookup
-                    dow = PY_TO_SS_DOW_GREGORIAN.get(gdate.weekday())
-                    sched = ShiftSchedule.objects.filter(
-                        shift=emp.shift,
-                        year=jdate.year,
-                        month=jdate.month,
-                        day_of_week=dow,
-                        is_active=True
-                    ).first()
+                    # resolved schedule for this shift and day
+                    sched = schedule_for(emp.shift_id, gdate)
                     if not sched:
                         messages.error(request, f"No schedule for {emp} on {gdate}.")
                         continue
@@ -1907,13 +1864,13 @@ def make_absent(request):
                     # For IN logs
                     if absent_type in (DailyLeave.LeaveType.CLOCK_IN,
                                        DailyLeave.LeaveType.CLOCK_IN_OUT):
-                        q = AttendanceLog.objects.filter(
+                        q = AttendanceLog.objects.for_day(gdate).filter(
                             employee=emp,
                             log_type=AttendanceLog.LogType.CLOCK_IN,
-                            timestamp__date=gdate
                         )
                         count, details = q.delete()
                         removed += count
+                        touched.append((emp.id, gdate))
 
                     # For OUT logs
                     if absent_type in (DailyLeave.LeaveType.CLOCK_OUT,
@@ -1924,13 +1881,15 @@ def make_absent(request):
                         else:
                             out_date = gdate
 
-                        q = AttendanceLog.objects.filter(
+                        q = AttendanceLog.objects.for_day(out_date).filter(
                             employee=emp,
                             log_type=AttendanceLog.LogType.CLOCK_OUT,
-                            timestamp__date=out_date
                         )
                         count, details = q.delete()
                         removed += count
+                        touched.append((emp.id, out_date))
+
+            invalidate_daily_attendance_for_logs(touched)
 
         if removed:
             messages.success(
@@ -2012,6 +1971,7 @@ def make_present(request):
             return redirect('make_present')
 
         created = 0
+        touched = []
         with transaction.atomic():
             for emp_id in emp_ids:
                 emp = get_object_or_404(Employee, employee_id=emp_id, is_archive=False)
@@ -2025,18 +1985,7 @@ def make_present(request):
                         messages.error(request, f"Invalid date {jy}-{jm}-{di}")
                         continue
 
-                    dow = PY_TO_SS_DOW_GREGORIAN.get(gdate.weekday())
-                    if dow is None:
-                        messages.error(request, f"Cannot map weekday for {gdate}.")
-                        continue
-
-                    sched = ShiftSchedule.objects.filter(
-                        shift=emp.shift,
-                        year=jdate.year,
-                        month=jdate.month,
-                        day_of_week=dow,
-                        is_active=True
-                    ).first()
+                    sched = schedule_for(emp.shift_id, gdate)
                     if not sched:
                         messages.error(request, f"No schedule for {emp} on {gdate}.")
                         continue
@@ -2056,6 +2005,7 @@ def make_present(request):
                                 log_type=log_type,
                                 verification_type=AttendanceLog.VerificationType.MANUAL
                             )
+                            touched.append((emp.id, ts.date()))
                             return True
                         return False
 
@@ -2085,6 +2035,8 @@ def make_present(request):
                             if make_log(AttendanceLog.LogType.CLOCK_OUT, ts):
                                 created += 1
 
+            invalidate_daily_attendance_for_logs(touched)
+
         if created:
             messages.success(
                 request,
@@ -2157,10 +2109,9 @@ def check_attendance(request):
             return JsonResponse({'error': _('Employee not found')}, status=404)
 
         # Query all logs on that date for that employee
-        logs = AttendanceLog.objects.filter(
+        logs = AttendanceLog.objects.for_day(g_date).filter(
             employee=employee,
-            timestamp__date=g_date
-        ).order_by('timestamp')
+        ).select_related('device').order_by('timestamp')
 
         # Build rows directly from logs
         rows = []
@@ -2196,6 +2147,7 @@ def check_attendance(request):
 
 @login_required(login_url='login')
 @permission_required('core.view_daily_attendance', raise_exception=True)
+@query_budget(10)
 def daily_attendance(request):
     """
     GET:   show the form.
@@ -2210,8 +2162,8 @@ def daily_attendance(request):
             and user.has_perm('core.view_daily_report_all_employee_by_hod')
     )
 
-    # Base employees queryset, sorted ASC by employee_id
-    qs = Employee.objects.filter(is_archive=False).order_by('employee_id')
+    # Base employees queryset, sorted ASC by employee_id (the form lists their names)
+    qs = Employee.objects.filter(is_archive=False).select_related('user').order_by('employee_id')
     if is_employee:
         if can_view_dept:
             qs = qs.filter(department=profile.department)
@@ -2244,25 +2196,12 @@ def daily_attendance(request):
         # 3) Optional employee filter
         emp_id = old.get('employee')
 
-        # Build the same sched_map you use in your helper
-        jday = jdatetime.date.fromgregorian(date=g_date)
-        ss_dow = PY_TO_SS_DOW_JALALI[jdate.weekday()]
-
-        schedules = ShiftSchedule.objects.filter(
-            year=jday.year,
-            month=jday.month,
-            day_of_week=ss_dow,
-            is_active=True
-        )
-        sched_map = {sch.shift_id: sch for sch in schedules}
-
         # Which shift_ids your employees actually have…
         emp_shift_ids = set(employees.values_list('shift_id', flat=True))
 
-        # …and which ones you fetched schedules for:
-        scheduled_ids = set(sched_map)
-
-        missing_ids = emp_shift_ids - scheduled_ids
+        # …and which ones have no resolved schedule on that day:
+        calendar = calendar_for(g_date)
+        missing_ids = {sid for sid in emp_shift_ids if calendar.get(sid, g_date) is None}
         print(missing_ids)
         if missing_ids:
             missing_names = Shift.objects.filter(
@@ -2276,6 +2215,8 @@ def daily_attendance(request):
 
         if emp_id and not is_employee:
             employees = employees.filter(employee_id=emp_id)
+        # evaluate once: the helper and both loops below share the same rows
+        employees = list(employees.select_related('user'))
         # 4) Use helper for attendance
         attendance = get_daily_attendance(
             att_date=g_date,
@@ -2315,8 +2256,7 @@ def daily_attendance(request):
             if not dt:
                 return "غیر حاضر", ""
             # convert to Jalali date
-            jd = jdatetime.date.fromgregorian(date=dt.date())
-            date_str = jd.strftime("%Y-%m-%d")  # e.g. 1404-01-21
+            date_str = JalaliTable.format(dt.date(), sep='-')  # e.g. 1404-01-21
             time_str = dt.strftime("%I:%M:%S %p")  # e.g. 09:03:10 AM
             return date_str, time_str
 
@@ -2388,8 +2328,30 @@ def daily_attendance(request):
     })
 
 
+def stream_report_pages(request, template_prefix, context, rows, page_size):
+    """
+    Render a paginated report progressively: <prefix>_head.html once,
+    <prefix>_page.html for every `page_size` rows, then <prefix>_foot.html.
+    Rows get a running 'record_number'.
+    """
+    yield render_to_string(f'{template_prefix}_head.html', context, request)
+
+    page = []
+    for idx, row in enumerate(rows, start=1):
+        row['record_number'] = idx
+        page.append(row)
+        if len(page) == page_size:
+            yield render_to_string(f'{template_prefix}_page.html', {**context, 'page': page}, request)
+            page = []
+    if page:
+        yield render_to_string(f'{template_prefix}_page.html', {**context, 'page': page}, request)
+
+    yield render_to_string(f'{template_prefix}_foot.html', context, request)
+
+
 @login_required(login_url='login')
 @permission_required('core.view_monthly_attendance', raise_exception=True)
+@query_budget(12)
 def monthly_attendance(request):
     user = request.user
     profile = getattr(user, 'employee_profile', None)
@@ -2399,8 +2361,8 @@ def monthly_attendance(request):
             user.has_perm('core.view_monthly_report_all_employee_by_hod')
     )
 
-    # Base employees
-    qs = Employee.objects.filter(is_archive=False)
+    # Base employees (the form lists their names)
+    qs = Employee.objects.filter(is_archive=False).select_related('user')
     if is_employee:
         qs = qs.filter(
             department=profile.department if can_view_dept else None,
@@ -2421,10 +2383,7 @@ def monthly_attendance(request):
         jm = int(old['month'])
 
         # 1) build your Gregorian window
-        jstart = jdatetime.date(jy, jm, 1)
-        jnext = jdatetime.date(jy + (jm // 12), (jm % 12) + 1, 1)
-        gstart = jstart.togregorian()
-        gend = jnext.togregorian() - timedelta(days=1)
+        gstart, gend = JalaliTable.month_bounds(jy, jm)
 
         # 2) two‐case filter
         qs = Employee.objects.filter(
@@ -2455,11 +2414,12 @@ def monthly_attendance(request):
         except ValueError:
             page_size = 10
 
-        # get days & grid
-        days, grid = get_monthly_attendance(
+        # get days & a lazy row generator (employees are classified in batches)
+        days, rows = get_monthly_attendance(
             year=jy, month=jm,
             is_follow_schedule=True,
-            employee_qs=employees
+            employee_qs=employees,
+            stream=True
         )
 
         dept_name = ''
@@ -2473,13 +2433,8 @@ def monthly_attendance(request):
         if old.get('work_type') == Employee.CONTRACTOR:
             work_type_name = 'کارکنان حق الزحمه / باالمقطع'
 
-        # add record numbers & paginate
-        for idx, row in enumerate(grid, start=1):
-            row['record_number'] = idx
-        pages = [grid[i:i + page_size] for i in range(0, len(grid), page_size)]
-
         jdate_str = f"{jy} – {PERSIAN_MONTHS[jm - 1]}"
-        return render(request, 'reports/monthly_attendance_report.html', {
+        context = {
             'page_title': _('Monthly Attendance'),
             'jdate_year': jy,
             'jdate_month': PERSIAN_MONTHS[jm - 1],
@@ -2487,8 +2442,12 @@ def monthly_attendance(request):
             'department_name': dept_name,
             'work_type_name': work_type_name,
             'days': days,
-            'pages': pages,
-        })
+        }
+        # render page by page so only one page of rows is held in memory
+        return StreamingHttpResponse(
+            stream_report_pages(request, 'reports/monthly_attendance_report', context, rows, page_size),
+            content_type='text/html; charset=utf-8'
+        )
 
     # GET
     old = {}
@@ -2506,11 +2465,12 @@ def monthly_attendance(request):
 
 @login_required(login_url='login')
 @permission_required('core.view_attendance_report', raise_exception=True)
+@query_budget(12)
 def attendance_report(request):
     today_j = jdatetime.date.fromgregorian(date=date.today())
     years = list(range(MIN_YEAR, today_j.year + 2))[::-1]
     months = list(enumerate(PERSIAN_MONTHS, start=1))
-    employees = Employee.objects.filter(is_archive=False).order_by('employee_id')
+    employees = Employee.objects.filter(is_archive=False).select_related('user').order_by('employee_id')
     departments = Department.objects.order_by('name')
     work_types = Employee.WORK_TYPE_CHOICES
 
@@ -2529,10 +2489,7 @@ def attendance_report(request):
         jm = int(request.POST['month'])
 
         # 1) build your Gregorian window
-        jstart = jdatetime.date(jy, jm, 1)
-        jnext = jdatetime.date(jy + (jm // 12), (jm % 12) + 1, 1)
-        gstart = jstart.togregorian()
-        gend = jnext.togregorian() - timedelta(days=1)
+        gstart, gend = JalaliTable.month_bounds(jy, jm)
 
         # 2) two‐case filter
         # employees_qs = Employee.objects.filter(
@@ -2696,6 +2653,17 @@ def employee_report(request):
 @login_required(login_url='login')
 @permission_required('core.view_permanent_absent_report', raise_exception=True)
 def permanent_absent_report(request):
+    """
+    GET renders the filter form; POST renders the report of employees with a
+    run of consecutive absent days.
+
+    POST parameters besides the employee filters and page_size:
+      window_days  look-back from today in days (default PERMANENT_ABSENT_WINDOW_DAYS,
+                   clamped to 1..PERMANENT_ABSENT_MAX_WINDOW_DAYS)
+      min_days     shortest absence run listed (default PERMANENT_ABSENT_MIN_DAYS)
+
+    The form context carries the defaults and max_window_days for these inputs.
+    """
     all_emps = Employee.objects.filter(is_archive=False)
     departments = Department.objects.all()
     work_types = Employee.WORK_TYPE_CHOICES
@@ -2721,96 +2689,49 @@ def permanent_absent_report(request):
             messages.warning(request, _("No employees match those filters."))
             return redirect('permanent_absent_report')
 
-        # 2) Fixed 1-year window
-        today = date.today()
-        start_date = today - timedelta(days=60)
-
-        # 3) Bulk-fetch any log days
-        log_entries = AttendanceLog.objects.filter(
-            employee__in=emps,
-            timestamp__date__range=(start_date, today)
-        ).values_list('employee_id', 'timestamp__date').distinct()
-
-        present_dates = defaultdict(set)
-        for eid, d in log_entries:
-            present_dates[eid].add(d)
-
-        # 4) Bulk-fetch approved vacations
-        vac_qs = EmployeeVacation.objects.filter(
-            employee__in=emps,
-            status=EmployeeVacation.Status.APPROVED,
-            start_date__lte=today,
-            end_date__gte=start_date
-        ).values('employee_id', 'start_date', 'end_date')
-
-        vacations = defaultdict(list)
-        for e in vac_qs:
-            eid = e['employee_id']
-            s = max(e['start_date'], start_date)
-            t = min(e['end_date'], today)
-            vacations[eid].append((s, t))
-
-        def on_vac(eid, d):
-            return any(s <= d <= t for s, t in vacations.get(eid, ()))
-
-        # 5) For each emp, find *all* ≥20-day runs, then pick the **last** one
-        records = []
-        for emp in emps:
-            eid = emp.id
-            seq_start = None
-            d = start_date
-            runs = []
-
-            while d <= today:
-                if d in present_dates[eid] or on_vac(eid, d):
-                    # close a run if it was ongoing
-                    if seq_start:
-                        length = (d - seq_start).days
-                        if length >= 20:
-                            runs.append((seq_start, d - timedelta(days=1)))
-                        seq_start = None
-                else:
-                    # mark start of run
-                    if seq_start is None:
-                        seq_start = d
-                d += timedelta(days=1)
-
-            # tail-run
-            if seq_start:
-                length = (today - seq_start).days + 1
-                if length >= 20:
-                    runs.append((seq_start, today))
+        # 2) Look-back window and minimum run length
+        try:
+            window_days = int(request.POST.get('window_days') or PERMANENT_ABSENT_WINDOW_DAYS)
+            min_days = int(request.POST.get('min_days') or PERMANENT_ABSENT_MIN_DAYS)
+        except ValueError:
+            messages.error(request, _("Invalid window or minimum days."))
+            return redirect('permanent_absent_report')
+        window_days = max(1, min(window_days, PERMANENT_ABSENT_MAX_WINDOW_DAYS))
+        min_days = max(1, min_days)
 
-            # if we have any runs, take only the *last* one
-            if runs:
-                start_run, end_run = runs[-1]
-                days = (end_run - start_run).days + 1
+        today = date.today()
+        start_date = today - timedelta(days=window_days)
 
-                js = jdatetime.date.fromgregorian(date=start_run)
-                je = jdatetime.date.fromgregorian(date=end_run)
+        # 3) Latest absence run of each employee (computed in the database)
+        runs = get_absence_runs(emps, start_date, today, min_days)
 
-                records.append({
-                    'employee': emp,
-                    'start_date': f"{js.year}-{js.month:02d}-{js.day:02d}",
-                    'end_date': f"{je.year}-{je.month:02d}-{je.day:02d}",
-                    'days': days,
-                })
+        records = []
+        for emp in emps:
+            if emp.id not in runs:
+                continue
+            start_run, end_run = runs[emp.id]
+            records.append({
+                'employee': emp,
+                'start_date': JalaliTable.format(start_run, sep='-'),
+                'end_date': JalaliTable.format(end_run, sep='-'),
+                'days': (end_run - start_run).days + 1,
+            })
 
         if not records:
             messages.warning(
                 request,
-                _("No employees found with ≥20 consecutive absences in the past year.")
+                _("No employees found with ≥%(days)s consecutive absences in the selected window.") % {'days': min_days}
             )
             return redirect('permanent_absent_report')
 
-        # 6) Global numbering
+        # 4) Global numbering
         for idx, rec in enumerate(records, start=1):
             rec['row_num'] = idx
 
-        # 7) Paginate
+        # 5) Paginate
         pages = chunked(records, page_size)
 
-        # 8) Render
+        # 6) Render
         jtoday = jdatetime.date.fromgregorian(date=today)
         jdate_str = f"{jtoday.year}-{jtoday.month}-{jtoday.day}"
 
@@ -2824,6 +2745,8 @@ def permanent_absent_report(request):
             'pages': pages,
             'department_name': dept_name,
             'work_type_name': work_type_nm,
+            'window_days': window_days,
+            'min_days': min_days,
         })
 
     # GET → filter form
@@ -2832,6 +2755,9 @@ def permanent_absent_report(request):
         'departments': departments,
         'work_type_choices': work_types,
         'old': {},
+        'window_days': PERMANENT_ABSENT_WINDOW_DAYS,
+        'min_days': PERMANENT_ABSENT_MIN_DAYS,
+        'max_window_days': PERMANENT_ABSENT_MAX_WINDOW_DAYS,
     })
 
 @login_required(login_url='login')
@@ -11,7 +11,38 @@ MIN_YEAR = 1397
 MIN_OUT_DELTA = timedelta(minutes=15)  # threshold for minimum time between in/out
 MIN_LATE_DELTA = timedelta(hours=2)  # threshold for minimum time between log time and clock in/out window time
 AUTO_DOWNLOAD_ATT_LOGS_INTERVAL = 5  # the value is in minutes
+SYNC_MAX_WORKERS = 16  # devices polled in parallel during a sync cycle
+DEVICE_FETCH_TIMEOUT = 60  # seconds a device may take before it is skipped for the cycle
+SYNC_WRITE_BATCH_SIZE = 5000  # punches per bulk insert during sync
+SYNC_FULL_FETCH_INTERVAL = 15 * 60  # seconds an unchanged record count may skip the buffer transfer
+DEVICE_SESSION_IDLE_TIMEOUT = 60  # seconds a device that answered is trusted without a new online probe
+DEVICE_OFFLINE_RETRY = 15  # seconds a device that failed is reported offline without reconnecting
+# adaptive polling (seconds)
+POLL_TICK = 30  # how often the scheduler looks for devices that are due
+POLL_BASE_INTERVAL = AUTO_DOWNLOAD_ATT_LOGS_INTERVAL * 60
+POLL_PEAK_INTERVAL = 60  # busy devices during shift-change peaks
+POLL_QUIET_INTERVAL = 15 * 60  # devices without new punches outside peaks
+POLL_MAX_BACKOFF = 60 * 60  # ceiling of the offline backoff
+POLL_PEAK_MARGIN = 15 * 60  # widen clock-in/out windows by this much on each side
+SYNC_WORKER_LOCK_ID = 0x6F6E74696D65  # pg advisory lock key held by the active run_sync_worker
+DAILY_ATTENDANCE_LOCK_ID = 0x6F6E74696D66  # pg advisory lock key ordering DailyAttendance recomputes and invalidations
+SCHEDULE_VERSION_TTL = 10  # seconds a process outside a request trusts the schedule version it read
+SYNC_WORKER_STANDBY_RETRY = 5  # seconds between lock attempts of a standby worker
+SYNC_HISTORY_DAYS = 14  # sync run history kept for the metrics endpoint and history page
+BIOMETRIC_UPLOAD_CHUNK = 100  # employees per upload_users_with_templates_hr call of a bulk upload
+BIOMETRIC_UPLOAD_STALE = 10 * 60  # seconds without progress before a bulk upload job counts as dead
+DEVICE_FANOUT_WORKERS = 32  # devices written to in parallel by a per-employee biometric operation
+DEVICE_FANOUT_TIMEOUT = 30  # seconds a device may take before the operation is queued for retry
+DEVICE_OP_MAX_ATTEMPTS = 8  # failed replays before a queued biometric operation is marked failed
+DEVICE_OP_RETRY_BASE = 60  # seconds before the first retry of a failed replay, doubled per attempt
+DEVICE_OP_RETRY_MAX = 6 * 60 * 60  # ceiling of that backoff
+DEVICE_HEARTBEAT_INTERVAL = 60  # seconds between fleet status probes of the active sync worker
 CLEAR_ATT_LOGS_IF_MORE_THAN = 200  # the value is describing the number of logs
+PERMANENT_ABSENT_MIN_DAYS = 20  # shortest absence run listed in the permanent absent report
+PERMANENT_ABSENT_WINDOW_DAYS = 60  # default look-back of the permanent absent report
+PERMANENT_ABSENT_MAX_WINDOW_DAYS = 5 * 365
+REQUEST_PROFILE_BUFFER_SIZE = 5000  # profiled requests kept in memory (per process) for the profiling page
+REQUEST_PROFILE_TOP_QUERIES = 5  # slowest SQL statements kept per profiled request
 # this is for UFace800 pro
 VERIFICATION_MAP = {
     0: AttendanceLog.VerificationType.MANUAL,
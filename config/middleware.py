@@ -1,6 +1,12 @@
 # core/middleware.py
+import random
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.utils import translation
 
+from core.request_profiler import RequestProfile, profile_stream
+
 class ForcePersianMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -13,3 +19,34 @@ class ForcePersianMiddleware:
         response = self.get_response(request)
         response.headers.setdefault("Content-Language", 'fa')
         return response
+
+
+class RequestProfilingMiddleware:
+    """
+    Profile a sampled share of the requests into the in-memory ring buffer of
+    core.request_profiler (REQUEST_PROFILING, REQUEST_PROFILING_SAMPLE_RATE).
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        profile = request._profile = RequestProfile(request)
+        with profile:
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = profile_stream(profile, response.streaming_content, response)
+        else:
+            profile.finish(response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, '_profile', None)
+        if profile is not None:
+            view = getattr(view_func, 'view_class', view_func)  # class-based views
+            profile.view = f"{view.__module__}.{view.__name__}"
@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'config.middleware.RequestProfilingMiddleware',  # no-op unless REQUEST_PROFILING is on
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',  # it's for localization
     'config.middleware.ForcePersianMiddleware',
@@ -165,3 +166,7 @@ WHITENOISE_MAX_AGE = 31536000
 
 AUTH_USER_MODEL = 'users.User'
 BACKUP_ZIP_PASSWORD = os.getenv('BACKUP_ZIP_PASSWORD', 's#3cr@ontime.AF3t')
+SYNC_METRICS_TOKEN = os.getenv('SYNC_METRICS_TOKEN')  # bearer token for Prometheus scrapes of sync metrics
+QUERY_BUDGET_ENFORCE = os.getenv('QUERY_BUDGET_ENFORCE') == '1'  # raise when a view exceeds its @query_budget
+REQUEST_PROFILING = os.getenv('REQUEST_PROFILING') == '1'  # opt-in request profiling, see core/request_profiler.py
+REQUEST_PROFILING_SAMPLE_RATE = float(os.getenv('REQUEST_PROFILING_SAMPLE_RATE', '0.1'))  # share of requests profiled
@@ -19,6 +19,7 @@ urlpatterns += [
 
     path('dashboard/', views.dashboard, name='dashboard'),
     path('dashboard_data/', views.dashboard_data, name='dashboard_data'),
+    path('profiling/', views.request_profiles, name='request_profiles'),
 
     path("notifications/", include("notifications.urls", namespace="notifications")),
 
@@ -0,0 +1,284 @@
+# core/attendance_engine.py
+"""
+Array based attendance classification shared by every dashboard and report helper.
+
+Punches are flattened into parallel NumPy arrays (employee index, day index,
+seconds-of-day) and schedule windows into (employee × day) grids, so a whole
+month is classified with a handful of vectorised operations instead of
+per-employee / per-day Python loops.
+
+Window rules (identical for every caller):
+  - a window [start, end] with start <= end matches start <= t <= end
+  - a window with start > end wraps past midnight: t >= start or t <= end
+  - a schedule is overnight when its clock-out belongs to the next calendar
+    day (out_start < in_start, out_end < in_start or out_start > out_end);
+    the clock-out of an overnight day is searched in the next day's punches.
+"""
+from datetime import timedelta
+
+import numpy as np
+
+NO_TIME = -1
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def time_to_seconds(value):
+    """
+    Convert a datetime.time to seconds after midnight (NO_TIME for None).
+    """
+    if value is None:
+        return NO_TIME
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def schedule_window(sch):
+    """
+    Returns (in_start, in_end, out_start, out_end) of a ShiftSchedule in seconds.
+    Missing schedule or missing times are NO_TIME.
+    """
+    if sch is None:
+        return NO_TIME, NO_TIME, NO_TIME, NO_TIME
+    return (
+        time_to_seconds(sch.in_start_time),
+        time_to_seconds(sch.in_end_time),
+        time_to_seconds(sch.out_start_time),
+        time_to_seconds(sch.out_end_time),
+    )
+
+
+def is_overnight(in_start, out_start, out_end):
+    """
+    Element-wise overnight test on second-of-day values (scalars or arrays).
+    """
+    in_start = np.asarray(in_start)
+    out_start = np.asarray(out_start)
+    out_end = np.asarray(out_end)
+    complete = (in_start >= 0) & (out_start >= 0) & (out_end >= 0)
+    return complete & ((out_start < in_start) | (out_end < in_start) | (out_start > out_end))
+
+
+def is_overnight_schedule(sch):
+    """
+    Scalar helper for a single ShiftSchedule (False when sch is None).
+    """
+    in_s, _, out_s, out_e = schedule_window(sch)
+    return bool(is_overnight(in_s, out_s, out_e))
+
+
+def in_window(sec, start, end):
+    """
+    Element-wise window membership; NO_TIME bounds never match.
+    """
+    valid = (start >= 0) & (end >= 0)
+    straight = (start <= end) & (sec >= start) & (sec <= end)
+    wrapped = (start > end) & ((sec >= start) | (sec <= end))
+    return valid & (straight | wrapped)
+
+
+class WindowGrid:
+    """
+    Schedule windows for every (employee, day) cell of a report, in seconds.
+
+    Attributes are (E, D) arrays: has_schedule, in_start, in_end,
+    out_start, out_end and overnight.
+    """
+
+    def __init__(self, has_schedule, in_start, in_end, out_start, out_end):
+        self.has_schedule = has_schedule
+        self.in_start = in_start
+        self.in_end = in_end
+        self.out_start = out_start
+        self.out_end = out_end
+        self.overnight = is_overnight(in_start, out_start, out_end)
+
+    @property
+    def shape(self):
+        return self.has_schedule.shape
+
+    @classmethod
+    def empty(cls, n_emps, n_days):
+        """
+        Grid without any schedule (used when is_follow_schedule=False).
+        """
+        blank = np.full((n_emps, n_days), NO_TIME, dtype=np.int32)
+        return cls(np.zeros((n_emps, n_days), dtype=bool), blank, blank.copy(), blank.copy(), blank.copy())
+
+    @classmethod
+    def build(cls, emp_shift_ids, dates, resolve):
+        """
+        emp_shift_ids: shift_id per employee (in report row order)
+        dates:         Gregorian dates of the report columns
+        resolve:       callable(shift_ids, dates) -> (scheduled (S, D) bool,
+                       windows (S, D, 4) seconds), e.g. schedule_calendar.resolve_windows
+
+        Windows are resolved once per (shift, day) and broadcast to employees.
+        """
+        shift_ids = list(dict.fromkeys(emp_shift_ids))
+        shift_row = {sid: i for i, sid in enumerate(shift_ids)}
+        n_days = len(dates)
+
+        rows = np.array([shift_row[sid] for sid in emp_shift_ids], dtype=np.intp)
+        if rows.size == 0:
+            return cls.empty(0, n_days)
+        scheduled, table = resolve(shift_ids, dates)
+        cells = table[rows]
+        return cls(scheduled[rows], cells[..., 0], cells[..., 1], cells[..., 2], cells[..., 3])
+
+
+class PunchArrays:
+    """
+    Punches as parallel arrays sorted by (employee, timestamp).
+
+    rows:      iterable of (employee_id, timestamp, *extra) tuples
+    emp_index: {employee_id: row index in the report}
+    origin:    Gregorian date of day index 0
+    n_days:    number of report days; punches on day n_days are kept so
+               overnight clock-outs of the last day can be matched
+
+    self.rows keeps the original tuples in sorted order, so callers can read
+    extra columns (verification type, device …) of a matched index.
+    """
+
+    def __init__(self, rows, emp_index, origin, n_days):
+        rows = [r for r in rows if r[0] in emp_index]
+        stamps = np.array([r[1] for r in rows], dtype='datetime64[s]')
+        emp = np.array([emp_index[r[0]] for r in rows], dtype=np.int64)
+
+        day_start = stamps.astype('datetime64[D]')
+        day = (day_start - np.datetime64(origin, 'D')).astype(np.int64)
+        sec = (stamps - day_start).astype(np.int64)
+
+        keep = (day >= 0) & (day <= n_days)
+        order = np.lexsort((stamps[keep].astype(np.int64), emp[keep]))
+        kept = np.flatnonzero(keep)[order]
+
+        self.rows = [rows[i] for i in kept]
+        self.emp = emp[kept]
+        self.day = day[kept]
+        self.sec = sec[kept]
+        self.n_days = n_days
+
+    def __len__(self):
+        return len(self.rows)
+
+    def mask(self, predicate):
+        """
+        Boolean array of predicate(row) for every punch (row order).
+        """
+        return np.fromiter((bool(predicate(r)) for r in self.rows), dtype=bool, count=len(self.rows))
+
+    def cell_any(self, mask, n_emps):
+        """
+        (E, D) array: True where at least one punch selected by mask falls on the cell's day.
+        """
+        out = np.zeros((n_emps, self.n_days + 1), dtype=bool)
+        out[self.emp[mask], self.day[mask]] = True
+        return out[:, :self.n_days]
+
+
+class Classification:
+    """
+    Result of classify(); every attribute is an (E, D) array.
+
+    in_idx     index of the first punch inside the clock-in window, -1 if none
+    out_idx    index of the first punch inside the clock-out window (next-day
+               punches for overnight schedules), -1 if none
+    first_idx  earliest punch of the day, -1 if none
+    last_idx   latest punch of the day, -1 if none
+    day_count  number of punches on the day
+    next_count number of punches on the following day
+    """
+
+    def __init__(self, punches, grid, in_idx, out_idx, first_idx, last_idx, day_count, next_count):
+        self.punches = punches
+        self.grid = grid
+        self.in_idx = in_idx
+        self.out_idx = out_idx
+        self.first_idx = first_idx
+        self.last_idx = last_idx
+        self.day_count = day_count
+        self.next_count = next_count
+
+    def seconds(self, idx):
+        """
+        Seconds-of-day of the punches referenced by an index array (NO_TIME where idx < 0).
+        """
+        if not len(self.punches):
+            return np.full(idx.shape, NO_TIME, dtype=np.int64)
+        return np.where(idx >= 0, self.punches.sec[np.maximum(idx, 0)], NO_TIME)
+
+
+def _first_hit(cells, hit, size):
+    # cells are non-decreasing (punches sorted by employee, timestamp),
+    # so the first occurrence of a cell is its earliest matching punch
+    out = np.full(size, -1, dtype=np.int64)
+    idx = np.flatnonzero(hit)
+    if idx.size:
+        found, pos = np.unique(cells[idx], return_index=True)
+        out[found] = idx[pos]
+    return out
+
+
+def _pad_day(arr, fill):
+    # one extra column for the day after the report (never scheduled)
+    return np.concatenate([arr, np.full((arr.shape[0], 1), fill, dtype=arr.dtype)], axis=1).ravel()
+
+
+def classify(punches, grid):
+    """
+    Match punches against schedule windows for every (employee, day) cell.
+    """
+    n_emps, n_days = grid.shape
+    width = n_days + 1
+    size = n_emps * width
+
+    cell = punches.emp * width + punches.day
+    sec = punches.sec
+
+    first = np.full(size, -1, dtype=np.int64)
+    count = np.zeros(size, dtype=np.int64)
+    if cell.size:
+        found, start, cnt = np.unique(cell, return_index=True, return_counts=True)
+        first[found] = start
+        count[found] = cnt
+    last = np.where(count > 0, first + count - 1, -1)
+
+    in_s = _pad_day(grid.in_start, NO_TIME)
+    in_e = _pad_day(grid.in_end, NO_TIME)
+    out_s = _pad_day(grid.out_start, NO_TIME)
+    out_e = _pad_day(grid.out_end, NO_TIME)
+    overnight = _pad_day(grid.overnight, False)
+
+    # clock-in: same-day punches only
+    in_hit = in_window(sec, in_s[cell], in_e[cell])
+    in_idx = _first_hit(cell, in_hit, size)
+
+    # clock-out: same day for regular schedules …
+    same_hit = ~overnight[cell] & in_window(sec, out_s[cell], out_e[cell])
+    out_same = _first_hit(cell, same_hit, size)
+
+    # … previous day's window for overnight schedules
+    prev = np.maximum(cell - 1, 0)
+    prev_hit = (punches.day > 0) & overnight[prev] & in_window(sec, out_s[prev], out_e[prev])
+    out_prev = _first_hit(prev, prev_hit, size)
+
+    out_idx = np.where(out_same >= 0, out_same, out_prev)
+
+    shape = (n_emps, width)
+    count = count.reshape(shape)
+    return Classification(
+        punches, grid,
+        in_idx=in_idx.reshape(shape)[:, :n_days],
+        out_idx=out_idx.reshape(shape)[:, :n_days],
+        first_idx=first.reshape(shape)[:, :n_days],
+        last_idx=last.reshape(shape)[:, :n_days],
+        day_count=count[:, :n_days],
+        next_count=count[:, 1:],
+    )
+
+
+def month_dates(gstart, gend):
+    """
+    List of Gregorian dates from gstart to gend (inclusive).
+    """
+    return [gstart + timedelta(days=i) for i in range((gend - gstart).days + 1)]
@@ -0,0 +1,146 @@
+# core/benchmarks.py
+"""
+Benchmarks of the attendance computations behind the reports and the dashboard.
+
+Every case is timed `repeat` times (best and median wall time), then run once
+more with query capture and tracemalloc for the query count and the peak
+Python/NumPy memory. Results are plain dicts, so they can be saved as a JSON
+baseline and compared on the next run: compare() lists the metrics that got
+worse than the baseline by more than the tolerance.
+
+Reports that read DailyAttendance are measured cold (materialized rows
+dropped before every run) and warm.
+"""
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import date
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from attendance.partitions import current_month
+from core.utils import (
+    dashboard_get_attendance_by_department, dashboard_get_daily_attendance, dashboard_get_monthly_attendance,
+    get_attendance_summary, get_daily_attendance, get_monthly_attendance, invalidate_daily_attendance,
+)
+from employee.models import Employee
+from libraries.pdate.persian.jalali_table import JalaliTable
+
+WALL_NOISE = 0.005  # seconds of wall time growth never reported as a regression
+
+
+def benchmark_cases(year, month, att_date):
+    """
+    Returns: [(name, call, setup or None), ...] for one Jalali month and one day.
+    """
+    gstart, gend = JalaliTable.month_bounds(year, month)
+
+    def employees():
+        return Employee.objects.filter(is_archive=False)
+
+    def drop_facts():
+        invalidate_daily_attendance(start=gstart, end=gend)
+
+    return [
+        ('dashboard_get_daily_attendance',
+         lambda: dashboard_get_daily_attendance(att_date), None),
+        ('dashboard_get_monthly_attendance',
+         lambda: dashboard_get_monthly_attendance(year, month), None),
+        ('dashboard_get_attendance_by_department',
+         lambda: dashboard_get_attendance_by_department(att_date), None),
+        ('get_daily_attendance',
+         lambda: get_daily_attendance(att_date, employee_qs=employees().select_related('user')), None),
+        ('get_monthly_attendance (cold)',
+         lambda: get_monthly_attendance(year, month, employee_qs=employees()), drop_facts),
+        ('get_monthly_attendance',
+         lambda: get_monthly_attendance(year, month, employee_qs=employees()), None),
+        ('get_monthly_attendance (stream)',
+         lambda: list(get_monthly_attendance(year, month, employee_qs=employees(), stream=True)[1]), None),
+        ('get_attendance_summary (cold)',
+         lambda: get_attendance_summary(year, month, employee_qs=employees()), drop_facts),
+        ('get_attendance_summary',
+         lambda: get_attendance_summary(year, month, employee_qs=employees()), None),
+    ]
+
+
+def measure(call, setup=None, repeat=3):
+    """
+    Returns: {'wall', 'wall_median', 'queries', 'peak_kb'} of one case.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        began = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - began)
+
+    # instrumented run: queries and peak memory (tracemalloc slows the run, so it is not timed)
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall': round(min(times), 4),
+        'wall_median': round(statistics.median(times), 4),
+        'queries': len(queries),
+        'peak_kb': peak // 1024,
+    }
+
+
+def run_benchmarks(year=None, month=None, att_date=None, repeat=3, only=None):
+    """
+    Measure every case (or the names in `only`).
+    Returns: {name: metrics}
+    """
+    if year is None or month is None:
+        year, month = current_month()
+    att_date = att_date or date.today()
+    results = {}
+    for name, call, setup in benchmark_cases(year, month, att_date):
+        if only and name not in only:
+            continue
+        call()  # warm-up: schedule calendar, imports, first-use caches
+        results[name] = measure(call, setup, repeat)
+    return results
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Metrics worse than the baseline: wall time and peak memory beyond
+    `tolerance` (a fraction), any increase of the query count.
+    Returns: [(name, metric, baseline value, current value), ...]
+    """
+    regressions = []
+    for name, now in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if now['wall'] > base['wall'] * (1 + tolerance) and now['wall'] - base['wall'] > WALL_NOISE:
+            regressions.append((name, 'wall', base['wall'], now['wall']))
+        if now['queries'] > base['queries']:
+            regressions.append((name, 'queries', base['queries'], now['queries']))
+        if now['peak_kb'] > base['peak_kb'] * (1 + tolerance):
+            regressions.append((name, 'peak_kb', base['peak_kb'], now['peak_kb']))
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
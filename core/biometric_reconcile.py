@@ -0,0 +1,150 @@
+# core/biometric_reconcile.py
+"""
+Delta reconciliation of BiometricRecord with the users on a device.
+
+Each template (and card number) is reduced to a content hash. The hashes of
+what a device holds are kept in DeviceUser, so a reconciliation only compares
+hashes and pushes the users whose card or fingerprints differ instead of
+re-sending every template.
+
+The ledger is trusted while the device still reports the user/fingerprint
+counts it had at the end of the previous reconciliation. When they moved
+(enrolment on the device, a wipe, a per-employee upload) the inventory is
+read back from the device first, with one buffered read of its user table
+and one of its template table.
+"""
+import hashlib
+
+from django.db import transaction
+
+from attendance.models import Device, DeviceUser
+from employee.models import Employee
+from core.biometric_upload import biometric_employees, card_number, fingerprint_records
+from vendors.build.manager import (
+    build_emp_finger, delete_user_card, delete_user_templates, get_device_info, get_templates, get_users,
+    set_user, set_user_templates,
+)
+
+
+def content_hash(value):
+    return hashlib.sha1(str(value).encode()).hexdigest()
+
+
+def desired_inventory():
+    """
+    What every device should hold, from BiometricRecord.
+    Returns: ({user_id: {'card': hash, 'fingers': {fid: hash}}}, {user_id: (employee, fingerprint records)}).
+    """
+    wanted, sources = {}, {}
+    for emp in biometric_employees(is_archive=False):
+        if not emp.upload_records:
+            continue
+        records = fingerprint_records(emp)
+        wanted[emp.employee_id] = {
+            'card': content_hash(card_number(emp.upload_records)),
+            'fingers': {str(rec.finger_position): content_hash(rec.template_data) for rec in records},
+        }
+        sources[emp.employee_id] = (emp, records)
+    return wanted, sources
+
+
+def read_inventory(cfg, user_ids):
+    """
+    Card and template hashes of the given users as stored on the device.
+    Two bulk reads whatever the number of users; the hashing is local.
+    """
+    keys = {str(uid): uid for uid in user_ids}
+    inventory = {}
+    for user in get_users(cfg) or []:
+        uid = keys.get(str(user.get('user_id')))
+        if uid is not None:
+            inventory[uid] = {'card': content_hash(user.get('card') or 0), 'fingers': {}}
+    for tpl in get_templates(cfg) or []:
+        have = inventory.get(keys.get(str(tpl.get('user_id'))))
+        if have is not None:
+            have['fingers'][str(tpl.get('fid'))] = content_hash(tpl.get('template'))
+    return inventory
+
+
+def _device_counts(cfg):
+    counts = (get_device_info(cfg) or {}).get('counts', {})
+    return counts.get('users'), counts.get('fingers')
+
+
+def reconcile_device(device, session, remove_archived=False):
+    """
+    Push missing/changed users to one device and, optionally, strip the
+    biometrics of archived employees from it.
+    Returns: {'read': bool, 'users': pushed users, 'templates': pushed templates,
+              'removed': cleaned users, 'failed': users whose write failed}
+    """
+    wanted, sources = desired_inventory()
+    archived = set()
+    if remove_archived:
+        archived = set(
+            Employee.objects.filter(is_archive=True).exclude(employee_id__in=wanted)
+            .values_list('employee_id', flat=True)
+        ) - {None, ''}
+    summary = {'read': False, 'users': 0, 'templates': 0, 'removed': 0, 'failed': 0}
+
+    with session.use(timeout=400) as cfg:
+        # 1) Known inventory: the ledger, or the device itself when it changed behind our back
+        ledger = {
+            du.user_id: {'card': du.card_hash, 'fingers': du.finger_hashes}
+            for du in DeviceUser.objects.filter(device=device)
+        }
+        if _device_counts(cfg) != (device.inventory_users, device.inventory_fingers):
+            ledger = read_inventory(cfg, set(wanted) | set(ledger) | archived)
+            summary['read'] = True
+
+        # 2) Push users whose card or fingerprints differ
+        for uid, want in wanted.items():
+            have = ledger.get(uid)
+            if have == want:
+                continue
+            emp, records = sources[uid]
+            try:
+                if have is None or have['card'] != want['card']:
+                    privilege = 14 if emp.is_device_admin else 0  # 14 = admin, 0 = normal user
+                    if not set_user(cfg, user_id=str(uid), name='', privilege=privilege,
+                                    card=card_number(emp.upload_records)):
+                        raise RuntimeError('set_user failed')
+                if have is None or have['fingers'] != want['fingers']:
+                    if have and set(have['fingers']) - set(want['fingers']):
+                        delete_user_templates(cfg, user_id=uid)  # drop fingers removed from the DB
+                    if records:
+                        fingers = [build_emp_finger(uid, rec) for rec in records]
+                        if not set_user_templates(cfg, user_id=uid, templates=fingers):
+                            raise RuntimeError('set_user_templates failed')
+                        summary['templates'] += len(fingers)
+                ledger[uid] = want
+                summary['users'] += 1
+            except Exception as e:
+                print(f"⚠️ Couldn't reconcile {uid} on {device.name}: {e}")
+                ledger.pop(uid, None)  # unknown state: re-read or re-push next time
+                summary['failed'] += 1
+
+        # 3) Strip archived employees
+        for uid in archived & set(ledger):
+            try:
+                delete_user_templates(cfg, user_id=uid)
+                delete_user_card(cfg, user_id=uid)
+                del ledger[uid]
+                summary['removed'] += 1
+            except Exception as e:
+                print(f"⚠️ Couldn't remove {uid} from {device.name}: {e}")
+
+        users, fingers = _device_counts(cfg)
+
+    # 4) Persist the ledger and the counts it matches
+    with transaction.atomic():
+        DeviceUser.objects.filter(device=device).delete()
+        DeviceUser.objects.bulk_create([
+            DeviceUser(device=device, user_id=uid, card_hash=have['card'], finger_hashes=have['fingers'])
+            for uid, have in ledger.items()
+        ])
+        Device.objects.filter(pk=device.pk).update(
+            inventory_users=None if summary['failed'] else users,
+            inventory_fingers=None if summary['failed'] else fingers,
+        )
+    return summary
@@ -0,0 +1,162 @@
+# core/biometric_upload.py
+"""
+Bulk upload of every active employee's fingerprints and card to one device.
+
+The upload runs as a BiometricUploadJob on a background thread instead of
+inside the HTTP request. Fingerprint and RFID records of all employees are
+loaded with a single prefetch, and users are sent to the device in chunks of
+BIOMETRIC_UPLOAD_CHUNK through upload_users_with_templates_hr, with the job
+record updated after every chunk.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.utils.timezone import now
+from django.utils.translation import gettext as _
+
+from attendance.models import BiometricRecord, BiometricUploadJob
+from config.constants import BIOMETRIC_UPLOAD_CHUNK, BIOMETRIC_UPLOAD_STALE
+from core.device_sessions import acquire_session
+from employee.models import Employee
+from vendors.build.manager import build_emp_finger, build_emp_user, upload_users_with_templates_hr
+
+# one upload at a time per web process; devices handle a single bulk write badly enough
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='biometric-upload')
+
+
+def card_number(records):
+    """
+    Card number of the newest RFID record among records (0 when none or invalid).
+    """
+    # records are newest first: the latest card wins
+    for rec in records:
+        if rec.biometric_type == BiometricRecord.BiometricType.RFID:
+            try:
+                return int(rec.template_data)
+            except (TypeError, ValueError):
+                return 0
+    return 0
+
+
+def fingerprint_records(emp):
+    return [
+        rec for rec in emp.upload_records
+        if rec.biometric_type == BiometricRecord.BiometricType.FINGERPRINT
+    ]
+
+
+def biometric_employees(**filters):
+    """
+    Employees with their fingerprint and RFID records, newest first, prefetched
+    in one query as `upload_records`.
+    """
+    return Employee.objects.filter(**filters).prefetch_related(
+        Prefetch(
+            'biometric_records',
+            queryset=BiometricRecord.objects.filter(biometric_type__in=[
+                BiometricRecord.BiometricType.FINGERPRINT,
+                BiometricRecord.BiometricType.RFID,
+            ]).order_by('-created_at'),
+            to_attr='upload_records',
+        )
+    )
+
+
+def build_upload_data():
+    """
+    (ZK user, fingerprint templates) of every active employee with fingerprints.
+    Returns: list of (bio_user, fingers).
+    """
+    data = []
+    for emp in biometric_employees(is_archive=False):
+        records = fingerprint_records(emp)
+        if not records:
+            continue
+
+        fingers = []
+        for rec in records:
+            try:
+                fingers.append(build_emp_finger(emp.employee_id, rec))
+            except Exception:
+                continue
+        data.append((build_emp_user(emp, card_number(emp.upload_records)), fingers))
+    return data
+
+
+def _update(job, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    BiometricUploadJob.objects.filter(pk=job.pk).update(updated_at=now(), **fields)
+
+
+def run_upload_job(job_id):
+    """
+    Upload all biometric data for a job; always leaves the job finished.
+    """
+    job = BiometricUploadJob.objects.select_related('device').get(pk=job_id)
+    if job.status != BiometricUploadJob.Status.WORKING:
+        return  # given up on while it waited in the queue
+    try:
+        # 1) Collect users and templates in one round of queries
+        data = build_upload_data()
+        if not data:
+            _update(job, status=BiometricUploadJob.Status.ERROR, progress=100,
+                    error=_('No fingerprint data found to upload.'))
+            return
+        _update(job, total=len(data))
+
+        session = acquire_session(job.device)
+        if session is None:
+            _update(job, status=BiometricUploadJob.Status.ERROR, progress=100,
+                    error=_('Device "%(name)s" is offline.') % {'name': job.device.name})
+            return
+
+        # 2) Stream the users to the device chunk by chunk
+        for i in range(0, len(data), BIOMETRIC_UPLOAD_CHUNK):
+            chunk = data[i:i + BIOMETRIC_UPLOAD_CHUNK]
+            with session.use(timeout=400) as cfg:
+                success = upload_users_with_templates_hr(cfg, chunk)
+            if not success:
+                _update(job, status=BiometricUploadJob.Status.ERROR, progress=100,
+                        error=_('Upload failed. Please check device connection or data integrity.'))
+                return
+            processed = i + len(chunk)
+            _update(job, processed=processed, progress=min(round(processed / len(data) * 100), 99))
+
+        _update(job, status=BiometricUploadJob.Status.SUCCESS, progress=100)
+    except Exception as e:
+        _update(job, status=BiometricUploadJob.Status.ERROR, progress=100, error=str(e))
+    finally:
+        # the thread's own connection; the pool thread outlives the request
+        connection.close()
+
+
+def start_upload_job(device, task_id, user=None):
+    """
+    Record a new upload job for the device and queue it.
+    Returns: the BiometricUploadJob.
+    """
+    job = BiometricUploadJob.objects.create(task_id=task_id, device=device, requested_by=user)
+    transaction.on_commit(lambda: _executor.submit(run_upload_job, job.pk))
+    return job
+
+
+def job_state(task_id):
+    """
+    Progress of an upload job for check_upload_progress. A job whose record
+    has not moved for BIOMETRIC_UPLOAD_STALE seconds died with its process.
+    """
+    job = BiometricUploadJob.objects.filter(task_id=task_id).first()
+    if job is None:
+        return {'progress': 0, 'status': BiometricUploadJob.Status.WORKING}
+    if job.status == BiometricUploadJob.Status.WORKING and job.updated_at < now() - timedelta(seconds=BIOMETRIC_UPLOAD_STALE):
+        _update(job, status=BiometricUploadJob.Status.ERROR, progress=100, error=_('Upload was interrupted.'))
+    return {
+        'progress': job.progress,
+        'status': job.status,
+        'processed': job.processed,
+        'total': job.total,
+        'error': job.error,
+    }
@@ -0,0 +1,216 @@
+# core/device_fanout.py
+"""
+Per-employee biometric writes fanned out to many devices at once.
+
+Every device gets its own pool thread and all of them share one
+DEVICE_FANOUT_TIMEOUT deadline counted from submission (calls still queued
+behind a busy pool included), so enrolling on 30 devices costs about one
+device round-trip and a request never waits longer than the deadline. Devices that are offline or miss the deadline
+do not fail the request: the operation is stored as a PendingDeviceOp and
+replayed by the sync cycle once the device answers again. A replay that
+fails is retried with exponential backoff and given up (marked failed)
+after DEVICE_OP_MAX_ATTEMPTS attempts.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+
+from attendance.models import BiometricRecord, PendingDeviceOp
+from config.constants import (
+    DEVICE_FANOUT_TIMEOUT, DEVICE_FANOUT_WORKERS, DEVICE_OP_MAX_ATTEMPTS, DEVICE_OP_RETRY_BASE, DEVICE_OP_RETRY_MAX,
+)
+from core.device_sessions import acquire_session
+from vendors.build.manager import build_emp_finger, delete_user_card, delete_user_templates, set_user, set_user_templates
+
+# per-device results
+OK = 'ok'
+FAILED = 'failed'
+OFFLINE = 'offline'
+TIMEOUT = 'timeout'
+
+Operation = PendingDeviceOp.Operation
+
+# an upload supersedes a pending delete of the same data and vice versa
+_OPPOSITE = {
+    Operation.UPLOAD_FINGERS: Operation.DELETE_FINGERS,
+    Operation.DELETE_FINGERS: Operation.UPLOAD_FINGERS,
+    Operation.UPLOAD_CARD: Operation.DELETE_CARD,
+    Operation.DELETE_CARD: Operation.UPLOAD_CARD,
+}
+
+_pool = ThreadPoolExecutor(max_workers=DEVICE_FANOUT_WORKERS, thread_name_prefix='device-fanout')
+
+
+def operation_call(operation, employee):
+    """
+    Vendor call for an operation, built from the employee's current records.
+    Returns: (func, kwargs), or None when there is nothing to send.
+    """
+    user_id = employee.employee_id
+    if operation == Operation.UPLOAD_FINGERS:
+        records = BiometricRecord.objects.filter(
+            employee=employee, biometric_type=BiometricRecord.BiometricType.FINGERPRINT
+        )
+        fingers = [build_emp_finger(user_id, rec) for rec in records]
+        if not fingers:
+            return None
+        return set_user_templates, {'user_id': user_id, 'templates': fingers}
+
+    if operation == Operation.UPLOAD_CARD:
+        card_record = BiometricRecord.objects.filter(
+            employee=employee, biometric_type=BiometricRecord.BiometricType.RFID
+        ).order_by('-created_at').first()
+        try:
+            card = int(card_record.template_data)
+        except (AttributeError, TypeError, ValueError):
+            return None
+        privilege = 14 if employee.is_device_admin else 0  # 14 = admin, 0 = normal user
+        return set_user, {'user_id': str(user_id), 'name': '', 'privilege': privilege, 'card': card}
+
+    if operation == Operation.DELETE_FINGERS:
+        return delete_user_templates, {'user_id': user_id}
+    return delete_user_card, {'user_id': user_id}
+
+
+def _run(device, calls):
+    # runs in a pool thread: device I/O only, no database access
+    session = acquire_session(device)
+    if session is None:
+        return None
+    results = []
+    for func, kwargs in calls:
+        try:
+            results.append((bool(session.call(func, **kwargs)), ''))
+        except Exception as e:
+            results.append((False, str(e)))
+    return results
+
+
+def _fan_out(jobs):
+    """
+    Run a list of vendor calls on each device concurrently, within one
+    DEVICE_FANOUT_TIMEOUT deadline for all of them.
+    jobs: {device: [(func, kwargs), ...]}
+    Returns: {device pk: None (offline), TIMEOUT, or [(ok, error), ...] per call}
+    """
+    futures = {_pool.submit(_run, device, calls): device for device, calls in jobs.items()}
+    done, not_done = wait(futures, timeout=DEVICE_FANOUT_TIMEOUT)
+    results = {}
+    for future in done:
+        device = futures[future]
+        try:
+            results[device.pk] = future.result()
+        except Exception as e:
+            results[device.pk] = [(False, str(e))] * len(jobs[device])
+    for future in not_done:
+        future.cancel()  # still queued: never sent; a running call finishes on its own
+        results[futures[future].pk] = TIMEOUT
+    return results
+
+
+def run_on_devices(devices, operation, employee):
+    """
+    Apply one operation for an employee on every device in parallel and queue
+    it for the devices that could not be reached.
+    Returns: list of {'id', 'name', 'status', 'queued'} per device.
+    """
+    call = operation_call(operation, employee)
+    if call is None:
+        return [{'id': d.id, 'name': d.name, 'status': FAILED, 'queued': False} for d in devices]
+
+    outcome = _fan_out({device: [call] for device in devices})
+    report, unreachable, reached = [], [], []
+    for device in devices:
+        result = outcome[device.pk]
+        if result is None or result is TIMEOUT:
+            status = OFFLINE if result is None else TIMEOUT
+            unreachable.append(device)
+        else:
+            status = OK if result[0][0] else FAILED
+            if status == OK:
+                reached.append(device)
+        report.append({'id': device.id, 'name': device.name, 'status': status, 'queued': status in (OFFLINE, TIMEOUT)})
+
+    # this write settles any older pending op on the devices it reached
+    PendingDeviceOp.objects.filter(
+        employee=employee, device__in=reached, operation__in=[operation, _OPPOSITE[operation]]
+    ).delete()
+    queue_operation(unreachable, operation, employee)
+    return report
+
+
+def summarize(report):
+    """
+    Returns: (devices written, devices queued for retry) of a run_on_devices report.
+    """
+    return sum(r['status'] == OK for r in report), sum(r['queued'] for r in report)
+
+
+def queue_operation(devices, operation, employee):
+    if not devices:
+        return
+    PendingDeviceOp.objects.filter(employee=employee, device__in=devices, operation=_OPPOSITE[operation]).delete()
+    # queued again: an op already waiting (or given up) starts over
+    PendingDeviceOp.objects.bulk_create(
+        [PendingDeviceOp(device=device, employee=employee, operation=operation) for device in devices],
+        update_conflicts=True,
+        unique_fields=['device', 'employee', 'operation'],
+        update_fields=['attempts', 'last_error', 'next_attempt_at', 'is_failed'],
+    )
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(DEVICE_OP_RETRY_BASE * 2 ** attempts, DEVICE_OP_RETRY_MAX))
+
+
+def replay_pending_ops(devices):
+    """
+    Replay queued operations on devices that are reachable again, skipping
+    ops that are backing off or have been given up.
+    Returns: the number of operations applied.
+    """
+    now = datetime.now()
+    ops = list(
+        PendingDeviceOp.objects
+        .filter(device__in=devices, is_failed=False)
+        .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+        .select_related('device', 'employee')
+    )
+    if not ops:
+        return 0
+
+    # 1) Rebuild the payloads from the current records (DB work stays on this thread)
+    jobs, queued, stale = defaultdict(list), defaultdict(list), []
+    by_pk = {}
+    for op in ops:
+        call = operation_call(op.operation, op.employee)
+        if call is None:
+            stale.append(op.pk)  # records were removed since; nothing left to send
+            continue
+        jobs[by_pk.setdefault(op.device_id, op.device)].append(call)
+        queued[op.device_id].append(op)
+
+    # 2) Send, then drop what was applied and back off the rest
+    applied, failed = list(stale), []
+    for pk, result in _fan_out(dict(jobs)).items():
+        if result is None or result is TIMEOUT:
+            error = OFFLINE if result is None else TIMEOUT
+            failed.extend((op, error) for op in queued[pk])
+            continue
+        for op, (ok, error) in zip(queued[pk], result):
+            if ok:
+                applied.append(op.pk)
+            else:
+                failed.append((op, error))
+    PendingDeviceOp.objects.filter(pk__in=applied).delete()
+    for op, error in failed:
+        attempts = op.attempts + 1
+        given_up = attempts >= DEVICE_OP_MAX_ATTEMPTS
+        PendingDeviceOp.objects.filter(pk=op.pk).update(
+            attempts=attempts, last_error=error, is_failed=given_up, next_attempt_at=now + _retry_delay(op.attempts),
+        )
+        if given_up:
+            print(f"⚠️ Gave up on {op} after {attempts} attempts: {error}")
+    return len(applied) - len(stale)
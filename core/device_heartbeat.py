@@ -0,0 +1,132 @@
+# core/device_heartbeat.py
+"""
+Background heartbeat of the device fleet.
+
+The active sync worker probes every enabled device each
+DEVICE_HEARTBEAT_INTERVAL seconds (in parallel, like the sync) and stores
+reachability, clock offset and capacity counts in DeviceStatus. The device
+list page then reads the whole fleet with one query instead of two live
+device round-trips per device.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from attendance.models import Device, DeviceStatus
+from config.constants import DEVICE_FETCH_TIMEOUT, DEVICE_HEARTBEAT_INTERVAL, SYNC_MAX_WORKERS
+from core.device_sessions import acquire_session
+from vendors.build.manager import get_device_info, get_device_time
+
+COUNT_KEYS = ('users', 'users_cap', 'fingers', 'fingers_cap', 'faces', 'faces_cap', 'cards')
+
+
+def _probe(device):
+    # runs in a pool thread: device I/O only, no database access
+    session = acquire_session(device)
+    if session is None:
+        return None
+    with session.use() as cfg:
+        info = get_device_info(cfg) or {}
+        before = datetime.now()
+        device_time = get_device_time(cfg)
+        after = datetime.now()
+    offset = None
+    if device_time is not None:
+        offset = (device_time - (before + (after - before) / 2)).total_seconds()
+    counts = info.get('counts', {})
+    return offset, {key: counts.get(key, 0) for key in COUNT_KEYS}
+
+
+def refresh_device_status(devices=None):
+    """
+    Probe the enabled devices and upsert their DeviceStatus rows.
+    Returns: the number of devices online.
+    """
+    if devices is None:
+        devices = Device.objects.exclude(status=Device.Status.DISABLED)
+    devices = list(devices)
+    if not devices:
+        return 0
+
+    checked_at = datetime.now()
+    seen, missing = [], []
+    pool = ThreadPoolExecutor(max_workers=min(SYNC_MAX_WORKERS, len(devices)), thread_name_prefix='heartbeat')
+    try:
+        futures = {pool.submit(_probe, device): device for device in devices}
+        done, not_done = wait(futures, timeout=DEVICE_FETCH_TIMEOUT)
+        for future in done:
+            device = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                missing.append(DeviceStatus(device=device, online=False, checked_at=checked_at, error=str(e)))
+                continue
+            if result is None:
+                missing.append(DeviceStatus(device=device, online=False, checked_at=checked_at, error='offline'))
+                continue
+            offset, counts = result
+            seen.append(DeviceStatus(
+                device=device, online=True, checked_at=checked_at, last_seen_at=checked_at,
+                clock_offset=offset, counts=counts, error='',
+            ))
+        for future in not_done:
+            missing.append(DeviceStatus(device=futures[future], online=False, checked_at=checked_at, error='timeout'))
+    finally:
+        # a hung probe finishes on its own; don't wait for it
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    # offline devices keep their last counts, offset and last_seen_at
+    DeviceStatus.objects.bulk_create(
+        seen, update_conflicts=True, unique_fields=['device'],
+        update_fields=['online', 'checked_at', 'last_seen_at', 'clock_offset', 'counts', 'error'],
+    )
+    DeviceStatus.objects.bulk_create(
+        missing, update_conflicts=True, unique_fields=['device'],
+        update_fields=['online', 'checked_at', 'error'],
+    )
+    return len(seen)
+
+
+def _stats(counts):
+    return {
+        "users": {"used": counts.get("users", 0), "cap": counts.get("users_cap", 0)},
+        "fingers": {"used": counts.get("fingers", 0), "cap": counts.get("fingers_cap", 0)},
+        "faces": {"used": counts.get("faces", 0), "cap": counts.get("faces_cap", 0)},
+        "cards": {"used": counts.get("cards", 0), "cap": counts.get("users_cap", 0)},  # card cap = user cap
+    }
+
+
+def device_state(device, status):
+    """
+    Status payload of one device from its DeviceStatus row (or None).
+    A heartbeat older than three intervals is reported as stale and offline.
+    """
+    if device.status == Device.Status.DISABLED:
+        return {'id': device.id, 'skip': True}
+    if status is None:
+        return {'id': device.id, 'online': False, 'stale': True, 'data': _stats({}), 'error': 'No heartbeat yet'}
+
+    stale = status.checked_at < datetime.now() - timedelta(seconds=3 * DEVICE_HEARTBEAT_INTERVAL)
+    state = {
+        'id': device.id,
+        'online': status.online and not stale,
+        'stale': stale,
+        'checked_at': status.checked_at.strftime("%Y-%m-%dT%H:%M:%S"),
+        'last_seen_at': status.last_seen_at.strftime("%Y-%m-%dT%H:%M:%S") if status.last_seen_at else None,
+        'clock_offset': status.clock_offset,
+        'data': _stats(status.counts),
+    }
+    if status.online and status.clock_offset is not None:
+        # device clock as of now, derived from the measured offset
+        device_time = datetime.now() + timedelta(seconds=status.clock_offset)
+        state['device_time'] = device_time.strftime("%Y-%m-%dT%H:%M:%S")
+    if status.error:
+        state['error'] = status.error
+    return state
+
+
+def fleet_status():
+    """
+    Status of every device in one query.
+    """
+    devices = Device.objects.select_related('live_status').order_by('id')
+    return [device_state(device, getattr(device, 'live_status', None)) for device in devices]
@@ -0,0 +1,108 @@
+# core/device_sessions.py
+"""
+Device sessions around the vendors.build.manager API.
+
+One DeviceSession is kept per (ip, port, com_key) and process. Acquiring a
+session includes the online probe, but a device that answered within
+DEVICE_SESSION_IDLE_TIMEOUT seconds is trusted without another probe
+handshake, and one that just failed is reported offline for
+DEVICE_OFFLINE_RETRY seconds without another connect attempt. Calls on the
+same device are serialized by the session lock, since the terminals serve
+one client at a time (the sync worker and a view can no longer collide).
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from config.constants import DEVICE_OFFLINE_RETRY, DEVICE_SESSION_IDLE_TIMEOUT
+from vendors.build.manager import DeviceConfig, is_device_online
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+class DeviceSession:
+    """
+    Health state and call lock of one device endpoint.
+    """
+
+    def __init__(self, ip, port, com_key):
+        self.ip = ip
+        self.port = port
+        self.com_key = com_key
+        self.lock = threading.RLock()
+        self.last_ok = None  # monotonic time of the last successful exchange
+        self.last_failure = None
+        self.last_used = time.monotonic()
+
+    def config(self, timeout=None):
+        if timeout is None:
+            return DeviceConfig(ip=self.ip, port=self.port, com_key=self.com_key)
+        return DeviceConfig(ip=self.ip, port=self.port, com_key=self.com_key, timeout=timeout)
+
+    def _mark(self, ok):
+        clock = time.monotonic()
+        self.last_used = clock
+        if ok:
+            self.last_ok, self.last_failure = clock, None
+        else:
+            self.last_ok, self.last_failure = None, clock
+
+    def is_online(self):
+        """
+        Cached health check; probes the device only when the cached state expired.
+        """
+        with self.lock:
+            clock = time.monotonic()
+            if self.last_ok is not None and clock - self.last_ok < DEVICE_SESSION_IDLE_TIMEOUT:
+                return True
+            if self.last_failure is not None and clock - self.last_failure < DEVICE_OFFLINE_RETRY:
+                return False
+            try:
+                online = bool(is_device_online(self.config()))
+            except Exception:
+                online = False
+            self._mark(online)
+            return online
+
+    @contextmanager
+    def use(self, timeout=None):
+        """
+        Hold the device for one or more vendor calls; yields the DeviceConfig.
+        An exception marks the device unhealthy so the next acquire probes it.
+        """
+        with self.lock:
+            try:
+                yield self.config(timeout)
+            except Exception:
+                self._mark(False)
+                raise
+            self._mark(True)
+
+    def call(self, func, *args, **kwargs):
+        """
+        func(cfg, *args, **kwargs) under the session lock.
+        """
+        with self.use() as cfg:
+            return func(cfg, *args, **kwargs)
+
+
+def get_session(ip, port, com_key):
+    key = (ip, port, com_key)
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            # forget endpoints unused for a long time (e.g. a device whose IP changed)
+            cutoff = time.monotonic() - 10 * DEVICE_SESSION_IDLE_TIMEOUT
+            for stale in [k for k, s in _sessions.items() if s.last_used < cutoff]:
+                del _sessions[stale]
+            session = _sessions[key] = DeviceSession(ip, port, com_key)
+        return session
+
+
+def acquire_session(device):
+    """
+    Session of a Device, or None when the device is offline.
+    """
+    session = get_session(device.ip_address, device.port, device.com_key)
+    return session if session.is_online() else None
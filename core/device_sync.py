@@ -0,0 +1,368 @@
+# core/device_sync.py
+"""
+Raw attendance log sync from the enabled attendance devices.
+
+Devices are polled in parallel by a bounded thread pool (the vendor API is
+blocking socket I/O). Only the calling thread touches the database: fetched
+punches are handed to one LogWriter, which inserts them in batches. A device
+that has not answered DEVICE_FETCH_TIMEOUT seconds after its fetch started is
+abandoned for the cycle, so one unreachable scanner no longer stalls the rest.
+
+Every cycle is timed per device and phase (core.sync_metrics) and stored as a
+SyncRun.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils.timezone import is_aware, make_naive
+
+from attendance.models import AttendanceLog, Device, Employee, QuarantinedLog
+from config.constants import (
+    CLEAR_ATT_LOGS_IF_MORE_THAN, DEVICE_FETCH_TIMEOUT, SYNC_FULL_FETCH_INTERVAL, SYNC_MAX_WORKERS,
+    SYNC_WRITE_BATCH_SIZE, VERIFICATION_MAP,
+)
+from core.utils import invalidate_daily_attendance_for_logs
+from core.device_fanout import replay_pending_ops
+from core.log_ingest import ingest_punches
+from core.device_sessions import acquire_session, get_session
+from core.poll_plan import ERROR, OFFLINE, OK, TIMEOUT, save_poll_plan
+from core.sync_metrics import SyncMetrics
+from vendors.build.manager import get_attendance_logs, delete_device_data, get_device_info
+
+
+UNCHANGED = object()  # device buffer holds exactly the records already synced
+
+
+def _count_trusted(device):
+    # the count alone cannot tell a buffer reset and refilled to the same size;
+    # it only skips the transfer until the next periodic full fetch
+    return bool(
+        device.sync_record_count and device.last_synced_at
+        and datetime.now() - device.last_synced_at < timedelta(seconds=SYNC_FULL_FETCH_INTERVAL)
+    )
+
+
+def _fetch_logs(device, started, metrics):
+    # runs in a pool thread: device I/O only, no database access
+    started[device.pk] = time.monotonic()
+    with metrics.phase(device.pk, 'online'):
+        session = acquire_session(device)
+    if session is None:
+        return None
+    with session.use() as cfg:
+        if _count_trusted(device):
+            # skip the full buffer transfer when the record count has not moved
+            with metrics.phase(device.pk, 'count'):
+                counts = (get_device_info(cfg) or {}).get('counts', {})
+            if counts.get('records') == device.sync_record_count:
+                return UNCHANGED
+        with metrics.phase(device.pk, 'fetch'):
+            logs = get_attendance_logs(cfg)
+        metrics.fetched[device.pk] = len(logs)
+        return logs
+
+
+def _clear_logs(device, fetched, metrics):
+    """
+    Clear the device buffer unless it holds more than the `fetched` records
+    already stored (punched in since the fetch; they are read next cycle).
+    Returns: True when the buffer was cleared.
+    """
+    with metrics.phase(device.pk, 'clear'), get_session(device.ip_address, device.port, device.com_key).use() as cfg:
+        counts = (get_device_info(cfg) or {}).get('counts', {})
+        if counts.get('records') != fetched:
+            return False
+        delete_device_data(cfg, clear_logs=True)
+        return True
+
+
+def _naive(ts):
+    return make_naive(ts) if is_aware(ts) else ts
+
+
+def _last_record(logs):
+    """
+    Returns: (user id, timestamp) of the last record of a buffer, ('', None) when empty.
+    """
+    if not logs:
+        return '', None
+    return str(logs[-1].get('user_id')), _naive(logs[-1].get('timestamp'))
+
+
+def new_records(device, logs):
+    """
+    Records of a device buffer that earlier syncs have not persisted.
+
+    The buffer only grows until it is cleared, so its first sync_record_count
+    records are already stored, provided the record at that position is still
+    the one seen last time. Otherwise the buffer was reset (and maybe refilled)
+    outside the sync: a longer buffer is ingested in full, duplicates being
+    skipped on insert, and of a shorter one only records newer than
+    sync_watermark are kept.
+    """
+    count = device.sync_record_count
+    if not count:
+        return logs
+    if len(logs) >= count:
+        if _last_record(logs[:count]) == (device.sync_last_user_id, device.sync_last_punch):
+            return logs[count:]
+        return logs
+    if device.sync_watermark is None:
+        return logs
+    return [raw for raw in logs if _naive(raw.get('timestamp')) > device.sync_watermark]
+
+
+def save_watermarks(devices, synced, synced_at):
+    """
+    Persist the buffer size, its last record and the newest punch seen on each synced device.
+    synced: {device pk: (record count, newest timestamp or None, (last user id, last timestamp))}
+    """
+    for device in devices:
+        if device.pk not in synced:
+            continue
+        count, latest, (last_uid, last_punch) = synced[device.pk]
+        watermark = max(filter(None, (device.sync_watermark, latest)), default=None)
+        Device.objects.filter(pk=device.pk).update(
+            sync_record_count=count,
+            sync_last_user_id=last_uid,
+            sync_last_punch=last_punch,
+            sync_watermark=watermark,
+            last_synced_at=synced_at,
+        )
+
+
+class LogWriter:
+    """
+    Single writer for a sync cycle: buffers punch rows from any number of
+    devices and ingests them (core.log_ingest) once batch_size rows are pending.
+
+    Device user IDs are resolved to employees in one query per device batch
+    (cached for the rest of the cycle); punches of unknown IDs are written to
+    QuarantinedLog instead of being dropped. saved/duplicates count the rows
+    the database actually inserted/skipped.
+
+    With metrics, resolve/parse time is charged to the device being added and
+    the insert time of a batch is split over its devices by row count.
+    """
+
+    def __init__(self, batch_size=SYNC_WRITE_BATCH_SIZE, metrics=None):
+        self.batch_size = batch_size
+        self.metrics = metrics
+        self.rows = []
+        self.devices = {}  # device pk → rows in the pending batch
+        self.failed = set()  # devices whose rows could not be saved
+        self.employee_ids = {}  # device user_id → Employee pk (None when unknown)
+        self.saved = 0
+        self.duplicates = 0
+        self.quarantine_saved = 0
+
+    def resolve(self, uids):
+        missing = {uid for uid in uids if uid not in self.employee_ids}
+        if not missing:
+            return
+        self.employee_ids.update(dict.fromkeys(missing))
+        self.employee_ids.update(
+            Employee.objects.filter(employee_id__in=missing).values_list('employee_id', 'id')
+        )
+
+    def add(self, device, logs):
+        began = time.perf_counter()
+        self.resolve({str(raw.get('user_id')) for raw in logs})
+        resolved = time.perf_counter()
+
+        for raw in logs:
+            uid = str(raw.get('user_id'))
+            # leave log_type alone (it will be NULL in the DB)
+            self.rows.append((
+                self.employee_ids[uid],
+                uid,
+                device.pk,
+                _naive(raw.get('timestamp')),
+                raw.get('punch'),
+                VERIFICATION_MAP.get(raw.get('status'), AttendanceLog.VerificationType.MANUAL),
+            ))
+        self.devices[device.pk] = self.devices.get(device.pk, 0) + len(logs)
+        if self.metrics:
+            self.metrics.add_time(device.pk, 'resolve', resolved - began)
+            self.metrics.add_time(device.pk, 'parse', time.perf_counter() - resolved)
+
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        began = time.perf_counter()
+        try:
+            with transaction.atomic():
+                inserted, quarantined = ingest_punches(self.rows)
+                invalidate_daily_attendance_for_logs((emp_id, ts.date()) for emp_id, ts in inserted)
+            self.saved += len(inserted)
+            self.quarantine_saved += quarantined
+            self.duplicates += len(self.rows) - len(inserted) - quarantined
+        except DatabaseError as e:
+            print(f"❌ Error saving a batch of {len(self.rows)} logs: {e}")
+            self.failed.update(self.devices)
+        if self.metrics:
+            elapsed = time.perf_counter() - began
+            rows = sum(self.devices.values())
+            for pk, count in self.devices.items():
+                self.metrics.add_time(pk, 'insert', elapsed * count / rows)
+        self.rows = []
+        self.devices = {}
+
+
+def replay_quarantined_logs(employees):
+    """
+    Move quarantined punches of newly enrolled (or re-numbered) employees into AttendanceLog.
+    Returns the number of punches replayed.
+    """
+    by_uid = {emp.employee_id: emp.id for emp in employees if emp.employee_id}
+    if not by_uid:
+        return 0
+
+    with transaction.atomic():
+        rows = list(QuarantinedLog.objects.select_for_update().filter(user_id__in=by_uid))
+        if not rows:
+            return 0
+        entries = [
+            AttendanceLog(
+                employee_id=by_uid[q.user_id],
+                device_id=q.device_id,
+                timestamp=q.timestamp,
+                status=q.status,
+                verification_type=q.verification_type,
+            )
+            for q in rows
+        ]
+        AttendanceLog.objects.bulk_create(entries, ignore_conflicts=True, batch_size=SYNC_WRITE_BATCH_SIZE)
+        invalidate_daily_attendance_for_logs((e.employee_id, e.timestamp.date()) for e in entries)
+        QuarantinedLog.objects.filter(pk__in=[q.pk for q in rows]).delete()
+    return len(rows)
+
+
+def sync_attendance_logs_raw(due_only=False):
+    """
+    Poll the enabled attendance devices (only those whose next_poll_at has
+    passed when due_only=True) and schedule their next poll.
+    """
+    polled_at = datetime.now()
+    devices = Device.objects.filter(
+        status=Device.Status.ENABLED,
+        device_type=Device.DeviceType.ATTENDANCE
+    )
+    if due_only:
+        devices = devices.filter(Q(next_poll_at__isnull=True) | Q(next_poll_at__lte=polled_at))
+    devices = list(devices)
+    if not devices:
+        if not due_only:
+            print("ℹ️ No enabled attendance devices.")
+        return
+
+    print(f"{polled_at:%Y-%m-%d %H:%M:%S}  🔄 Syncing RAW attendance logs from {len(devices)} devices…")
+
+    total_fetched = 0
+    metrics = SyncMetrics(devices)
+    writer = LogWriter(metrics=metrics)
+    to_clear = []
+    synced = {}  # device pk → (buffer size, newest punch, last record) for the watermark
+    outcomes = {}  # device pk → (poll outcome, new punches) for the polling plan
+    started = {}  # device pk → monotonic time its fetch began
+
+    pool = ThreadPoolExecutor(max_workers=min(SYNC_MAX_WORKERS, len(devices)), thread_name_prefix='device-sync')
+    try:
+        # 1) Fetch from every device in parallel, writing as results arrive
+        pending = {pool.submit(_fetch_logs, device, started, metrics): device for device in devices}
+        while pending:
+            done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                device = pending.pop(future)
+                try:
+                    logs = future.result()
+                except Exception as e:
+                    print(f"❌ Failed to fetch from {device.name}: {e}")
+                    outcomes[device.pk] = (ERROR, 0)
+                    metrics.error(device.pk, e)
+                    continue
+                if logs is None:
+                    print(f"❌ Device {device.name} offline—skipping.")
+                    outcomes[device.pk] = (OFFLINE, 0)
+                    continue
+                if logs is UNCHANGED:
+                    print(f"ℹ️ No new logs on {device.name}.")
+                    outcomes[device.pk] = (OK, 0)
+                    continue
+
+                with metrics.phase(device.pk, 'parse'):
+                    fresh = new_records(device, logs)
+                    synced[device.pk] = (
+                        len(logs),
+                        max((_naive(raw.get('timestamp')) for raw in logs), default=None),
+                        _last_record(logs),
+                    )
+                outcomes[device.pk] = (OK, len(fresh))
+                total_fetched += len(fresh)
+                if len(logs) > CLEAR_ATT_LOGS_IF_MORE_THAN:
+                    to_clear.append(device)
+                if not fresh:
+                    print(f"ℹ️ No new logs on {device.name}.")
+                    continue
+                writer.add(device, fresh)
+
+            # per-device deadline, counted from the moment its fetch started
+            clock = time.monotonic()
+            for future, device in list(pending.items()):
+                began = started.get(device.pk)
+                if began is not None and clock - began > DEVICE_FETCH_TIMEOUT:
+                    del pending[future]
+                    outcomes[device.pk] = (TIMEOUT, 0)
+                    print(f"⏱️ Device {device.name} did not answer in {DEVICE_FETCH_TIMEOUT}s—skipping.")
+
+        writer.flush()
+
+        # 2) Advance the watermark of devices whose punches are all stored
+        for pk in writer.failed:
+            synced.pop(pk, None)
+        save_watermarks(devices, synced, datetime.now())
+        save_poll_plan(devices, outcomes, polled_at)
+
+        # 3) Replay biometric writes queued while a device was unreachable
+        replayed = replay_pending_ops([d for d in devices if outcomes.get(d.pk, (None,))[0] == OK])
+        if replayed:
+            print(f"🔁 Replayed {replayed} queued biometric operations")
+
+        # 4) optional: clear devices with lots of logs, once their logs are saved
+        #    (re-counted right before the clear, so punches made since the fetch are kept)
+        clearing = {
+            pool.submit(_clear_logs, device, synced[device.pk][0], metrics): device
+            for device in to_clear if device.pk in synced
+        }
+        done, not_done = wait(clearing, timeout=DEVICE_FETCH_TIMEOUT)
+        for future in done:
+            device = clearing[future]
+            try:
+                if not future.result():
+                    print(f"ℹ️ New logs on {device.name} since the fetch—clearing next cycle.")
+                    continue
+                Device.objects.filter(pk=device.pk).update(sync_record_count=0, sync_last_user_id='', sync_last_punch=None)
+                print(f"🧹 Cleared logs on {device.name}")
+            except Exception as e:
+                print(f"⚠️ Couldn't clear {device.name}: {e}")
+                metrics.error(device.pk, e)
+        for future in not_done:
+            print(f"⚠️ Couldn't clear {clearing[future].name}: timed out")
+
+        # 5) Keep the run history for the metrics endpoint
+        metrics.save(outcomes, writer)
+    finally:
+        # abandoned fetches finish on their own; don't wait for them
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    print("✅ Raw sync complete.")
+    print(f"  → New logs fetched: {total_fetched}")
+    print(f"  → Records saved: {writer.saved}")
+    print(f"  → Duplicates skipped: {writer.duplicates}")
+    print(f"  → Quarantined (unknown user IDs): {writer.quarantine_saved}")
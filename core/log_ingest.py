@@ -0,0 +1,93 @@
+# core/log_ingest.py
+"""
+Bulk ingest of raw device punches.
+
+On PostgreSQL a batch is streamed with COPY into the unlogged staging table
+(created by migration 0026) and merged with INSERT ... SELECT ... ON CONFLICT
+DO NOTHING RETURNING, so no model instances are built and the inserted rows
+are known exactly: everything else in the batch was a duplicate. TRUNCATE
+locks the staging table until commit, so concurrent ingests queue up instead
+of mixing rows.
+
+Other databases fall back to bulk_create(ignore_conflicts=True), where
+duplicates cannot be told apart from inserts.
+"""
+import csv
+import io
+from datetime import datetime
+
+from django.db import connection
+
+from attendance.models import AttendanceLog, QuarantinedLog
+
+STAGING_TABLE = 'attendance_punch_staging'
+STAGING_COLUMNS = ('employee_id', 'user_id', 'device_id', 'timestamp', 'status', 'verification_type')
+
+# row: (employee pk or None for unknown users, device user_id, device pk, naive timestamp, status, verification type)
+
+_MERGE_LOGS_SQL = f"""
+    INSERT INTO "{AttendanceLog._meta.db_table}"
+        ("employee_id", "device_id", "timestamp", "status", "verification_type", "created_at")
+    SELECT "employee_id", "device_id", "timestamp", "status", "verification_type", %s
+    FROM "{STAGING_TABLE}" WHERE "employee_id" IS NOT NULL
+    ON CONFLICT DO NOTHING
+    RETURNING "employee_id", "timestamp"
+"""
+
+_MERGE_QUARANTINE_SQL = f"""
+    INSERT INTO "{QuarantinedLog._meta.db_table}"
+        ("user_id", "device_id", "timestamp", "status", "verification_type", "created_at")
+    SELECT "user_id", "device_id", "timestamp", "status", "verification_type", %s
+    FROM "{STAGING_TABLE}" WHERE "employee_id" IS NULL
+    ON CONFLICT DO NOTHING
+"""
+
+
+def _copy_rows(cursor, rows):
+    raw = cursor.cursor  # DB-API cursor under Django's wrapper
+    columns = ', '.join(f'"{c}"' for c in STAGING_COLUMNS)
+    if hasattr(raw, 'copy'):
+        # psycopg 3
+        with raw.copy(f'COPY "{STAGING_TABLE}" ({columns}) FROM STDIN') as copy:
+            for row in rows:
+                copy.write_row(row)
+    else:
+        # psycopg2: CSV, where an unquoted empty field is NULL
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        buf.seek(0)
+        raw.copy_expert(f'COPY "{STAGING_TABLE}" ({columns}) FROM STDIN WITH (FORMAT csv)', buf)
+
+
+def ingest_punches(rows):
+    """
+    Insert punch rows into AttendanceLog / QuarantinedLog, skipping duplicates.
+    Must run inside a transaction.
+    Returns: (inserted (employee_id, timestamp) pairs, quarantined rows inserted).
+    """
+    if connection.vendor != 'postgresql':
+        return _bulk_create(rows)
+
+    created_at = datetime.now()
+    with connection.cursor() as cursor:
+        cursor.execute(f'TRUNCATE "{STAGING_TABLE}"')
+        _copy_rows(cursor, rows)
+        cursor.execute(_MERGE_LOGS_SQL, [created_at])
+        inserted = cursor.fetchall()
+        cursor.execute(_MERGE_QUARANTINE_SQL, [created_at])
+        quarantined = cursor.rowcount
+        cursor.execute(f'TRUNCATE "{STAGING_TABLE}"')
+    return inserted, quarantined
+
+
+def _bulk_create(rows):
+    logs, quarantined = [], []
+    for emp_id, uid, device_id, ts, status, verification in rows:
+        fields = dict(device_id=device_id, timestamp=ts, status=status, verification_type=verification)
+        if emp_id is None:
+            quarantined.append(QuarantinedLog(user_id=uid, **fields))
+        else:
+            logs.append(AttendanceLog(employee_id=emp_id, **fields))
+    AttendanceLog.objects.bulk_create(logs, ignore_conflicts=True)
+    QuarantinedLog.objects.bulk_create(quarantined, ignore_conflicts=True)
+    return [(e.employee_id, e.timestamp) for e in logs], len(quarantined)
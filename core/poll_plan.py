@@ -0,0 +1,99 @@
+# core/poll_plan.py
+"""
+Adaptive per-device polling plan.
+
+After every poll a device's next_poll_at is pushed out by an interval that
+depends on what the poll found:
+  - offline / failed: POLL_BASE_INTERVAL doubled per consecutive failure,
+    capped at POLL_MAX_BACKOFF
+  - shift-change peak (inside a clock-in or clock-out window of any shift
+    scheduled today, widened by POLL_PEAK_MARGIN): POLL_PEAK_INTERVAL for
+    devices that had new punches, POLL_BASE_INTERVAL otherwise
+  - outside peaks: POLL_BASE_INTERVAL for devices with new punches,
+    POLL_QUIET_INTERVAL for devices without
+
+The scheduler ticks every POLL_TICK seconds and only polls devices that are due.
+"""
+from datetime import timedelta
+
+import numpy as np
+
+from attendance.models import Device
+from config.constants import (
+    POLL_BASE_INTERVAL, POLL_MAX_BACKOFF, POLL_PEAK_INTERVAL, POLL_PEAK_MARGIN, POLL_QUIET_INTERVAL,
+)
+from core.attendance_engine import SECONDS_PER_DAY, in_window, time_to_seconds
+from core.schedule_calendar import calendar_for
+
+# poll outcomes
+OK = 'ok'
+OFFLINE = 'offline'
+ERROR = 'error'
+TIMEOUT = 'timeout'
+
+
+def is_peak(at):
+    """
+    True when `at` falls inside a (widened) clock-in or clock-out window of
+    any shift scheduled on its date.
+    """
+    windows = calendar_for(at.date()).day_windows(at.date())
+    if not len(windows):
+        return False
+    sec = time_to_seconds(at.time())
+    starts = np.concatenate([windows[:, 0], windows[:, 2]])
+    ends = np.concatenate([windows[:, 1], windows[:, 3]])
+    valid = (starts >= 0) & (ends >= 0)
+    starts = (starts[valid] - POLL_PEAK_MARGIN) % SECONDS_PER_DAY
+    ends = (ends[valid] + POLL_PEAK_MARGIN) % SECONDS_PER_DAY
+    return bool(in_window(sec, starts, ends).any())
+
+
+def next_interval(outcome, new_count, failures, peak):
+    """
+    Returns (seconds until the next poll, consecutive failures).
+    """
+    if outcome != OK:
+        failures += 1
+        return min(POLL_BASE_INTERVAL * 2 ** (failures - 1), POLL_MAX_BACKOFF), failures
+    if peak:
+        return (POLL_PEAK_INTERVAL if new_count else POLL_BASE_INTERVAL), 0
+    return (POLL_BASE_INTERVAL if new_count else POLL_QUIET_INTERVAL), 0
+
+
+def save_poll_plan(devices, outcomes, polled_at):
+    """
+    Schedule the next poll of every polled device.
+    outcomes: {device pk: (outcome, new punch count)}
+    """
+    peak = is_peak(polled_at)
+    for device in devices:
+        if device.pk not in outcomes:
+            continue
+        outcome, new_count = outcomes[device.pk]
+        interval, failures = next_interval(outcome, new_count, device.poll_failures, peak)
+        Device.objects.filter(pk=device.pk).update(
+            next_poll_at=polled_at + timedelta(seconds=interval),
+            poll_interval=interval,
+            poll_failures=failures,
+            last_poll_status=outcome,
+        )
+
+
+def poll_plan(devices):
+    """
+    Live polling plan for the device list page.
+    """
+    return [
+        {
+            'id': d.id,
+            'name': d.name,
+            'status': d.status,
+            'last_poll_status': d.last_poll_status,
+            'last_synced_at': d.last_synced_at.strftime('%Y-%m-%d %H:%M:%S') if d.last_synced_at else None,
+            'next_poll_at': d.next_poll_at.strftime('%Y-%m-%d %H:%M:%S') if d.next_poll_at else None,
+            'poll_interval': d.poll_interval,
+            'poll_failures': d.poll_failures,
+        }
+        for d in devices
+    ]
@@ -0,0 +1,236 @@
+# core/query_budget.py
+"""
+Per-view SQL query budgets.
+
+@query_budget(n) declares how many queries one warm request to a view may
+run (the view body and, for streamed reports, the rendering of the stream;
+session and user lookups of the middleware are not counted). The budget is
+stored on the view (view.query_budget) and enforced only when
+settings.QUERY_BUDGET_ENFORCE is on, which the tests switch on: a request
+going over raises QueryBudgetExceeded with every statement and the project
+code that issued it.
+
+assert_query_budget() is the test side: it measures a request, grows the
+dataset, measures it again and fails when the budget is exceeded or the
+query count grows with the data (an N+1), listing the statements that grew.
+QueryBudgetTestCase is the shared fixture of the per-app budget tests.
+"""
+import functools
+import os
+import traceback
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.synthetic import generate_workload
+
+_THIS_FILE = os.path.abspath(__file__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _project_stack():
+    """
+    Returns: ['path:line in function', ...] of the project frames of the
+    current stack (Django, site-packages and this module left out), outermost first.
+    """
+    root = str(settings.BASE_DIR)
+    frames = []
+    for frame in traceback.extract_stack():
+        path = os.path.abspath(frame.filename)
+        if not path.startswith(root) or 'site-packages' in path or path == _THIS_FILE:
+            continue
+        frames.append(f"{os.path.relpath(path, root)}:{frame.lineno} in {frame.name}")
+    return frames
+
+
+class QueryTrace:
+    """
+    Record every statement run on a connection inside the block, with the
+    project frames that issued it. Can be entered several times; the
+    statements accumulate.
+    queries: [(sql, stack), ...]
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.queries = []
+        self._wrappers = []
+
+    def __enter__(self):
+        wrapper = self.connection.execute_wrapper(self._record)
+        wrapper.__enter__()
+        self._wrappers.append(wrapper)
+        return self
+
+    def __exit__(self, *exc):
+        self._wrappers.pop().__exit__(*exc)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def _record(self, execute, sql, params, many, context):
+        self.queries.append((sql, _project_stack()))
+        return execute(sql, params, many, context)
+
+    def statements(self):
+        """
+        Returns: Counter {sql: times run}
+        """
+        return Counter(sql for sql, _ in self.queries)
+
+    def report(self, only=None):
+        """
+        Each distinct statement (or only those in `only`) with how often it ran
+        and the project stack of its first run, most repeated first.
+        """
+        first = {}
+        for sql, stack in self.queries:
+            first.setdefault(sql, stack)
+        counts = self.statements()
+        lines = []
+        for sql, times in counts.most_common():
+            if only is not None and sql not in only:
+                continue
+            lines.append(f"[{times}×] {sql}")
+            lines.extend(f"      {frame}" for frame in first[sql])
+        return '\n'.join(lines)
+
+
+def _check(trace, limit, name):
+    if len(trace) > limit:
+        raise QueryBudgetExceeded(
+            f"{name} ran {len(trace)} queries, budget is {limit}:\n{trace.report()}"
+        )
+
+
+def _traced_stream(content, trace, limit, name):
+    chunks = iter(content)
+    done = object()
+    while True:
+        with trace:
+            chunk = next(chunks, done)
+        if chunk is done:
+            break
+        yield chunk
+    _check(trace, limit, name)
+
+
+def query_budget(limit):
+    """
+    Declare that one request to the view runs at most `limit` queries.
+    Place it directly above the view function, under the auth decorators.
+    """
+
+    def decorator(view):
+        name = f"{view.__module__}.{view.__name__}"
+
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not getattr(settings, 'QUERY_BUDGET_ENFORCE', False):
+                return view(request, *args, **kwargs)
+            trace = QueryTrace()
+            with trace:
+                response = view(request, *args, **kwargs)
+            if getattr(response, 'streaming', False):
+                # the report queries run while the stream is rendered
+                response.streaming_content = _traced_stream(response.streaming_content, trace, limit, name)
+            else:
+                _check(trace, limit, name)
+            return response
+
+        wrapped.query_budget = limit
+        return wrapped
+
+    return decorator
+
+
+def _run(call):
+    """
+    call() and consume a streamed response, so its queries run now.
+    """
+    response = call()
+    if getattr(response, 'streaming', False):
+        b''.join(response.streaming_content)
+    status = getattr(response, 'status_code', 200)
+    if status >= 400:
+        raise AssertionError(f"request failed with status {status}")
+    return response
+
+
+def assert_query_budget(view, call, grow):
+    """
+    Check a view against its @query_budget and against N+1s:
+    call() (typically a test client request to the view) is measured,
+    grow() adds data, and call() is measured again. Both runs are warm
+    (preceded by an unmeasured run). Fails when a run goes over the budget
+    or the second run needs more queries than the first.
+    Returns: (queries before, queries after growing)
+    """
+    limit = getattr(view, 'query_budget', None)
+    if limit is None:
+        raise AssertionError(f"{view.__module__}.{view.__name__} has no @query_budget")
+
+    def measure():
+        _run(call)  # warm-up: schedule calendar, materialized days
+        with override_settings(QUERY_BUDGET_ENFORCE=True), QueryTrace() as trace:
+            _run(call)
+        return trace
+
+    small = measure()
+    grow()
+    large = measure()
+
+    if len(large) > len(small):
+        grown = {
+            sql for sql, times in large.statements().items()
+            if times > small.statements().get(sql, 0)
+        }
+        raise QueryBudgetExceeded(
+            f"{view.__name__}: query count grows with the data ({len(small)} → {len(large)}). "
+            f"Statements that grew:\n{large.report(only=grown)}"
+        )
+    return len(small), len(large)
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Logged-in superuser and a synthetic workload for view budget tests.
+    Subclasses set the generate_workload() arguments of the initial data
+    (workload) and of each growth step (growth), and check their views.
+    """
+    workload = {}
+    growth = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.admin = User.objects.create_superuser(username='budget-admin', password='budget')
+        cls.admin.account_type = User.ACCOUNT_TYPE_NORMAL
+        cls.admin.save()
+        generate_workload(**cls.workload)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def grow(self):
+        generate_workload(**self.growth)
+
+    def check(self, view, name, data=None, args=(), query=None):
+        """
+        assert_query_budget() on a POST of `data` to the named URL (a GET
+        with `query` as its query string when data is None).
+        """
+        url = reverse(name, args=args)
+        if data is None:
+            call = lambda: self.client.get(url, query)
+        else:
+            call = lambda: self.client.post(url, data)
+        return assert_query_budget(view, call, self.grow)
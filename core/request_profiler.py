@@ -0,0 +1,164 @@
+# core/request_profiler.py
+"""
+Sampled per-request profiling.
+
+RequestProfilingMiddleware (config/middleware.py) wraps a sampled request in
+a RequestProfile, which records the view, the wall time, the CPU time of the
+request thread, the SQL statements (count, total time and the
+REQUEST_PROFILE_TOP_QUERIES slowest) and the response size. Finished
+profiles go into a ring buffer of REQUEST_PROFILE_BUFFER_SIZE entries.
+
+The buffer lives in the process memory: every worker profiles and reports
+its own requests, and a restart empties it.
+
+view_stats() aggregates the buffer into p50/p95 per view for the profiling page.
+"""
+import heapq
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+from datetime import datetime
+
+import numpy as np
+from django.db import connections
+
+from config.constants import REQUEST_PROFILE_BUFFER_SIZE, REQUEST_PROFILE_TOP_QUERIES
+
+_buffer = deque(maxlen=REQUEST_PROFILE_BUFFER_SIZE)
+_lock = threading.Lock()
+
+# metrics aggregated per view, in the column order of the profiling page
+METRICS = ('wall', 'cpu', 'sql_count', 'sql_time', 'size')
+
+
+class RequestProfile:
+    """
+    Measurements of one request. Enter it around the code to measure (it can
+    be entered again, e.g. while a streamed response renders); finish()
+    stores the result in the ring buffer.
+    """
+
+    def __init__(self, request):
+        self.at = datetime.now()
+        self.method = request.method
+        self.path = request.path
+        self.view = None
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.slowest = []  # min-heap of (seconds, sql), the slowest statements
+        self.size = 0
+        self.status = None
+        self._stack = None
+        self._began = None
+
+    def __enter__(self):
+        self._began = (time.perf_counter(), time.thread_time())
+        self._stack = ExitStack()
+        for conn in connections.all():
+            self._stack.enter_context(conn.execute_wrapper(self._record))
+        return self
+
+    def __exit__(self, *exc):
+        self._stack.close()
+        wall, cpu = self._began
+        self.wall += time.perf_counter() - wall
+        self.cpu += time.thread_time() - cpu
+
+    def _record(self, execute, sql, params, many, context):
+        began = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            took = time.perf_counter() - began
+            self.sql_count += 1
+            self.sql_time += took
+            if len(self.slowest) < REQUEST_PROFILE_TOP_QUERIES:
+                heapq.heappush(self.slowest, (took, sql))
+            elif took > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (took, sql))
+
+    def finish(self, response):
+        self.status = response.status_code
+        if not response.streaming:
+            self.size = len(response.content)
+        record({
+            'at': self.at,
+            'view': self.view or self.path,
+            'method': self.method,
+            'path': self.path,
+            'status': self.status,
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'sql_count': self.sql_count,
+            'sql_time': self.sql_time,
+            'slowest': sorted(self.slowest, reverse=True),
+            'size': self.size,
+        })
+
+
+def profile_stream(profile, content, response):
+    """
+    Keep measuring while a streamed response renders (its queries and
+    templates run after the middleware returned); the profile is stored
+    once the stream is exhausted.
+    """
+    chunks = iter(content)
+    done = object()
+    while True:
+        with profile:
+            chunk = next(chunks, done)
+        if chunk is done:
+            break
+        profile.size += len(chunk)
+        yield chunk
+    profile.finish(response)
+
+
+def record(entry):
+    with _lock:
+        _buffer.append(entry)
+
+
+def entries():
+    """
+    Returns: a snapshot of the buffered profiles, oldest first.
+    """
+    with _lock:
+        return list(_buffer)
+
+
+def clear():
+    with _lock:
+        _buffer.clear()
+
+
+def view_stats(profiles=None):
+    """
+    Aggregate the profiles per view.
+    Returns: [{'view', 'count', 'p50': {metric: value}, 'p95': {...}, 'slowest': [(seconds, sql), ...]}, ...]
+    slowest p95 wall time first.
+    """
+    by_view = {}
+    for entry in entries() if profiles is None else profiles:
+        by_view.setdefault(entry['view'], []).append(entry)
+
+    stats = []
+    for view, rows in by_view.items():
+        values = np.array([[row[m] for m in METRICS] for row in rows], dtype=float)
+        p50, p95 = np.percentile(values, [50, 95], axis=0).tolist()
+        worst = {}  # sql → slowest run
+        for row in rows:
+            for took, sql in row['slowest']:
+                worst[sql] = max(took, worst.get(sql, 0))
+        stats.append({
+            'view': view,
+            'count': len(rows),
+            'p50': dict(zip(METRICS, p50)),
+            'p95': dict(zip(METRICS, p95)),
+            'slowest': heapq.nlargest(REQUEST_PROFILE_TOP_QUERIES, ((t, sql) for sql, t in worst.items())),
+        })
+    stats.sort(key=lambda s: s['p95']['wall'], reverse=True)
+    return stats
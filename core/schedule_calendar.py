@@ -0,0 +1,231 @@
+# core/schedule_calendar.py
+"""
+Resolved schedule calendar: (shift, Gregorian date) → effective window.
+
+Active ShiftSchedule rows of a Jalali year are expanded once into one entry
+per Gregorian date of that year (windows in seconds, overnight flag and the
+ShiftSchedule itself), so every later lookup is plain dict / array indexing.
+
+Calendars are cached per process and tagged with the ScheduleVersion of
+their year and the all-years row (year 0). Code that changes schedules calls
+invalidate_schedule_calendar(year), which bumps the year's row (the all-years
+row when year is None), so every process rebuilds the calendar on its next
+lookup. A request reads the version once per year, so it sees one consistent
+calendar; outside requests (the sync worker, commands) a version read is
+trusted for SCHEDULE_VERSION_TTL seconds.
+"""
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.core.signals import request_finished, request_started
+from django.db.models import F
+from django.dispatch import receiver
+
+from config.constants import PY_TO_SS_DOW_GREGORIAN, SCHEDULE_VERSION_TTL
+from core.attendance_engine import NO_TIME, is_overnight, schedule_window
+from employee.models import ScheduleVersion, ShiftSchedule
+from libraries.pdate.persian.jalali_table import JalaliTable
+
+_calendars = {}
+_lock = threading.Lock()
+_request = threading.local()  # versions: {year: version} read by the current request, None outside requests
+_versions = {}  # outside requests: {year: (version, monotonic time read)}
+_ALL_YEARS = 0  # ScheduleVersion row bumped by invalidate_schedule_calendar(None)
+
+
+class ScheduleCalendar:
+    """
+    Active schedules of one Jalali year, indexed by day offset from 1 Farvardin.
+
+    Per shift:
+      windows   (n_days, 4) int32 seconds: in_start, in_end, out_start, out_end
+      scheduled (n_days,) bool
+      overnight (n_days,) bool
+    """
+
+    def __init__(self, year, schedules, version=(0, 0)):
+        self.year = year
+        self.version = version
+        self.start, _ = JalaliTable.month_bounds(year, 1)
+        _, self.end = JalaliTable.month_bounds(year, 12)
+        self.n_days = (self.end - self.start).days + 1
+        self.schedules = list(schedules)
+
+        dates = [self.start + timedelta(days=i) for i in range(self.n_days)]
+        _, months, _, _ = JalaliTable.from_dates(dates)
+        months = months.tolist()
+        dows = [PY_TO_SS_DOW_GREGORIAN[d.weekday()] for d in dates]
+
+        by_key = {(s.shift_id, s.month, s.day_of_week): s for s in self.schedules}
+        self._days = {}
+        self._windows = {}
+        self._scheduled = {}
+        self._overnight = {}
+        for shift_id in {s.shift_id for s in self.schedules}:
+            day_sched = [by_key.get((shift_id, m, w)) for m, w in zip(months, dows)]
+            table = np.array([schedule_window(s) for s in day_sched], dtype=np.int32)
+            self._days[shift_id] = day_sched
+            self._windows[shift_id] = table
+            self._scheduled[shift_id] = np.array([s is not None for s in day_sched], dtype=bool)
+            self._overnight[shift_id] = is_overnight(table[:, 0], table[:, 2], table[:, 3])
+
+    def __contains__(self, gdate):
+        return self.start <= gdate <= self.end
+
+    def offset(self, gdate):
+        return (gdate - self.start).days
+
+    def get(self, shift_id, gdate):
+        """
+        ShiftSchedule in effect for shift on gdate, or None.
+        """
+        days = self._days.get(shift_id)
+        return days[self.offset(gdate)] if days else None
+
+    def window(self, shift_id, gdate):
+        """
+        (in_start, in_end, out_start, out_end) in seconds; NO_TIME when unscheduled.
+        """
+        table = self._windows.get(shift_id)
+        if table is None:
+            return NO_TIME, NO_TIME, NO_TIME, NO_TIME
+        return tuple(table[self.offset(gdate)].tolist())
+
+    def is_overnight(self, shift_id, gdate):
+        flags = self._overnight.get(shift_id)
+        return bool(flags[self.offset(gdate)]) if flags is not None else False
+
+    def day_windows(self, gdate):
+        """
+        (S, 4) windows of every shift scheduled on gdate.
+        """
+        i = self.offset(gdate)
+        rows = [table[i] for shift_id, table in self._windows.items() if self._scheduled[shift_id][i]]
+        return np.array(rows, dtype=np.int32).reshape(-1, 4)
+
+    def entries(self, shift_id, offsets):
+        """
+        (scheduled, windows) arrays of a shift at the given day offsets, or None
+        when the shift has no active schedule this year.
+        """
+        if shift_id not in self._days:
+            return None
+        return self._scheduled[shift_id][offsets], self._windows[shift_id][offsets]
+
+
+@receiver(request_started)
+def _begin_request(**kwargs):
+    _request.versions = {}
+
+
+@receiver(request_finished)
+def _end_request(**kwargs):
+    _request.versions = None
+
+
+def _read_version(year):
+    """
+    Returns (all-years version, year version) from the database.
+    """
+    rows = dict(ScheduleVersion.objects.filter(year__in=(_ALL_YEARS, year)).values_list('year', 'version'))
+    return rows.get(_ALL_YEARS, 0), rows.get(year, 0)
+
+
+def _current_version(year):
+    versions = getattr(_request, 'versions', None)
+    if versions is not None:
+        if year not in versions:
+            versions[year] = _read_version(year)
+        return versions[year]
+    now = time.monotonic()
+    cached = _versions.get(year)
+    if cached is not None and now - cached[1] < SCHEDULE_VERSION_TTL:
+        return cached[0]
+    version = _read_version(year)
+    _versions[year] = (version, now)
+    return version
+
+
+def get_schedule_calendar(year):
+    """
+    Cached ScheduleCalendar for a Jalali year (rebuilt when its ScheduleVersion changed).
+    """
+    version = _current_version(year)
+    cal = _calendars.get(year)
+    if cal is not None and cal.version == version:
+        return cal
+    with _lock:
+        cal = _calendars.get(year)
+        if cal is None or cal.version != version:
+            schedules = ShiftSchedule.objects.filter(year=year, is_active=True)
+            cal = _calendars[year] = ScheduleCalendar(year, schedules, version)
+    return cal
+
+
+def invalidate_schedule_calendar(year=None):
+    """
+    Bump the ScheduleVersion of a Jalali year (of all years when None), so
+    every process drops its cached calendar. Inside a transaction the other
+    processes see the new version together with the changed schedules, on commit.
+    """
+    key = _ALL_YEARS if year is None else year
+    with _lock:
+        if year is None:
+            _calendars.clear()
+            _versions.clear()
+        else:
+            _calendars.pop(year, None)
+            _versions.pop(year, None)
+        ScheduleVersion.objects.get_or_create(year=key)
+        ScheduleVersion.objects.filter(year=key).update(version=F('version') + 1)
+    versions = getattr(_request, 'versions', None)
+    if versions is not None:
+        if year is None:
+            versions.clear()
+        else:
+            versions.pop(year, None)
+
+
+def calendar_for(gdate):
+    """
+    Calendar of the Jalali year containing a Gregorian date.
+    """
+    cal = get_schedule_calendar(gdate.year - 621)
+    if gdate < cal.start:
+        cal = get_schedule_calendar(gdate.year - 622)
+    return cal
+
+
+def schedule_for(shift_id, gdate):
+    """
+    ShiftSchedule in effect for a shift on a Gregorian date, or None.
+    """
+    return calendar_for(gdate).get(shift_id, gdate)
+
+
+def resolve_windows(shift_ids, dates):
+    """
+    Resolver for WindowGrid.build.
+    Returns (scheduled, windows) shaped (S, D) and (S, D, 4) for the shifts and
+    Gregorian dates given; dates may span two Jalali years.
+    """
+    scheduled = np.zeros((len(shift_ids), len(dates)), dtype=bool)
+    windows = np.full((len(shift_ids), len(dates), 4), NO_TIME, dtype=np.int32)
+
+    by_year = defaultdict(list)
+    cal = None
+    for col, d in enumerate(dates):
+        if cal is None or d not in cal:
+            cal = calendar_for(d)
+        by_year[cal].append(col)
+
+    for cal, cols in by_year.items():
+        offsets = [cal.offset(dates[c]) for c in cols]
+        for row, shift_id in enumerate(shift_ids):
+            found = cal.entries(shift_id, offsets)
+            if found is not None:
+                scheduled[row, cols], windows[row, cols] = found
+    return scheduled, windows
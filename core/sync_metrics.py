@@ -0,0 +1,165 @@
+# core/sync_metrics.py
+"""
+Instrumentation of the device sync cycle.
+
+SyncMetrics collects, per device, the wall time spent in each sync phase
+(PHASES), the record counts and the error class of a failed poll. At the end
+of the cycle it is persisted as one SyncRun with a SyncDeviceRun per polled
+device; history older than SYNC_HISTORY_DAYS is pruned on the way.
+
+prometheus_text() renders the latest run in the Prometheus text exposition
+format for the /attendance/devices/sync-metrics/ endpoint.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.db import transaction
+
+from attendance.models import Device, SyncDeviceRun, SyncRun
+from config.constants import SYNC_HISTORY_DAYS
+from core.poll_plan import OK
+
+# sync phases in the order they run; 'online' includes opening the connection,
+# the vendor API does not expose connect on its own
+PHASES = ('online', 'count', 'fetch', 'parse', 'resolve', 'insert', 'clear')
+
+
+class SyncMetrics:
+    """
+    Per-device timings and counts of one sync cycle.
+
+    Pool threads only touch the entry of the device they poll, but a thread
+    abandoned at the fetch deadline can still be adding time while save()
+    reads the timings, so both go through a lock.
+    """
+
+    def __init__(self, devices):
+        self.started_at = datetime.now()
+        self.clock = time.perf_counter()
+        self.devices = {d.pk: d for d in devices}
+        self.timings = {d.pk: {} for d in devices}
+        self.fetched = {}  # device pk → records in the device buffer transfer
+        self.errors = {}  # device pk → (error class, message)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, pk, name):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(pk, name, time.perf_counter() - began)
+
+    def add_time(self, pk, name, seconds):
+        with self._lock:
+            timings = self.timings[pk]
+            timings[name] = timings.get(name, 0) + seconds
+
+    def timings_of(self, pk):
+        """
+        Returns: a copy of the phase timings of a device, rounded.
+        """
+        with self._lock:
+            return {name: round(sec, 4) for name, sec in self.timings[pk].items()}
+
+    def error(self, pk, exc):
+        self.errors[pk] = (type(exc).__name__, str(exc))
+
+    def save(self, outcomes, writer):
+        """
+        Persist the cycle as a SyncRun and prune old history.
+        outcomes: {device pk: (poll outcome, new punch count)}
+        Returns: the SyncRun.
+        """
+        failed = {pk for pk, (outcome, _) in outcomes.items() if outcome != OK} | writer.failed
+        with transaction.atomic():
+            run = SyncRun.objects.create(
+                started_at=self.started_at,
+                duration=time.perf_counter() - self.clock,
+                devices_polled=len(outcomes),
+                devices_failed=len(failed),
+                logs_fetched=sum(new_count for _, new_count in outcomes.values()),
+                logs_saved=writer.saved,
+                logs_quarantined=writer.quarantine_saved,
+                logs_duplicate=writer.duplicates,
+            )
+            SyncDeviceRun.objects.bulk_create([
+                SyncDeviceRun(
+                    run=run,
+                    device_id=pk,
+                    device_name=self.devices[pk].name,
+                    outcome=outcome,
+                    error_class=self.errors.get(pk, ('', ''))[0],
+                    error_message=self.errors.get(pk, ('', ''))[1],
+                    records_fetched=self.fetched.get(pk, 0),
+                    new_records=new_count,
+                    timings=self.timings_of(pk),
+                )
+                for pk, (outcome, new_count) in outcomes.items()
+            ])
+            SyncRun.objects.filter(started_at__lt=self.started_at - timedelta(days=SYNC_HISTORY_DAYS)).delete()
+        return run
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _metric(lines, name, kind, help_text, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        if labels:
+            labels = ','.join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{labels}}} {value}")
+        else:
+            lines.append(f"{name} {value}")
+
+
+def prometheus_text():
+    """
+    Latest sync run and current device polling state in the Prometheus text format.
+    """
+    lines = []
+    run = SyncRun.objects.first()
+    if run is not None:
+        device_runs = list(run.device_runs.all())
+        _metric(lines, 'ontime_sync_last_run_timestamp_seconds', 'gauge',
+                'Start time of the latest sync cycle.', [({}, run.started_at.timestamp())])
+        _metric(lines, 'ontime_sync_last_run_duration_seconds', 'gauge',
+                'Wall time of the latest sync cycle.', [({}, run.duration)])
+        _metric(lines, 'ontime_sync_last_run_devices', 'gauge',
+                'Devices polled and failed in the latest sync cycle.',
+                [({'state': 'polled'}, run.devices_polled), ({'state': 'failed'}, run.devices_failed)])
+        _metric(lines, 'ontime_sync_last_run_logs', 'gauge',
+                'Punches fetched, saved, quarantined and skipped as duplicates in the latest sync cycle.',
+                [({'kind': 'fetched'}, run.logs_fetched), ({'kind': 'saved'}, run.logs_saved),
+                 ({'kind': 'quarantined'}, run.logs_quarantined), ({'kind': 'duplicate'}, run.logs_duplicate)])
+        _metric(lines, 'ontime_sync_device_phase_seconds', 'gauge',
+                'Seconds spent per sync phase on each device in the latest cycle.',
+                [({'device_id': dr.device_id, 'device': dr.device_name, 'phase': name}, dr.timings[name])
+                 for dr in device_runs for name in PHASES if name in dr.timings])
+        _metric(lines, 'ontime_sync_device_records', 'gauge',
+                'Records transferred and new punches per device in the latest cycle.',
+                [({'device_id': dr.device_id, 'device': dr.device_name, 'kind': kind}, value)
+                 for dr in device_runs
+                 for kind, value in (('fetched', dr.records_fetched), ('new', dr.new_records))])
+        _metric(lines, 'ontime_sync_device_up', 'gauge',
+                'Whether the device answered in the latest cycle it was polled in.',
+                [({'device_id': dr.device_id, 'device': dr.device_name, 'outcome': dr.outcome},
+                  int(dr.outcome == OK)) for dr in device_runs])
+
+    devices = Device.objects.filter(status=Device.Status.ENABLED, device_type=Device.DeviceType.ATTENDANCE)
+    _metric(lines, 'ontime_sync_device_poll_failures', 'gauge',
+            'Consecutive failed polls per enabled attendance device.',
+            [({'device_id': d.pk, 'device': d.name}, d.poll_failures) for d in devices])
+    return '\n'.join(lines) + '\n'
+
+
+def run_history(limit=100):
+    """
+    Recent sync runs with their device results, newest first.
+    """
+    return SyncRun.objects.prefetch_related('device_runs')[:limit]
@@ -0,0 +1,218 @@
+# core/synthetic.py
+"""
+Synthetic attendance workload for benchmarks and load tests.
+
+generate_workload() creates departments, employees (with user accounts),
+shifts with a full 12×7 ShiftSchedule grid for every Jalali year touched
+(every fourth shift is overnight), approved and pending vacations, public
+holidays and `months` Jalali months of punches ending today. Punches follow
+the schedules with realistic noise: absences, late arrivals, missing
+clock-outs and double taps.
+
+Every generated row is named with PREFIX, so clear_workload() removes it
+again without touching real data.
+"""
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Max
+
+from attendance.models import AttendanceLog, DailyAttendance, EmployeeVacation
+from attendance.partitions import current_month, ensure_default_partition, ensure_partitions, shift_month
+from config.constants import SYNC_WRITE_BATCH_SIZE
+from core.schedule_calendar import invalidate_schedule_calendar
+from employee.models import Department, Employee, Shift, ShiftSchedule
+from libraries.pdate.persian.jalali_table import JalaliTable
+
+PREFIX = 'synthetic'
+
+# (in_start, in_end, out_start, out_end) of each shift pattern
+SHIFT_PATTERNS = [
+    (time(8, 0), time(9, 0), time(16, 0), time(17, 0)),  # day
+    (time(7, 0), time(8, 0), time(13, 0), time(14, 0)),  # morning
+    (time(14, 0), time(15, 0), time(22, 0), time(23, 0)),  # evening
+    (time(20, 0), time(21, 0), time(6, 0), time(7, 0)),  # overnight: clock-out the next day
+]
+
+ABSENCE_RATE = 0.08  # scheduled days without any punch
+LATE_RATE = 0.10  # clock-ins after the window
+MISSING_OUT_RATE = 0.05  # days without a clock-out
+DOUBLE_TAP_RATE = 0.05  # punches repeated within a minute
+VACATION_RATE = 0.3  # employees with one leave request per month
+VACATION_TYPES = [
+    EmployeeVacation.VacationType.PASTIME,
+    EmployeeVacation.VacationType.SICK,
+    EmployeeVacation.VacationType.URGENCY,
+]
+
+
+def _at(day, value, minutes):
+    return datetime.combine(day, value) + timedelta(minutes=minutes)
+
+
+def _day_punches(rng, day, pattern):
+    """
+    Punch times of one scheduled day (clock-out on the next day for overnight shifts).
+    """
+    in_start, in_end, out_start, out_end = pattern
+    window = (in_end.hour - in_start.hour) * 60
+    if rng.random() < LATE_RATE:
+        punches = [_at(day, in_end, rng.uniform(1, 90))]
+    else:
+        punches = [_at(day, in_start, rng.uniform(-20, window))]
+    if rng.random() >= MISSING_OUT_RATE:
+        out_day = day + timedelta(days=1) if out_start < in_start else day
+        punches.append(_at(out_day, out_start, rng.uniform(-10, 70)))
+    if rng.random() < DOUBLE_TAP_RATE:
+        punches.append(punches[0] + timedelta(seconds=rng.randint(5, 60)))
+    return [p.replace(microsecond=0) for p in punches]
+
+
+def _jalali_years(first, last):
+    return range(first[0], last[0] + 1)
+
+
+def generate_workload(departments=10, employees=500, shifts=4, months=3, holidays=2, seed=1, stdout=None):
+    """
+    Create a synthetic organisation and its attendance history.
+    Returns: {'departments', 'employees', 'shifts', 'schedules', 'vacations', 'holidays', 'logs'} counts.
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+    last = current_month()
+    first = shift_month(*last, -(months - 1))
+    gstart, _ = JalaliTable.month_bounds(*first)
+    gend = min(JalaliTable.month_bounds(*last)[1], datetime.now().date())
+    counts = {}
+
+    with transaction.atomic():
+        # 1) Departments and shifts with a full 12×7 schedule grid per Jalali year
+        #    (numbered on from earlier runs, so the workload can be grown)
+        first_dept = Department.objects.filter(name__startswith=f'{PREFIX} ').count() + 1
+        first_shift = Shift.objects.filter(name__startswith=f'{PREFIX} ').count() + 1
+        depts = Department.objects.bulk_create([
+            Department(name=f'{PREFIX} department {first_dept + i}') for i in range(departments)
+        ])
+        shift_rows = Shift.objects.bulk_create([Shift(name=f'{PREFIX} shift {first_shift + i}') for i in range(shifts)])
+        schedules = []
+        for i, shift in enumerate(shift_rows):
+            in_start, in_end, out_start, out_end = SHIFT_PATTERNS[i % len(SHIFT_PATTERNS)]
+            for year in _jalali_years(first, last):
+                for month in range(1, 13):
+                    for dow in ShiftSchedule.DayOfWeek:
+                        schedules.append(ShiftSchedule(
+                            shift=shift, year=year, month=month, day_of_week=dow,
+                            in_start_time=in_start, in_end_time=in_end,
+                            out_start_time=out_start, out_end_time=out_end,
+                            is_active=dow != ShiftSchedule.DayOfWeek.FRIDAY,
+                        ))
+        ShiftSchedule.objects.bulk_create(schedules, batch_size=1000)
+        counts.update(departments=len(depts), shifts=len(shift_rows), schedules=len(schedules))
+
+        # 2) Employees and their user accounts
+        next_id = int(Employee.objects.aggregate(top=Max('employee_id'))['top'] or 0) + 1
+        users = []
+        for i in range(employees):
+            user = User(username=f'{PREFIX}-{next_id + i}', first_name=f'Employee {next_id + i}', last_name=PREFIX)
+            user.set_unusable_password()
+            if hasattr(User, 'ACCOUNT_TYPE_EMPLOYEE'):
+                user.account_type = User.ACCOUNT_TYPE_EMPLOYEE
+            users.append(user)
+        users = User.objects.bulk_create(users, batch_size=1000)
+        emps = Employee.objects.bulk_create([
+            Employee(
+                user=user, employee_id=next_id + i, department=depts[i % len(depts)],
+                shift=shift_rows[i % len(shift_rows)], duty_days=26,
+            )
+            for i, user in enumerate(users)
+        ], batch_size=1000)
+        counts['employees'] = len(emps)
+
+        # 3) Public holidays (one approved GH row per employee, as the holiday form does)
+        #    and one leave request per month for a share of the employees
+        span = (gend - gstart).days + 1
+        holiday_days = sorted(rng.sample(range(span), min(holidays, span)))
+        holiday_dates = {gstart + timedelta(days=d) for d in holiday_days}
+        vacations = [
+            EmployeeVacation(
+                employee=emp, type=EmployeeVacation.VacationType.GENERAL_HOLIDAY, start_date=day, end_date=day,
+                days_requested=1, reason=f'{PREFIX} holiday', status=EmployeeVacation.Status.APPROVED,
+            )
+            for day in sorted(holiday_dates) for emp in emps
+        ]
+        leave = {}  # employee pk → set of approved leave dates
+        for emp in emps:
+            for _ in range(months):
+                if rng.random() >= VACATION_RATE:
+                    continue
+                start = gstart + timedelta(days=rng.randrange(span))
+                end = min(start + timedelta(days=rng.randint(0, 4)), gend)
+                approved = rng.random() < 0.8
+                vacations.append(EmployeeVacation(
+                    employee=emp, type=rng.choice(VACATION_TYPES), start_date=start, end_date=end,
+                    days_requested=(end - start).days + 1, reason=f'{PREFIX} leave',
+                    status=EmployeeVacation.Status.APPROVED if approved else EmployeeVacation.Status.PENDING,
+                ))
+                if approved:
+                    leave.setdefault(emp.pk, set()).update(
+                        start + timedelta(days=d) for d in range((end - start).days + 1)
+                    )
+        EmployeeVacation.objects.bulk_create(vacations, batch_size=1000, ignore_conflicts=True)
+        counts.update(vacations=len(vacations), holidays=len(holiday_dates))
+
+    # 4) Punches, written in batches (month partitions first on PostgreSQL)
+    if connection.vendor == 'postgresql':
+        with transaction.atomic(), connection.cursor() as cursor:
+            ensure_default_partition(cursor)
+            ensure_partitions(cursor, first, shift_month(*last, 1))
+
+    days = [gstart + timedelta(days=d) for d in range((gend - gstart).days + 1)]
+    now = datetime.now()
+    logs, batch = 0, []
+    for i, emp in enumerate(emps):
+        pattern = SHIFT_PATTERNS[(i % len(shift_rows)) % len(SHIFT_PATTERNS)]
+        away = leave.get(emp.pk, set()) | holiday_dates
+        for day in days:
+            if day.weekday() == 4 or day in away or rng.random() < ABSENCE_RATE:
+                continue  # Friday, holiday, on leave or absent
+            for ts in _day_punches(rng, day, pattern):
+                if ts > now:
+                    continue
+                batch.append(AttendanceLog(
+                    employee=emp, timestamp=ts, status=rng.randint(0, 1),
+                    verification_type=AttendanceLog.VerificationType.CARD if rng.random() < 0.1
+                    else AttendanceLog.VerificationType.FINGERPRINT,
+                ))
+        if len(batch) >= SYNC_WRITE_BATCH_SIZE or i == len(emps) - 1:
+            AttendanceLog.objects.bulk_create(batch, ignore_conflicts=True)
+            logs += len(batch)
+            batch = []
+            if stdout is not None:
+                stdout.write(f"  {i + 1}/{len(emps)} employees, {logs} punches")
+    counts['logs'] = logs
+
+    # 5) Drop cached schedule calendars and materialized days of the range
+    for year in _jalali_years(first, last):
+        invalidate_schedule_calendar(year)
+    DailyAttendance.objects.filter(date__range=(gstart, gend)).delete()
+    return counts
+
+
+def clear_workload():
+    """
+    Remove everything generate_workload() created.
+    Returns: the number of employees removed.
+    """
+    User = get_user_model()
+    with transaction.atomic():
+        employees = Employee.objects.filter(user__username__startswith=f'{PREFIX}-')
+        count = employees.count()
+        # logs, vacations and materialized days cascade with the employee
+        employees.delete()
+        User.objects.filter(username__startswith=f'{PREFIX}-').delete()
+        Shift.objects.filter(name__startswith=f'{PREFIX} ').delete()
+        Department.objects.filter(name__startswith=f'{PREFIX} ').delete()
+    invalidate_schedule_calendar()
+    return count
@@ -1,3 +1,313 @@
-from django.test import TestCase
+import asyncio
+import socket
+import threading
+import time as clock
+from datetime import datetime, time, timedelta
+from unittest import skipUnless
 
-# Create your tests here.
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from attendance.models import AttendanceLog, EmployeeVacation
+from core import request_profiler, schedule_calendar, views
+from attendance.partitions import current_month
+from core.benchmarks import benchmark_cases, compare, run_benchmarks
+from core.query_budget import QueryBudgetExceeded, QueryBudgetTestCase, assert_query_budget, query_budget
+from core.synthetic import PREFIX, clear_workload, generate_workload
+from core.utils import dashboard_get_daily_attendance, get_monthly_attendance
+from employee.models import Employee, Shift, ShiftSchedule
+from libraries.pdate.persian.jalali_table import JalaliTable
+from libraries.zksim.server import build_fleet, serve_fleet
+from users.models import User
+
+try:
+    from zk import ZK
+    from zk.exception import ZKNetworkError
+except ImportError:  # pyzk
+    ZK = None
+
+
+class SyntheticWorkloadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.counts = generate_workload(departments=2, employees=12, shifts=4, months=1, holidays=1, seed=7)
+
+    def test_every_shift_has_a_full_schedule_grid(self):
+        for shift in Shift.objects.filter(name__startswith=PREFIX):
+            self.assertEqual(shift.schedules.count(), 12 * 7)
+            self.assertFalse(shift.schedules.filter(day_of_week=ShiftSchedule.DayOfWeek.FRIDAY, is_active=True).exists())
+
+    def test_overnight_shift_clocks_out_the_next_morning(self):
+        overnight = ShiftSchedule.objects.filter(shift__name__startswith=PREFIX, out_start_time__lt=time(12))
+        self.assertTrue(overnight.exists())
+        shift_id = overnight.first().shift_id
+        logs = AttendanceLog.objects.filter(employee__shift_id=shift_id)
+        if logs.exists():
+            self.assertTrue(logs.filter(timestamp__hour__lt=12).exists())
+
+    def test_holidays_cover_every_employee(self):
+        holidays = EmployeeVacation.objects.filter(type=EmployeeVacation.VacationType.GENERAL_HOLIDAY)
+        self.assertEqual(holidays.count(), self.counts['holidays'] * self.counts['employees'])
+
+    def test_clear_workload(self):
+        self.assertEqual(clear_workload(), 12)
+        self.assertFalse(Employee.objects.filter(user__username__startswith=PREFIX).exists())
+        self.assertFalse(Shift.objects.filter(name__startswith=PREFIX).exists())
+        self.assertFalse(AttendanceLog.objects.exists())
+
+
+class MonthlyAttendanceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_workload(departments=1, employees=3, shifts=1, months=1, holidays=0, seed=9)
+        cls.year, cls.month = current_month()
+        gstart, _gend = JalaliTable.month_bounds(cls.year, cls.month)
+        cls.holiday = gstart if gstart.weekday() != 4 else gstart + timedelta(days=1)
+        EmployeeVacation.objects.bulk_create([
+            EmployeeVacation(
+                employee=emp, type=EmployeeVacation.VacationType.GENERAL_HOLIDAY, start_date=cls.holiday,
+                end_date=cls.holiday, days_requested=1, reason='', status=EmployeeVacation.Status.APPROVED,
+            )
+            for emp in Employee.objects.all()
+        ])
+
+    def test_holiday_without_reason(self):
+        days, rows = get_monthly_attendance(self.year, self.month, employee_qs=Employee.objects.all())
+        self.assertTrue(next(d for d in days if d['date'] == self.holiday)['is_holiday'])
+        self.assertEqual(len(rows), 3)
+        for row in rows:
+            self.assertTrue(row['consideration'])  # the default reason
+
+
+class OvernightDayLogsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_workload(departments=1, employees=4, shifts=4, months=1, holidays=0, seed=8)
+        cls.emp = Employee.objects.filter(shift__schedules__out_start_time=time(6, 0)).distinct().get()
+        gstart, _gend = JalaliTable.month_bounds(*current_month())
+        cls.day = gstart if gstart.weekday() != 4 else gstart + timedelta(days=1)
+        AttendanceLog.objects.filter(employee=cls.emp).delete()
+
+    def clock_out(self):
+        counts = dashboard_get_daily_attendance(self.day, employee_qs=Employee.objects.filter(pk=self.emp.pk))
+        return counts['clock_out']
+
+    def punch(self, hour, minute):
+        AttendanceLog.objects.create(
+            employee=self.emp, timestamp=datetime.combine(self.day + timedelta(days=1), time(hour, minute))
+        )
+
+    def test_next_day_punch_outside_the_out_window_is_ignored(self):
+        self.punch(12, 0)
+        self.assertEqual(self.clock_out()['absent_count'], 1)
+
+    def test_next_day_punch_inside_the_out_window(self):
+        self.punch(12, 0)
+        self.punch(6, 30)
+        self.assertEqual(self.clock_out()['present_count'], 1)
+
+
+class ScheduleCalendarTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_workload(departments=1, employees=1, shifts=1, months=1, holidays=0, seed=4)
+        cls.year, _month = current_month()
+
+    def test_edit_in_another_process_drops_the_cached_calendar(self):
+        stale = schedule_calendar.get_schedule_calendar(self.year)
+        ShiftSchedule.objects.filter(year=self.year).update(is_active=False)
+        schedule_calendar.invalidate_schedule_calendar(self.year)
+        # the other process still holds the calendar built before the edit
+        schedule_calendar._calendars[self.year] = stale
+        fresh = schedule_calendar.get_schedule_calendar(self.year)
+        self.assertIsNot(fresh, stale)
+        self.assertEqual(fresh.schedules, [])
+
+    def test_invalidating_all_years_reaches_other_processes(self):
+        stale = schedule_calendar.get_schedule_calendar(self.year)
+        schedule_calendar.invalidate_schedule_calendar()
+        schedule_calendar._calendars[self.year] = stale
+        self.assertIsNot(schedule_calendar.get_schedule_calendar(self.year), stale)
+
+    def test_version_is_cached_outside_requests(self):
+        schedule_calendar.get_schedule_calendar(self.year)
+        with self.assertNumQueries(0):
+            schedule_calendar.get_schedule_calendar(self.year)
+
+
+class BenchmarkTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_workload(departments=2, employees=8, shifts=4, months=1, holidays=0, seed=3)
+
+    def test_every_case_records_wall_time_queries_and_memory(self):
+        results = run_benchmarks(repeat=1)
+        self.assertEqual(set(results), {name for name, _, _ in benchmark_cases(1404, 1, None)})
+        for name, metrics in results.items():
+            self.assertGreaterEqual(metrics['wall'], 0, name)
+            self.assertGreater(metrics['queries'], 0, name)
+            self.assertGreater(metrics['peak_kb'], 0, name)
+
+
+class CompareTests(SimpleTestCase):
+    baseline = {'case': {'wall': 0.1, 'wall_median': 0.1, 'queries': 4, 'peak_kb': 1000}}
+
+    def test_within_tolerance(self):
+        now = {'case': {'wall': 0.12, 'wall_median': 0.12, 'queries': 4, 'peak_kb': 1200}}
+        self.assertEqual(compare(now, self.baseline, tolerance=0.25), [])
+
+    def test_regressions(self):
+        now = {'case': {'wall': 0.2, 'wall_median': 0.2, 'queries': 5, 'peak_kb': 2000}}
+        metrics = [metric for _, metric, _, _ in compare(now, self.baseline, tolerance=0.25)]
+        self.assertEqual(metrics, ['wall', 'queries', 'peak_kb'])
+
+    def test_new_cases_have_no_baseline(self):
+        now = {'other': {'wall': 9, 'wall_median': 9, 'queries': 99, 'peak_kb': 99}}
+        self.assertEqual(compare(now, self.baseline), [])
+
+
+@query_budget(10)
+def department_names(request):
+    return JsonResponse({'names': [emp.department.name for emp in Employee.objects.all()]})
+
+
+class QueryBudgetTests(QueryBudgetTestCase):
+    workload = dict(departments=2, employees=3, shifts=4, months=1, holidays=1, seed=5)
+    growth = dict(departments=2, employees=6, shifts=4, months=1, holidays=1, seed=6)
+
+    def test_dashboard_data(self):
+        self.check(views.dashboard_data, 'dashboard_data')
+
+    def test_growth_reports_the_repeated_statement_and_its_stack(self):
+        request = RequestFactory().get('/')
+        with self.assertRaises(QueryBudgetExceeded) as caught:
+            assert_query_budget(department_names, lambda: department_names(request), self.grow)
+        message = str(caught.exception)
+        self.assertIn('employee_department', message)
+        self.assertIn('in department_names', message)
+
+    def test_budget_is_enforced_when_enabled(self):
+        request = RequestFactory().get('/')
+        strict = query_budget(2)(department_names.__wrapped__)
+        strict(request)  # not enforced by default
+        with override_settings(QUERY_BUDGET_ENFORCE=True), self.assertRaises(QueryBudgetExceeded):
+            strict(request)
+
+
+class RequestProfilerTests(SimpleTestCase):
+
+    def profile(self, view, wall, sql=None):
+        return {
+            'view': view, 'wall': wall, 'cpu': wall / 2, 'sql_count': 3, 'sql_time': wall / 4, 'size': 100,
+            'slowest': [(wall / 4, sql or f'SELECT {view}')],
+        }
+
+    def test_view_stats_percentiles_per_view(self):
+        profiles = [self.profile('slow', w / 10) for w in range(1, 21)] + [self.profile('fast', 0.01)]
+        stats = request_profiler.view_stats(profiles)
+        self.assertEqual([s['view'] for s in stats], ['slow', 'fast'])
+        self.assertEqual(stats[0]['count'], 20)
+        self.assertAlmostEqual(stats[0]['p50']['wall'], 1.05)
+        self.assertAlmostEqual(stats[0]['p95']['wall'], 1.905)
+        self.assertEqual(stats[0]['slowest'], [(0.5, 'SELECT slow')])
+
+    def test_buffer_is_bounded(self):
+        request_profiler.clear()
+        for i in range(request_profiler._buffer.maxlen + 5):
+            request_profiler.record(self.profile('view', i))
+        self.assertEqual(len(request_profiler.entries()), request_profiler._buffer.maxlen)
+        self.assertEqual(request_profiler.entries()[0]['wall'], 5)
+        request_profiler.clear()
+
+
+class RequestProfilesPageTests(TestCase):
+
+    def test_admins_only(self):
+        user = User.objects.create_user(username='profiles-user', password='x')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('request_profiles')).status_code, 302)
+        user.is_superuser = True
+        user.save()
+        self.assertEqual(self.client.get(reverse('request_profiles')).status_code, 200)
+
+
+def free_port():
+    """
+    A local port free for both TCP and UDP (a simulated terminal listens on both).
+    """
+    with socket.socket() as tcp, socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp:
+        tcp.bind(('127.0.0.1', 0))
+        port = tcp.getsockname()[1]
+        udp.bind(('127.0.0.1', port))
+        return port
+
+
+@skipUnless(ZK, 'pyzk is not installed')
+class ZkSimulatorTests(SimpleTestCase):
+    """
+    A pyzk client against libraries.zksim over TCP and UDP.
+    """
+
+    def serve(self, **options):
+        port = free_port()
+        server, = build_fleet(1, base_port=port, users=5, templates=2, logs=20, **options)
+        loop = asyncio.new_event_loop()
+        stop = asyncio.Event()
+        thread = threading.Thread(target=loop.run_until_complete, args=(serve_fleet([server], stop=stop),), daemon=True)
+        thread.start()
+
+        def shutdown():
+            loop.call_soon_threadsafe(stop.set)
+            thread.join(5)
+            loop.close()
+
+        self.addCleanup(shutdown)
+        deadline = clock.monotonic() + 5
+        while not server.offline and server._udp is None and clock.monotonic() < deadline:
+            clock.sleep(0.01)
+        return server, port
+
+    def read_device(self, udp):
+        server, port = self.serve()
+        conn = ZK('127.0.0.1', port=port, timeout=5, force_udp=udp, ommit_ping=True).connect()
+        try:
+            users, templates, logs = conn.get_users(), conn.get_templates(), conn.get_attendance()
+        finally:
+            conn.disconnect()
+        device = server.device
+        self.assertEqual(
+            sorted((u.user_id, u.card) for u in users),
+            sorted((u.user_id, u.card) for u in device.users.values()),
+        )
+        self.assertEqual(
+            {(t.uid, t.fid): t.template for t in templates},
+            device.templates,
+        )
+        self.assertEqual(
+            [(a.user_id, a.timestamp) for a in logs],
+            [(user_id, ts) for _uid, user_id, _status, ts, _punch in device.logs],
+        )
+
+    def test_tcp(self):
+        self.read_device(udp=False)
+
+    def test_udp(self):
+        self.read_device(udp=True)
+
+    def test_lost_requests_time_out(self):
+        server, port = self.serve(loss=1.0)
+        with self.assertRaises(ZKNetworkError):
+            ZK('127.0.0.1', port=port, timeout=1, ommit_ping=True).connect()
+        self.assertGreater(server.dropped, 0)
+
+    def test_offline_device_is_unreachable(self):
+        _server, port = self.serve(offline=1)
+        for udp in (False, True):
+            with self.assertRaises(ZKNetworkError):
+                ZK('127.0.0.1', port=port, timeout=1, force_udp=udp, ommit_ping=True).connect()
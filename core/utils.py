@@ -1,19 +1,21 @@
 # core/utils.py
 from collections import defaultdict
 from datetime import datetime, timedelta
+from itertools import chain
 
 import jdatetime
-from django.db import transaction
+import numpy as np
+from django.db import connection, transaction
 from django.db.models import Sum, Q
-from django.db.utils import IntegrityError
-from django.utils.timezone import make_aware
 from django.utils.translation import gettext as _
 
-from attendance.models import AttendanceLog, Employee, Device
-from attendance.models import EmployeeVacation
-from config.constants import LEAVE_LIMITS, CLEAR_ATT_LOGS_IF_MORE_THAN, VERIFICATION_MAP, MIN_OUT_DELTA, PY_TO_SS_DOW_GREGORIAN, PY_TO_SS_DOW_JALALI, persian_wdays, MIN_LATE_DELTA, PERSIAN_MONTHS
-from employee.models import ShiftSchedule, Department, Shift
-from vendors.build.manager import DeviceConfig, is_device_online, get_attendance_logs, delete_device_data
+from attendance.models import AttendanceLog, Employee
+from attendance.models import EmployeeVacation, DailyAttendance
+from config.constants import LEAVE_LIMITS, persian_wdays, MIN_LATE_DELTA, PERSIAN_MONTHS, DAILY_ATTENDANCE_LOCK_ID
+from core.attendance_engine import WindowGrid, PunchArrays, classify, month_dates, SECONDS_PER_DAY
+from core.schedule_calendar import resolve_windows, get_schedule_calendar
+from employee.models import Department, Shift
+from libraries.pdate.persian.jalali_table import JalaliTable
 
 
 def get_employee_leave_summary(employee, year=None):
@@ -91,36 +93,70 @@ def shifts_missing_schedule_of_months_for_year(year):
       2) Has at least one active schedule in that month, but where any of
          in_start_time, in_end_time, out_start_time or out_end_time is None.
     """
-    missing = {}
+    # active schedules of the year come from the cached calendar (no per-month queries)
+    scheduled = defaultdict(set)
+    incomplete = defaultdict(set)
+    for sch in get_schedule_calendar(year).schedules:
+        scheduled[sch.shift_id].add(sch.month)
+        if None in (sch.in_start_time, sch.in_end_time, sch.out_start_time, sch.out_end_time):
+            incomplete[sch.shift_id].add(sch.month)
 
+    missing = {}
     for shift in Shift.objects.all().order_by('name'):
-        bad_months = []
-        for m in range(1, 13):
-            qs = ShiftSchedule.objects.filter(
-                year=year,
-                month=m,
-                shift=shift,
-                is_active=True
-            )
-            if not qs.exists():
-                # rule (1): no active schedule in this month
-                bad_months.append(PERSIAN_MONTHS[m-1])
-            else:
-                # rule (2): at least one active schedule, but check for incomplete times
-                incomplete = qs.filter(
-                    Q(in_start_time__isnull=True) |
-                    Q(in_end_time__isnull=True) |
-                    Q(out_start_time__isnull=True) |
-                    Q(out_end_time__isnull=True)
-                )
-                if incomplete.exists():
-                    bad_months.append(PERSIAN_MONTHS[m-1])
-
+        bad_months = [
+            PERSIAN_MONTHS[m - 1] for m in range(1, 13)
+            # rule (1): no active schedule in this month; rule (2): incomplete times
+            if m not in scheduled[shift.id] or m in incomplete[shift.id]
+        ]
         if bad_months:
             missing[shift.name] = bad_months
 
     return missing
 
+MONTHLY_BATCH_SIZE = 200
+
+
+def _emp_index(employees):
+    return {emp.id: i for i, emp in enumerate(employees)}
+
+
+def load_day_logs(employees, att_date, grid, fields=('employee_id', 'timestamp')):
+    """
+    Fetch every punch needed to classify att_date in a single range query:
+    the whole day for all employees plus, for employees whose schedule is
+    overnight, the next day's punches inside their clock-out window (the
+    only next-day punches classify() matches).
+
+    employees: materialized employee list
+    grid:      WindowGrid of att_date (one column)
+    fields:    values_list columns, employee_id first
+
+    Returns {employee_id: [row, …]} with each employee's rows in timestamp order.
+    """
+    out_windows = defaultdict(list)  # (out_start, out_end) → overnight employee ids
+    for emp, is_night, out_start, out_end in zip(
+            employees, grid.overnight[:, 0].tolist(), grid.out_start[:, 0].tolist(), grid.out_end[:, 0].tolist()
+    ):
+        if is_night:
+            out_windows[(out_start, out_end)].append(emp.id)
+
+    qs = AttendanceLog.objects.for_day(att_date).for_employees(employees)
+    next_day = datetime.combine(att_date + timedelta(days=1), datetime.min.time())
+    for (out_start, out_end), emp_ids in out_windows.items():
+        # a wrapped window matches both ends of the day
+        spans = [(out_start, out_end)] if out_start <= out_end else [(0, out_end), (out_start, SECONDS_PER_DAY - 1)]
+        for lo, hi in spans:
+            qs |= AttendanceLog.objects.for_employees(emp_ids).filter(
+                timestamp__gte=next_day + timedelta(seconds=lo),
+                timestamp__lt=next_day + timedelta(seconds=hi + 1),
+            )
+
+    grouped = defaultdict(list)
+    for row in qs.order_by('employee_id', 'timestamp').values_list(*fields):
+        grouped[row[0]].append(row)
+    return grouped
+
+
 def dashboard_get_daily_attendance(att_date, *, is_follow_schedule=True, employee_qs=None):
     """
     Returns:
@@ -130,135 +166,39 @@ def dashboard_get_daily_attendance(att_date, *, is_follow_schedule=True, employe
       }
     """
 
-    # 1. Build employee queryset
+    # 1. Build employee list
     all_emps = Employee.objects.filter(is_archive=False)
     emp_qs = employee_qs if employee_qs is not None else all_emps
-    total_emps = emp_qs.count()
+    employees = list(emp_qs)
+    total_emps = len(employees)
 
-    # 2. Build schedule map for this day (if needed)
-    sched_map = {}
+    # 2. Schedule windows (resolved calendar)
     if is_follow_schedule:
-        jday = jdatetime.date.fromgregorian(date=att_date)
-        py_dow = jday.weekday()
-        ss_dow = PY_TO_SS_DOW_JALALI[py_dow]
-        qs = ShiftSchedule.objects.filter(
-            year=jday.year,
-            month=jday.month,
-            day_of_week=ss_dow,
-            is_active=True
-        )
-        sched_map = {sch.shift_id: sch for sch in qs}
-
-    # 3. Fetch logs
-    logs_by_emp = defaultdict(list)
-    emp_ids = list(emp_qs.values_list('id', flat=True))
-    logs_today = AttendanceLog.objects.filter(
-        timestamp__date=att_date,
-        employee_id__in=emp_ids
-    ).order_by('employee_id', 'timestamp')
-    for lg in logs_today:
-        logs_by_emp[lg.employee_id].append(lg)
-
-    # b) Fetch next-day logs for overnight shifts
-    if is_follow_schedule:
-        next_day = att_date + timedelta(days=1)
-        for emp in emp_qs:
-            sch = sched_map.get(emp.shift_id)
-            if sch and sch.in_start_time and sch.out_start_time and sch.out_end_time:
-                if (
-                        sch.out_start_time < sch.in_start_time or
-                        sch.out_end_time < sch.in_start_time or
-                        sch.out_start_time > sch.out_end_time
-                ):
-                    logs_next = AttendanceLog.objects.filter(
-                        timestamp__date=next_day,
-                        employee_id=emp.id,
-                        timestamp__time__gte=sch.out_start_time,
-                        timestamp__time__lte=sch.out_end_time,
-                    ).order_by('timestamp')
-                    logs_by_emp[emp.id].extend(logs_next)
-
-    # Helper: test schedule window
-    def in_schedule_window(log, sch, punch_type):
-        t = log.timestamp.time()
-        if punch_type == 'in':
-            return sch.in_start_time <= t <= sch.in_end_time
-        # out-window may span midnight
-        if sch.out_start_time <= sch.out_end_time:
-            return sch.out_start_time <= t <= sch.out_end_time
-        else:
-            return (t >= sch.out_start_time) or (t <= sch.out_end_time)
-
-    # 4. Classify per employee for clock-in and clock-out
-    ci_present = ci_late = ci_absent = 0
-    co_present = co_late = co_absent = 0
-
-    for emp in emp_qs:
-        emp_logs = sorted(logs_by_emp.get(emp.id, []), key=lambda L: L.timestamp)
-        if not emp_logs:
-            ci_absent += 1
-            co_absent += 1
-            continue
-
-        sch = sched_map.get(emp.shift_id) if is_follow_schedule else None
-
-        logs_today = [lg for lg in emp_logs if lg.timestamp.date() == att_date]
-        logs_next_day = [lg for lg in emp_logs if lg.timestamp.date() == (att_date + timedelta(days=1))]
-
-        is_overnight = False
-        if sch and sch.in_start_time and sch.out_start_time and sch.out_end_time:
-            is_overnight = (
-                    sch.out_start_time < sch.in_start_time or
-                    sch.out_end_time < sch.in_start_time or
-                    sch.out_start_time > sch.out_end_time
-            )
-
-        # CLOCK IN
-        if not logs_today:
-            ci_absent += 1
-        else:
-            if is_follow_schedule and sch:
-                # Find if any entry is in window
-                in_found = any(
-                    in_schedule_window(lg, sch, 'in') for lg in logs_today
-                )
-                if in_found:
-                    ci_present += 1
-                else:
-                    ci_late += 1
-            else:
-                # Not schedule enforced, any punch = present
-                ci_present += 1
-
-        # CLOCK OUT
-        if is_overnight:
-            if not logs_next_day:
-                co_absent += 1
-            else:
-                if is_follow_schedule and sch:
-                    out_found = any(
-                        in_schedule_window(lg, sch, 'out') for lg in logs_next_day
-                    )
-                    if out_found:
-                        co_present += 1
-                    else:
-                        co_late += 1
-                else:
-                    co_present += 1
-        else:
-            if not logs_today:
-                co_absent += 1
-            else:
-                if is_follow_schedule and sch:
-                    out_found = any(
-                        in_schedule_window(lg, sch, 'out') for lg in logs_today
-                    )
-                    if out_found:
-                        co_present += 1
-                    else:
-                        co_late += 1
-                else:
-                    co_present += 1
+        grid = WindowGrid.build([e.shift_id for e in employees], [att_date], resolve_windows)
+    else:
+        grid = WindowGrid.empty(total_emps, 1)
+
+    # 3. Fetch logs (next day too for overnight shifts) and classify every employee at once
+    logs = load_day_logs(employees, att_date, grid)
+    res = classify(PunchArrays(chain.from_iterable(logs.values()), _emp_index(employees), att_date, 1), grid)
+
+    sched = grid.has_schedule[:, 0]
+    overnight = grid.overnight[:, 0]
+    has_today = res.day_count[:, 0] > 0
+    has_next = res.next_count[:, 0] > 0
+    in_ok = res.in_idx[:, 0] >= 0
+    out_ok = res.out_idx[:, 0] >= 0
+
+    # CLOCK IN: a punch today is present when it's in window (or no schedule is enforced), late otherwise
+    ci_present = int(np.sum(has_today & (~sched | in_ok)))
+    ci_late = int(np.sum(has_today & sched & ~in_ok))
+    ci_absent = total_emps - ci_present - ci_late
+
+    # CLOCK OUT: overnight schedules look at the next day's punches
+    has_out_day = np.where(overnight, has_next, has_today)
+    co_present = int(np.sum(has_out_day & (~sched | out_ok)))
+    co_late = int(np.sum(has_out_day & sched & ~out_ok))
+    co_absent = total_emps - co_present - co_late
 
     return {
         'clock_in': {
@@ -292,111 +232,46 @@ def dashboard_get_monthly_attendance(year: int, month: int, is_follow_schedule:
     total_emps = len(employees)
     if total_emps == 0:
         # no employees → trivial answer
-        jstart = jdatetime.date(year, month, 1)
-        jnext = (jdatetime.date(year + 1, 1, 1)
-                 if month == 12 else jdatetime.date(year, month + 1, 1))
-        days = (jnext.togregorian() - jstart.togregorian()).days
+        gstart, gend = JalaliTable.month_bounds(year, month)
+        days = (gend - gstart).days + 1
         labels = [str(d) for d in range(1, days + 1)]
         return {'labels': labels, 'present': [0] * days, 'absent': [0] * days}
 
     # 2. Compute Gregorian month range
-    jstart = jdatetime.date(year, month, 1)
-    jnext = (jdatetime.date(year + 1, 1, 1) if month == 12 else jdatetime.date(year, month + 1, 1))
-    gstart = jstart.togregorian()
-    gend = jnext.togregorian() - timedelta(days=1)
-    days = (jnext.togregorian() - gstart).days
-
-    # 3. Preload shift schedules if enforcing windows
-    sched_map = {}
+    gstart, gend = JalaliTable.month_bounds(year, month)
+    dates = month_dates(gstart, gend)
+    days = len(dates)
+
+    # 3. Bulk-fetch this month’s logs (and next-day for overnight)
+    rows = (
+        AttendanceLog.objects
+        .for_range(gstart, gend + timedelta(days=1))  # +1 for next-day out
+        .for_employees(employees)
+        .values_list('employee_id', 'timestamp', 'log_type')
+    )
+    punches = PunchArrays(rows, _emp_index(employees), gstart, days)
+
+    # 4. Classify the whole month in one pass
     if is_follow_schedule:
-        shift_ids = {e.shift_id for e in employees}
-        schedules = ShiftSchedule.objects.filter(
-            shift_id__in=shift_ids,
-            year=year,
-            month=month,
-            is_active=True
-        )
-        sched_map = {(s.shift_id, s.day_of_week): s for s in schedules}
-
-    # 4. Bulk-fetch this month’s logs (and next-day for overnight)
-    emp_ids = [e.id for e in employees]
-    logs = AttendanceLog.objects.filter(
-        timestamp__date__gte=gstart,
-        timestamp__date__lte=gend + timedelta(days=1),  # +1 for next-day out
-        employee_id__in=emp_ids
-    ).order_by('employee_id', 'timestamp')
-    logs_by_emp_day = defaultdict(list)
-    for lg in logs:
-        logs_by_emp_day[(lg.employee_id, lg.timestamp.date())].append(lg)
-
-    # 5. Helper: test schedule window (from your detailed logic)
-    def in_schedule_window(log, sch, punch_type):
-        t = log.timestamp.time()
-        if not sch:
-            return False
-        if punch_type == 'in':
-            if sch.in_start_time is None or sch.in_end_time is None:
-                return False
-            return sch.in_start_time <= t <= sch.in_end_time
-        # for out window
-        if sch.out_start_time is None or sch.out_end_time is None:
-            return False
-        if sch.out_start_time <= sch.out_end_time:
-            return sch.out_start_time <= t <= sch.out_end_time
-        else:
-            # overnight: after out_start (same day) or before out_end (next day)
-            return (t >= sch.out_start_time) or (t <= sch.out_end_time)
+        grid = WindowGrid.build([e.shift_id for e in employees], dates, resolve_windows)
+    else:
+        grid = WindowGrid.empty(total_emps, days)
+    res = classify(punches, grid)
+
+    # Schedule enforced: in and out inside their windows (overnight handled by the engine).
+    # Not enforced (or no schedule): any clock-in and any clock-out punch that day.
+    in_typed = punches.cell_any(punches.mask(lambda r: r[2] == AttendanceLog.LogType.CLOCK_IN), total_emps)
+    out_typed = punches.cell_any(punches.mask(lambda r: r[2] == AttendanceLog.LogType.CLOCK_OUT), total_emps)
+    present = np.where(
+        grid.has_schedule,
+        (res.in_idx >= 0) & (res.out_idx >= 0),
+        in_typed & out_typed,
+    )
 
-    # 6. Roll up day by day
+    # 5. Roll up day by day
     labels = [str(d) for d in range(1, days + 1)]
-    present_list = []
-    absent_list = []
-
-    for offset in range(days):
-        curr_date = gstart + timedelta(days=offset)
-        present = 0
-
-        # If enforcing schedule, get the Jalali DOW for this day
-        if is_follow_schedule:
-            jday = jdatetime.date.fromgregorian(date=curr_date)
-            dow = PY_TO_SS_DOW_JALALI[jday.weekday()]
-
-        for emp in employees:
-            # get logs for this employee on this day (and next, if overnight)
-            logs_today = logs_by_emp_day.get((emp.id, curr_date), [])
-            logs_next = logs_by_emp_day.get((emp.id, curr_date + timedelta(days=1)), [])
-            sch = sched_map.get((emp.shift_id, dow)) if is_follow_schedule else None
-
-            # Determine overnight shift
-            is_overnight = False
-            if sch and sch.in_start_time and sch.out_start_time and sch.out_end_time:
-                is_overnight = (
-                        sch.out_start_time < sch.in_start_time or
-                        sch.out_end_time < sch.in_start_time or
-                        sch.out_start_time > sch.out_end_time
-                )
-
-            if not is_follow_schedule or not sch:
-                # Not schedule enforced: any clock-in and any clock-out
-                in_exists = any(lg.log_type == AttendanceLog.LogType.CLOCK_IN for lg in logs_today)
-                out_exists = any(lg.log_type == AttendanceLog.LogType.CLOCK_OUT for lg in logs_today)
-                if in_exists and out_exists:
-                    present += 1
-            else:
-                # Schedule enforced: must have in in window, and out in window (overnight handled)
-                if is_overnight:
-                    ci = next((lg for lg in logs_today if in_schedule_window(lg, sch, 'in')), None)
-                    co = next((lg for lg in logs_next if in_schedule_window(lg, sch, 'out')), None)
-                    if ci and co:
-                        present += 1
-                else:
-                    ci = next((lg for lg in logs_today if in_schedule_window(lg, sch, 'in')), None)
-                    co = next((lg for lg in logs_today if in_schedule_window(lg, sch, 'out')), None)
-                    if ci and co:
-                        present += 1
-
-        present_list.append(present)
-        absent_list.append(total_emps - present)
+    present_list = present.sum(axis=0).tolist()
+    absent_list = [total_emps - p for p in present_list]
 
     return {
         'labels': labels,
@@ -452,108 +327,34 @@ def dashboard_get_attendance_by_department(att_date, *, is_follow_schedule=True,
             'absent': [0] * len(depts),
         }
 
-    # 3. Build schedule map for Jalali day
-    sched_map = {}
+    # 3. Schedule windows, then logs (next day too for overnight shifts)
     if is_follow_schedule:
-        jday = jdatetime.date.fromgregorian(date=att_date)
-        py_dow = jday.weekday()
-        ss_dow = PY_TO_SS_DOW_JALALI[py_dow]
-        shift_ids = {e.shift_id for e in employees}
-        schedules = ShiftSchedule.objects.filter(
-            shift_id__in=shift_ids,
-            year=jday.year,
-            month=jday.month,
-            day_of_week=ss_dow,
-            is_active=True
-        )
-        sched_map = {s.shift_id: s for s in schedules}
-
-    # 4. Fetch and group logs (main date)
-    logs_by_emp = defaultdict(list)
-    emp_ids = [e.id for e in employees]
-    logs_today = AttendanceLog.objects.filter(
-        timestamp__date=att_date,
-        employee_id__in=emp_ids
-    ).order_by('employee_id', 'timestamp')
-    for lg in logs_today:
-        logs_by_emp[lg.employee_id].append(lg)
-
-    # b) Next day logs for overnight shifts
-    if is_follow_schedule:
-        next_day = att_date + timedelta(days=1)
-        for emp in employees:
-            sch = sched_map.get(emp.shift_id)
-            if sch and sch.in_start_time and sch.out_start_time and sch.out_end_time:
-                if (
-                        sch.out_start_time < sch.in_start_time or
-                        sch.out_end_time < sch.in_start_time or
-                        sch.out_start_time > sch.out_end_time
-                ):
-                    logs_next = AttendanceLog.objects.filter(
-                        timestamp__date=next_day,
-                        employee_id=emp.id,
-                        timestamp__time__gte=sch.out_start_time,
-                        timestamp__time__lte=sch.out_end_time,
-                    ).order_by('timestamp')
-                    logs_by_emp[emp.id].extend(logs_next)
-
-    # Helper: test schedule window
-    def in_schedule_window(log, sch, punch_type):
-        t = log.timestamp.time()
-        if punch_type == 'in':
-            return sch.in_start_time <= t <= sch.in_end_time
-        if sch.out_start_time <= sch.out_end_time:
-            return sch.out_start_time <= t <= sch.out_end_time
-        else:
-            # overnight
-            return (t >= sch.out_start_time) or (t <= sch.out_end_time)
+        grid = WindowGrid.build([e.shift_id for e in employees], [att_date], resolve_windows)
+    else:
+        grid = WindowGrid.empty(len(employees), 1)
+    logs = load_day_logs(employees, att_date, grid)
+
+    # 4. Attendance present = at least one valid punch in *and* out window;
+    #    without a schedule any punch today counts
+    res = classify(PunchArrays(chain.from_iterable(logs.values()), _emp_index(employees), att_date, 1), grid)
+    present = np.where(
+        grid.has_schedule[:, 0],
+        (res.in_idx[:, 0] >= 0) & (res.out_idx[:, 0] >= 0),
+        res.day_count[:, 0] > 0,
+    ).tolist()
 
     # 5. Group employees by department
-    dept_groups = defaultdict(list)
-    for emp in employees:
-        dept_groups[emp.department_id].append(emp)
+    dept_total = defaultdict(int)
+    dept_present = defaultdict(int)
+    for emp, ok in zip(employees, present):
+        dept_total[emp.department_id] += 1
+        dept_present[emp.department_id] += ok
 
     labels, present_list, absent_list = [], [], []
     for dept in depts:
-        emps = dept_groups.get(dept.id, [])
-        present = 0
-        for emp in emps:
-            emp_logs = sorted(logs_by_emp.get(emp.id, []), key=lambda L: L.timestamp)
-            if not emp_logs:
-                continue  # absent by default, see below
-
-            sch = sched_map.get(emp.shift_id) if is_follow_schedule else None
-            logs_today = [lg for lg in emp_logs if lg.timestamp.date() == att_date]
-            logs_next_day = [lg for lg in emp_logs if lg.timestamp.date() == (att_date + timedelta(days=1))]
-            is_overnight = False
-            if sch and sch.in_start_time and sch.out_start_time and sch.out_end_time:
-                is_overnight = (
-                        sch.out_start_time < sch.in_start_time or
-                        sch.out_end_time < sch.in_start_time or
-                        sch.out_start_time > sch.out_end_time
-                )
-
-            # Attendance present = at least one valid punch in *and* out window
-            in_ok = False
-            out_ok = False
-            if not is_follow_schedule or not sch:
-                # Not schedule enforced: any punch = present
-                in_ok = bool(logs_today)
-                out_ok = bool(logs_today)
-            elif is_overnight:
-                in_ok = any(in_schedule_window(lg, sch, 'in') for lg in logs_today)
-                out_ok = any(in_schedule_window(lg, sch, 'out') for lg in logs_next_day)
-            else:
-                in_ok = any(in_schedule_window(lg, sch, 'in') for lg in logs_today)
-                out_ok = any(in_schedule_window(lg, sch, 'out') for lg in logs_today)
-
-            if in_ok and out_ok:
-                present += 1
-            # else: absent by default
-
         labels.append(dept.name)
-        present_list.append(present)
-        absent_list.append(len(emps) - present)
+        present_list.append(dept_present[dept.id])
+        absent_list.append(dept_total[dept.id] - dept_present[dept.id])
 
     return {
         'labels': labels,
@@ -573,125 +374,42 @@ def get_daily_attendance(att_date, *, is_follow_schedule=True, has_emp_list=True
         'clock_out': {'present': [...], 'present_count': X, 'absent_count': Y},
       }
     """
-    # ── 1) Build employee queryset ────────────────────────────────
-    emp_qs = employee_qs
-    total_emps = emp_qs.count()
+    # ── 1) Build employee list ────────────────────────────────────
+    employees = list(employee_qs)
+    total_emps = len(employees)
 
-    # ── 2) Build schedule map for this day (if needed) ────────────
-    sched_map = {}
+    # ── 2) Schedule windows ───────────────────────────────────────
     if is_follow_schedule:
-        jday = jdatetime.date.fromgregorian(date=att_date)
-        py_dow = jday.weekday()
-        ss_dow = PY_TO_SS_DOW_JALALI[py_dow]
-
-        qs = ShiftSchedule.objects.filter(
-            year=jday.year,
-            month=jday.month,
-            day_of_week=ss_dow,
-            is_active=True
-        )
-        sched_map = {sch.shift_id: sch for sch in qs}
-
-    # ── 3) Fetch raw logs ─────────────────────────────────────────
-    logs_by_emp = defaultdict(list)
-    emp_ids = list(emp_qs.values_list('id', flat=True))
-
-    # a) logs on the main date
-    logs_today = AttendanceLog.objects.filter(
-        timestamp__date=att_date,
-        employee_id__in=emp_ids
-    ).order_by('employee_id', 'timestamp')
-
-    for lg in logs_today:
-        logs_by_emp[lg.employee_id].append(lg)
+        grid = WindowGrid.build([e.shift_id for e in employees], [att_date], resolve_windows)
+    else:
+        grid = WindowGrid.empty(total_emps, 1)
+
+    # ── 3) Fetch raw logs (next day too for overnight shifts) and classify ──
+    logs = load_day_logs(
+        employees, att_date, grid,
+        fields=('employee_id', 'timestamp', 'verification_type', 'device_id')
+    )
+    res = classify(PunchArrays(chain.from_iterable(logs.values()), _emp_index(employees), att_date, 1), grid)
+    punch_rows = res.punches.rows
 
-    # b) for each emp whose schedule is overnight, also fetch next-day logs
-    if is_follow_schedule:
-        next_day = att_date + timedelta(days=1)
-        for emp in emp_qs:
-            sch = sched_map.get(emp.shift_id)
-            # Detect overnight: out_end_time < in_start_time (means checkout is next day)
-            if sch and sch.in_start_time and sch.out_start_time and sch.out_end_time:
-                # Detect overnight shift as before...
-                if (
-                        sch.out_start_time < sch.in_start_time or
-                        sch.out_end_time < sch.in_start_time or
-                        sch.out_start_time > sch.out_end_time
-                ):
-                    logs_next = AttendanceLog.objects.filter(
-                        timestamp__date=next_day,
-                        employee_id=emp.id,
-                        timestamp__time__gte=sch.out_start_time,
-                        timestamp__time__lte=sch.out_end_time,
-                    ).order_by('timestamp')
-                    logs_by_emp[emp.id].extend(logs_next)
-
-    # helper to test schedule window
-    def in_schedule_window(log, sch, punch_type):
-        t = log.timestamp.time()
-        if punch_type == 'in':
-            return sch.in_start_time <= t <= sch.in_end_time
-        # out-window may span midnight
-        if sch.out_start_time <= sch.out_end_time:
-            return sch.out_start_time <= t <= sch.out_end_time
-        else:
-            # overnight: after out_start (same day) or before out_end (next day)
-            return (t >= sch.out_start_time) or (t <= sch.out_end_time)
+    def as_record(emp, idx):
+        _emp_id, ts, vt, device_id = punch_rows[idx]
+        return {
+            'employee_id': emp.id,
+            'timestamp': ts,
+            'verification_type': vt,
+            'device_id': device_id,
+        }
 
-    # ── 4) Classify per employee ──────────────────────────────────
     ci_present = []
     co_present = []
+    for emp, ci, co in zip(employees, res.in_idx[:, 0].tolist(), res.out_idx[:, 0].tolist()):
+        if ci >= 0:
+            ci_present.append(as_record(emp, ci))
+        if co >= 0:
+            co_present.append(as_record(emp, co))
 
-    for emp in emp_qs:
-        emp_logs = sorted(logs_by_emp.get(emp.id, []), key=lambda L: L.timestamp)
-        if not emp_logs:
-            continue
-
-        # 4a) classify by count
-        ci = None
-        co = None
-        sch = sched_map.get(emp.shift_id) if is_follow_schedule else None
-
-        logs_today = [lg for lg in emp_logs if lg.timestamp.date() == att_date]
-        logs_next_day = [lg for lg in emp_logs if lg.timestamp.date() == (att_date + timedelta(days=1))]
-
-        is_overnight = False
-        if sch and sch.in_start_time and sch.out_start_time and sch.out_end_time:
-            is_overnight = (
-                    sch.out_start_time < sch.in_start_time or
-                    sch.out_end_time < sch.in_start_time or
-                    sch.out_start_time > sch.out_end_time
-            )
-
-        if is_overnight:
-            ci = next((lg for lg in logs_today if in_schedule_window(lg, sch, 'in')), None)
-            co = next((lg for lg in logs_next_day if in_schedule_window(lg, sch, 'out')), None)
-        else:
-            # your existing normal shift logic here
-            # For example:
-            if logs_today:
-                ci = next((lg for lg in logs_today if in_schedule_window(lg, sch, 'in')), None)
-                co = next((lg for lg in logs_today if in_schedule_window(lg, sch, 'out')), None)
-            else:
-                ci = None
-                co = None
-
-        if ci:
-            ci_present.append({
-                'employee_id': emp.id,
-                'timestamp': ci.timestamp,
-                'verification_type': ci.verification_type,
-                'device_id': ci.device_id,
-            })
-        if co:
-            co_present.append({
-                'employee_id': emp.id,
-                'timestamp': co.timestamp,
-                'verification_type': co.verification_type,
-                'device_id': co.device_id,
-            })
-
-    # ── 5) Package results ───────────────────────────────────────
+    # ── 4) Package results ───────────────────────────────────────
     def make_section(present_list):
         cnt = len(present_list)
         return {
@@ -706,7 +424,225 @@ def get_daily_attendance(att_date, *, is_follow_schedule=True, has_emp_list=True
     }
 
 
-def get_monthly_attendance(year, month, *, is_follow_schedule=True, employee_qs=None):
+def compute_daily_attendance(employees, gstart, gend, *, is_follow_schedule=True):
+    """
+    Classify every (employee, day) from gstart to gend (inclusive).
+    Returns a list of unsaved DailyAttendance rows (employee-major order).
+
+    Late logic: when no punch falls inside a window, the first (clock-in) or last
+    (clock-out) punch of the day is kept as "late" if it is within MIN_LATE_DELTA
+    of the window start; otherwise the day gets an absent mark.
+    """
+    employees = list(employees)
+    dates = month_dates(gstart, gend)
+    emp_index = _emp_index(employees)
+
+    # 1. Punches (+1 day for overnight clock-outs)
+    rows = (
+        AttendanceLog.objects
+        .for_range(gstart, gend + timedelta(days=1))
+        .for_employees(emp_index)
+        .values_list('employee_id', 'timestamp')
+    )
+
+    # 2. Schedule windows
+    if is_follow_schedule:
+        grid = WindowGrid.build([e.shift_id for e in employees], dates, resolve_windows)
+    else:
+        grid = WindowGrid.empty(len(employees), len(dates))
+    res = classify(PunchArrays(rows, emp_index, gstart, len(dates)), grid)
+
+    # 3. Late / absent marks
+    late_limit = MIN_LATE_DELTA.total_seconds()
+    has_logs = res.day_count > 0
+    first_sec = res.seconds(res.first_idx)
+    last_sec = res.seconds(res.last_idx)
+
+    in_missed = (res.in_idx < 0) & has_logs & grid.has_schedule
+    in_close = (grid.in_start >= 0) & (np.abs(first_sec - grid.in_start) <= late_limit)
+
+    # wrapped out-window: a punch before out_end is compared with the next day's out_start
+    out_target = np.where(
+        (grid.out_start > grid.out_end) & (last_sec <= grid.out_end),
+        grid.out_start + SECONDS_PER_DAY,
+        grid.out_start,
+    )
+    out_missed = (res.out_idx < 0) & has_logs & grid.has_schedule
+    out_close = (grid.out_start >= 0) & (np.abs(last_sec - out_target) <= late_limit)
+
+    absent_marks = (
+            (in_missed & ~in_close).astype(np.int32)
+            + (out_missed & ~out_close).astype(np.int32)
+            + (~has_logs & (res.next_count == 0)).astype(np.int32)
+    )
+
+    # 4. Holidays (any approved GH) and approved leave (anything except GH / CA)
+    holiday_col = np.zeros(len(dates), dtype=bool)
+    on_leave = np.zeros(grid.shape, dtype=bool)
+    vacs = EmployeeVacation.objects.filter(
+        status=EmployeeVacation.Status.APPROVED,
+        start_date__lte=gend,
+        end_date__gte=gstart
+    ).exclude(
+        type=EmployeeVacation.VacationType.CONSIDERATIONS
+    ).values_list('employee_id', 'type', 'start_date', 'end_date')
+    for emp_id, vac_type, start, end in vacs:
+        lo = (max(start, gstart) - gstart).days
+        hi = (min(end, gend) - gstart).days + 1
+        if vac_type == EmployeeVacation.VacationType.GENERAL_HOLIDAY:
+            holiday_col[lo:hi] = True
+        elif emp_id in emp_index:
+            on_leave[emp_index[emp_id], lo:hi] = True
+
+    # 5. Rows
+    scheduled = grid.has_schedule.tolist()
+    in_idx = res.in_idx.tolist()
+    out_idx = res.out_idx.tolist()
+    late_in = np.where(in_missed & in_close, res.first_idx, -1).tolist()
+    late_out = np.where(out_missed & out_close, res.last_idx, -1).tolist()
+    absent_marks = absent_marks.tolist()
+    on_leave = on_leave.tolist()
+    holiday_col = holiday_col.tolist()
+    punch_rows = res.punches.rows
+
+    def stamp(idx):
+        return punch_rows[idx][1] if idx >= 0 else None
+
+    facts = []
+    for e, emp in enumerate(employees):
+        for c, d in enumerate(dates):
+            facts.append(DailyAttendance(
+                employee_id=emp.id,
+                date=d,
+                is_scheduled=scheduled[e][c],
+                is_holiday=holiday_col[c],
+                is_on_leave=on_leave[e][c],
+                first_in=stamp(in_idx[e][c]),
+                first_out=stamp(out_idx[e][c]),
+                late_in=stamp(late_in[e][c]),
+                late_out=stamp(late_out[e][c]),
+                absent_marks=absent_marks[e][c],
+            ))
+    return facts
+
+
+def _lock_daily_attendance(shared):
+    """
+    Transaction-level advisory lock ordering recomputes against invalidations.
+
+    A recompute holds it shared from reading the punches until its upsert
+    commits; an invalidation holds it exclusive until its own transaction
+    commits. So either the invalidation waits and then deletes the freshly
+    upserted rows, or the recompute waits and then reads the committed change:
+    rows computed from data read before a change can never outlive its
+    invalidation.
+    """
+    function = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {function}(%s)", [DAILY_ATTENDANCE_LOCK_ID])
+
+
+def refresh_daily_attendance(employees, gstart, gend):
+    """
+    Recompute and upsert DailyAttendance rows for employees from gstart to gend.
+    Returns the saved rows.
+    """
+    with transaction.atomic():
+        _lock_daily_attendance(shared=True)
+        facts = compute_daily_attendance(employees, gstart, gend)
+        DailyAttendance.objects.bulk_create(
+            facts,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['employee', 'date'],
+            update_fields=[
+                'is_scheduled', 'is_holiday', 'is_on_leave', 'first_in', 'first_out',
+                'late_in', 'late_out', 'absent_marks', 'computed_at',
+            ],
+        )
+    return facts
+
+
+def load_daily_attendance(employees, gstart, gend):
+    """
+    Returns {(employee_id, date): DailyAttendance} for gstart..gend.
+    Rows that were never computed or have been invalidated are recomputed first,
+    only for the employees and the date span that are actually missing.
+    """
+    dates = month_dates(gstart, gend)
+    facts = {
+        (f.employee_id, f.date): f
+        for f in DailyAttendance.objects.filter(
+            employee_id__in=[e.id for e in employees],
+            date__range=(gstart, gend)
+        )
+    }
+
+    stale = []
+    missing = []
+    for emp in employees:
+        gaps = [d for d in dates if (emp.id, d) not in facts]
+        if gaps:
+            stale.append(emp)
+            missing.extend(gaps)
+    if stale:
+        for f in refresh_daily_attendance(stale, min(missing), max(missing)):
+            facts[(f.employee_id, f.date)] = f
+    return facts
+
+
+def invalidate_daily_attendance(*, employee_ids=None, start=None, end=None):
+    """
+    Drop DailyAttendance rows so they are recomputed on the next read.
+    Arguments left as None are not filtered on.
+    """
+    qs = DailyAttendance.objects.all()
+    if employee_ids is not None:
+        qs = qs.filter(employee_id__in=employee_ids)
+    if start is not None:
+        qs = qs.filter(date__gte=start)
+    if end is not None:
+        qs = qs.filter(date__lte=end)
+    with transaction.atomic():
+        _lock_daily_attendance(shared=False)
+        qs.delete()
+
+
+def invalidate_daily_attendance_for_logs(pairs):
+    """
+    pairs: iterable of (employee_id, punch date) that were added or removed.
+    A punch may be the overnight clock-out of the previous day, so that day is dropped too.
+    """
+    by_date = defaultdict(set)
+    for emp_id, d in pairs:
+        by_date[d].add(emp_id)
+        by_date[d - timedelta(days=1)].add(emp_id)
+    if not by_date:
+        return
+
+    q = Q()
+    for d, emp_ids in by_date.items():
+        q |= Q(date=d, employee_id__in=emp_ids)
+    with transaction.atomic():
+        _lock_daily_attendance(shared=False)
+        DailyAttendance.objects.filter(q).delete()
+
+
+def invalidate_daily_attendance_for_shift(shift_id, year):
+    """
+    Drop the rows of every employee on a shift for a whole Jalali year
+    (after its schedules were added, edited or deleted).
+    """
+    start, _ = JalaliTable.month_bounds(year, 1)
+    _, end = JalaliTable.month_bounds(year, 12)
+    invalidate_daily_attendance(
+        employee_ids=Employee.objects.filter(shift_id=shift_id).values_list('id', flat=True),
+        start=start,
+        end=end
+    )
+
+
+def get_monthly_attendance(year, month, *, is_follow_schedule=True, employee_qs=None, stream=False):
     """
     Returns (days, grid):
       days = [ { date, num, weekday, is_holiday }, … ]
@@ -725,47 +661,29 @@ def get_monthly_attendance(year, month, *, is_follow_schedule=True, employee_qs=
           'absent_days': int,
         }, …
       ]
+    With stream=True, grid is a generator yielding the same rows in order;
+    employees are classified in batches so memory stays bounded by the batch.
     """
     # 1) Gregorian range
-    jstart = jdatetime.date(year, month, 1)
-    jnext = jdatetime.date(year + (month // 12), (month % 12) + 1, 1)
-    gstart = jstart.togregorian()
-    gend = jnext.togregorian() - timedelta(days=1)
+    gstart, gend = JalaliTable.month_bounds(year, month)
+    dates = month_dates(gstart, gend)
 
     # 2) Build days array (exclude Fridays)
+    _jy, _jm, jdays, wdays = JalaliTable.from_dates(dates)
     days = []
-    cur = gstart
-    while cur <= gend:
-        if cur.weekday() != 4:
-            jd = jdatetime.date.fromgregorian(date=cur)
+    for cur, jday, wday in zip(dates, jdays.tolist(), wdays.tolist()):
+        if wday != 4:
             days.append({
                 'date': cur,
-                'num': jd.strftime('%d'),
-                'weekday': persian_wdays[cur.weekday()],
+                'num': f'{jday:02d}',
+                'weekday': persian_wdays[wday],
                 'is_holiday': False,
             })
-        cur += timedelta(days=1)
-
-    # 3) Employee queryset & ordering
-    emp_qs = employee_qs.order_by('user__first_name')
-    emp_ids = list(emp_qs.values_list('id', flat=True))
-
-    # 4) Preload attendance logs (all month and next-day for overnight shifts)
-    logs = AttendanceLog.objects.filter(
-        timestamp__date__range=(gstart, gend + timedelta(days=1)),  # +1 for overnight
-        employee_id__in=emp_ids
-    ).order_by('employee_id', 'timestamp')
-    emp_day_logs = defaultdict(list)
-    for lg in logs:
-        emp_day_logs[(lg.employee_id, lg.timestamp.date())].append(lg)
-
-    # 5) Preload schedules
-    sched_map = {}
-    if is_follow_schedule:
-        for sch in ShiftSchedule.objects.filter(year=year, month=month, is_active=True):
-            sched_map[(sch.shift_id, sch.day_of_week)] = sch
 
-    # 6) Preload vacations and reasons
+    # 3) Employee list & ordering
+    employees = list(employee_qs.select_related('user').order_by('user__first_name'))
+
+    # 4) Preload vacation reasons (leave / holiday status itself comes from the facts)
     vac_qs = EmployeeVacation.objects.filter(
         status=EmployeeVacation.Status.APPROVED,
         start_date__lte=gend,
@@ -795,31 +713,22 @@ def get_monthly_attendance(year, month, *, is_follow_schedule=True, employee_qs=
         if day['date'] in holiday_reasons:
             day['is_holiday'] = True
 
-    # 7) Weekday-to-DayOfWeek map (to match your schedule day codes)
-
-    # --- Helper for in-schedule logic (from daily logic) ---
-    def in_schedule_window(log, sch, punch_type):
-        t = log.timestamp.time()
-        if punch_type == 'in':
-            return sch.in_start_time <= t <= sch.in_end_time
-        # out-window may span midnight
-        if sch.out_start_time <= sch.out_end_time:
-            return sch.out_start_time <= t <= sch.out_end_time
-        else:
-            # overnight: after out_start (same day) or before out_end (next day)
-            return (t >= sch.out_start_time) or (t <= sch.out_end_time)
+    def fmt(ts):
+        return ts.strftime('%I:%M:%S %p')
 
     # --- Main Grid ---
-    grid = []
-    total_days = (gend - gstart).days + 1
-    num_fridays = 0
-    cur = gstart
-    while cur <= gend:
-        if cur.weekday() == 4:
-            num_fridays += 1
-        cur += timedelta(days=1)
-
-    for emp in emp_qs:
+    num_fridays = len(dates) - len(days)
+
+    def facts_for(batch):
+        # materialized rows when following schedules, computed on the fly otherwise
+        if is_follow_schedule:
+            return load_daily_attendance(batch, gstart, gend)
+        return {
+            (f.employee_id, f.date): f
+            for f in compute_daily_attendance(batch, gstart, gend, is_follow_schedule=False)
+        }
+
+    def build_row(emp, facts):
         row = {
             'employee': emp,
             'attendance': [],
@@ -829,7 +738,8 @@ def get_monthly_attendance(year, month, *, is_follow_schedule=True, employee_qs=
             'consideration': ''
         }
         cons = []
-        shift_id = emp.shift_id
+        emp_vacs = vac_map.get(emp.id, {})
+        emp_cons = considerations_map.get(emp.id, {})
 
         for d in days:
             cell = {
@@ -839,109 +749,51 @@ def get_monthly_attendance(year, month, *, is_follow_schedule=True, employee_qs=
                 'public_holiday': False
             }
             date = d['date']
-            dow = PY_TO_SS_DOW_GREGORIAN[date.weekday()]
-            sch = sched_map.get((shift_id, dow)) if is_follow_schedule else None
+            fact = facts[(emp.id, date)]
             # skip unscheduled
-            if is_follow_schedule and not sch:
+            if is_follow_schedule and not fact.is_scheduled:
                 row['attendance'].append(cell)
                 continue
             # public holiday
-            if date in holiday_reasons:
+            if fact.is_holiday:
                 cell['public_holiday'] = True
                 row['leave_count'] += 1
-                cons.extend(holiday_reasons[date])
+                cons.extend(holiday_reasons.get(date, []))
                 row['attendance'].append(cell)
                 continue
-            # employee leave
-            reasons = vac_map[emp.id].get(date, [])
             # Add consideration notes (these do not affect attendance)
-            c_notes = considerations_map[emp.id].get(date, [])
+            c_notes = emp_cons.get(date, [])
             if c_notes:
                 cons.extend(c_notes)
-            if reasons:
+            # employee leave
+            if fact.is_on_leave:
                 cell['on_leave'] = True
                 row['leave_count'] += 1
-                cons.extend(reasons)
+                cons.extend(emp_vacs.get(date, []))
                 row['attendance'].append(cell)
                 continue
 
-            # --- LOGIC FROM get_daily_attendance for clock-in/out ---
-            # Get logs for this employee on this date (and next day for overnight)
-            emp_logs = sorted(emp_day_logs.get((emp.id, date), []), key=lambda L: L.timestamp)
-            next_day_logs = sorted(emp_day_logs.get((emp.id, date + timedelta(days=1)), []), key=lambda L: L.timestamp)
-            is_overnight = False
-            if sch and sch.in_start_time and sch.out_start_time and sch.out_end_time:
-                is_overnight = (
-                        sch.out_start_time < sch.in_start_time or
-                        sch.out_end_time < sch.in_start_time or
-                        sch.out_start_time > sch.out_end_time
-                )
-
-            ci, co = None, None
-            if is_overnight:
-                if emp_logs:
-                    ci = next((lg for lg in emp_logs if in_schedule_window(lg, sch, 'in')), None)
-                if next_day_logs:
-                    co = next((lg for lg in next_day_logs if in_schedule_window(lg, sch, 'out')), None)
-            else:
-                if emp_logs:
-                    ci = next((lg for lg in emp_logs if in_schedule_window(lg, sch, 'in')), None)
-                    co = next((lg for lg in emp_logs if in_schedule_window(lg, sch, 'out')), None)
-
-            if ci:
+            if fact.first_in:
                 cell['am'] = True
-                cell['am_time'] = ci.timestamp.strftime('%I:%M:%S %p')
+                cell['am_time'] = fmt(fact.first_in)
                 row['present_count'] += 1
-            if co:
+            if fact.first_out:
                 cell['pm'] = True
-                cell['pm_time'] = co.timestamp.strftime('%I:%M:%S %p')
+                cell['pm_time'] = fmt(fact.first_out)
                 row['present_count'] += 1
 
-            # Optional: late/extra log logic (not strictly needed)
-            late_threshold = MIN_LATE_DELTA  # Define the threshold for considering a log as absent
-            if not ci and emp_logs and sch:
-                late_in = min(emp_logs, key=lambda x: x.timestamp)
-                log_time = late_in.timestamp.time()
-                # Convert schedule in_start_time to a comparable datetime for the same day
-                sched_in_time = datetime.combine(date, sch.in_start_time)
-                log_datetime = datetime.combine(date, log_time)
-                # Check if the log is within 2 hours of the in_start_time
-                time_diff = abs((log_datetime - sched_in_time).total_seconds())
-                if time_diff <= late_threshold.total_seconds():
-                    cell['late'] = late_in.timestamp.strftime('%I:%M:%S %p')
-                else:
-                    row['absent_count'] += 1
-
-            if not co and emp_logs and sch:
-                late_out = max(emp_logs, key=lambda x: x.timestamp)
-                log_time = late_out.timestamp.time()
-                # Convert schedule out_start_time to a comparable datetime
-                sched_out_time = datetime.combine(date, sch.out_start_time)
-                log_datetime = datetime.combine(date, log_time)
-                # Handle overnight schedules
-                if sch.out_start_time > sch.out_end_time and log_time <= sch.out_end_time:
-                    # Log is likely on the next day
-                    sched_out_time = datetime.combine(date + timedelta(days=1), sch.out_start_time)
-                time_diff = abs((log_datetime - sched_out_time).total_seconds())
-                if time_diff <= late_threshold.total_seconds():
-                    cell['late'] = late_out.timestamp.strftime('%I:%M:%S %p')
-                else:
-                    row['absent_count'] += 1
-
-            if not emp_logs and not next_day_logs:
-                row['absent_count'] += 1
+            if fact.late_out:
+                cell['late'] = fmt(fact.late_out)
+            elif fact.late_in:
+                cell['late'] = fmt(fact.late_in)
+            row['absent_count'] += fact.absent_marks
 
             row['attendance'].append(cell)
 
         # dedupe considerations
-        unique_cons = []
-        for r in cons:
-            if r not in unique_cons:
-                unique_cons.append(r)
-        row['consideration'] = ', '.join(unique_cons)
+        row['consideration'] = ', '.join(dict.fromkeys(cons))
 
         # SUMMARY COUNTS (with rules)
-        total_days = len(days)
         # present_days: both am & pm on time and no late/leave/holiday
         present_days = sum(
             1 for cell in row['attendance']
@@ -959,9 +811,17 @@ def get_monthly_attendance(year, month, *, is_follow_schedule=True, employee_qs=
         row['leave_days'] = leave_days
         row['absent_days'] = absent_days
 
-        grid.append(row)
+        return row
 
-    return days, grid
+    def iter_rows():
+        for batch in chunked(employees, MONTHLY_BATCH_SIZE):
+            facts = facts_for(batch)
+            for emp in batch:
+                yield build_row(emp, facts)
+
+    if stream:
+        return days, iter_rows()
+    return days, list(iter_rows())
 
 
 def group_logs_by_min_interval(logs, min_interval_minutes=15):
@@ -985,44 +845,31 @@ def get_attendance_summary(year, month, *, is_follow_schedule=True, employee_qs=
       - consideration: comma-joined vacation reasons
     """
     # 1) Determine date range
-    jstart = jdatetime.date(year, month, 1)
-    jnext = jdatetime.date(year + (month // 12), (month % 12) + 1, 1)
-    gstart = jstart.togregorian()
-    gend = jnext.togregorian() - timedelta(days=1)
+    gstart, gend = JalaliTable.month_bounds(year, month)
+    dates = month_dates(gstart, gend)
 
     # 2) Build working days (exclude Fridays for attendance grid)
-    days = []
-    cur = gstart
-    while cur <= gend:
-        if cur.weekday() != 4:
-            days.append(cur)
-        cur += timedelta(days=1)
+    work_days = [d for d in dates if d.weekday() != 4]
+    _jy, _jm, jdays, _wd = JalaliTable.from_dates(work_days)
+    jalali_day = {d: f'{jday:02d}' for d, jday in zip(work_days, jdays.tolist())}
 
     # 3) Count Fridays in month
-    total_days = (gend - gstart).days + 1
-    fri_days = sum(1 for i in range(total_days)
-                   if (gstart + timedelta(days=i)).weekday() == 4)
-
-    # 4) Employee queryset
-    emps = employee_qs
-
-    # 5) Fetch logs (for full month + 1 day for overnight support)
-    emp_ids = list(emps.values_list('id', flat=True))
-    logs = AttendanceLog.objects.filter(
-        timestamp__date__range=(gstart, gend + timedelta(days=1)),
-        employee_id__in=emp_ids
-    )
-    day_logs = defaultdict(list)
-    for lg in logs:
-        day_logs[(lg.employee_id, lg.timestamp.date())].append(lg)
+    total_days = len(dates)
+    fri_days = total_days - len(work_days)
+
+    # 4) Employee list
+    employees = list(employee_qs.select_related('user').order_by('user__first_name'))
 
-    # 6) Fetch schedules if needed
-    sched = {}
+    # 5) Attendance facts: materialized rows when following schedules, computed on the fly otherwise
     if is_follow_schedule:
-        for s in ShiftSchedule.objects.filter(year=year, month=month, is_active=True):
-            sched[(s.shift_id, s.day_of_week)] = s
+        facts = load_daily_attendance(employees, gstart, gend)
+    else:
+        facts = {
+            (f.employee_id, f.date): f
+            for f in compute_daily_attendance(employees, gstart, gend, is_follow_schedule=False)
+        }
 
-    # 7) Fetch vacations
+    # 6) Fetch vacations (leave type counts and consideration notes)
     vacs = EmployeeVacation.objects.filter(
         status=EmployeeVacation.Status.APPROVED,
         start_date__lte=gend, end_date__gte=gstart
@@ -1031,7 +878,7 @@ def get_attendance_summary(year, month, *, is_follow_schedule=True, employee_qs=
     holiday_days = set()
     holiday_reasons = defaultdict(list)
     considerations_map = defaultdict(lambda: defaultdict(list))
-    emp_vacation_days = defaultdict(set)
+    vacation_reasons = defaultdict(lambda: defaultdict(list))
     for vac in vacs:
         vs = max(vac.start_date, gstart)
         ve = min(vac.end_date, gend)
@@ -1040,6 +887,8 @@ def get_attendance_summary(year, month, *, is_follow_schedule=True, employee_qs=
             if d.weekday() == 4:
                 d += timedelta(days=1)
                 continue
+            if vac.reason:
+                vacation_reasons[vac.employee_id][d].append(vac.reason)
             if vac.type == EmployeeVacation.VacationType.GENERAL_HOLIDAY:
                 holiday_days.add(d)
                 if vac.reason:
@@ -1049,24 +898,33 @@ def get_attendance_summary(year, month, *, is_follow_schedule=True, employee_qs=
                     considerations_map[vac.employee_id][d].append(vac.reason)
             else:
                 type_counts[vac.employee_id][vac.type] += 1
-                emp_vacation_days[vac.employee_id].add(d)
             d += timedelta(days=1)
 
-    # 8) Helper for schedule window logic
-    def in_schedule_window(log, sch, punch_type):
-        t = log.timestamp.time()
-        if punch_type == 'in':
-            return sch.in_start_time <= t <= sch.in_end_time
-        # out-window may span midnight
-        if sch.out_start_time <= sch.out_end_time:
-            return sch.out_start_time <= t <= sch.out_end_time
-        else:
-            # overnight: after out_start (same day) or before out_end (next day)
-            return (t >= sch.out_start_time) or (t <= sch.out_end_time)
+    # consideration notes only depend on holidays for employees without own entries
+    holiday_consider = []
+    for d in work_days:
+        holiday_consider.extend(holiday_reasons.get(d, []))
 
-    # 9) Summary build
+    def consider_for(emp_id):
+        if emp_id not in vacation_reasons and emp_id not in considerations_map:
+            return holiday_consider
+        consider = []
+        for d in work_days:
+            # Holiday?
+            if d in holiday_days:
+                consider.extend(holiday_reasons.get(d, []))
+                continue
+            # Employee vacation?
+            if facts[(emp_id, d)].is_on_leave:
+                consider.extend(vacation_reasons[emp_id].get(d, []))
+                continue
+            # Add any consideration notes (do not skip the day)
+            consider.extend(considerations_map[emp_id].get(d, []))
+        return consider
+
+    # 7) Summary build
     summary = []
-    for emp in emps.order_by('user__first_name'):
+    for emp in employees:
         row = {'employee': emp}
         # leave type fields
         row['haj'] = type_counts[emp.id].get('HJ', 0)
@@ -1079,63 +937,19 @@ def get_attendance_summary(year, month, *, is_follow_schedule=True, employee_qs=
         row['general_holiday'] = len(holiday_days)
         row['fri_days'] = fri_days
 
+        # a working day counts when it's not a holiday, not a leave day and (if enforced) scheduled
         present = 0
         absent_list = []
-        consider = []
-
-        for d in days:
-            jd_day = jdatetime.date.fromgregorian(date=d).strftime('%d')
-            # Holiday?
-            if d in holiday_days:
-                consider.extend(holiday_reasons.get(d, []))
+        for d in work_days:
+            fact = facts[(emp.id, d)]
+            if fact.is_holiday or fact.is_on_leave:
                 continue
-            # Employee vacation?
-            if d in emp_vacation_days[emp.id]:
-                consider.extend([vac.reason for vac in vacs if vac.employee_id == emp.id and max(vac.start_date, gstart) <= d <= min(vac.end_date, gend) and vac.reason])
+            if is_follow_schedule and not fact.is_scheduled:
                 continue
-
-            # Add any consideration notes (do not skip the day)
-            c_notes = considerations_map[emp.id].get(d, [])
-            if c_notes:
-                consider.extend(c_notes)
-
-            # Schedule for this day
-            if is_follow_schedule:
-                dow = PY_TO_SS_DOW_GREGORIAN[d.weekday()]
-                sch = sched.get((emp.shift_id, dow))
-                if not sch:
-                    continue  # Skip unscheduled days
-            else:
-                sch = None
-
-            # --- Use 100% monthly logic here ---
-            emp_logs = sorted(day_logs.get((emp.id, d), []), key=lambda x: x.timestamp)
-            next_day_logs = sorted(day_logs.get((emp.id, d + timedelta(days=1)), []), key=lambda x: x.timestamp)
-
-            is_overnight = False
-            if sch and sch.in_start_time and sch.out_start_time and sch.out_end_time:
-                is_overnight = (
-                        sch.out_start_time < sch.in_start_time or
-                        sch.out_end_time < sch.in_start_time or
-                        sch.out_start_time > sch.out_end_time
-                )
-
-            ci, co = None, None
-            if is_overnight:
-                if emp_logs:
-                    ci = next((lg for lg in emp_logs if in_schedule_window(lg, sch, 'in')), None)
-                if next_day_logs:
-                    co = next((lg for lg in next_day_logs if in_schedule_window(lg, sch, 'out')), None)
-            else:
-                if emp_logs:
-                    ci = next((lg for lg in emp_logs if in_schedule_window(lg, sch, 'in')), None)
-                    co = next((lg for lg in emp_logs if in_schedule_window(lg, sch, 'out')), None)
-
-
-            if ci and co:
+            if fact.first_in and fact.first_out:
                 present += 1
             else:
-                absent_list.append({'day': jd_day, 'is_thursday': d.weekday() == 3})
+                absent_list.append({'day': jalali_day[d], 'is_thursday': d.weekday() == 3})
 
         row['present'] = present
         leave_days = (row['haj'] + row['pastime'] + row['n_sick'] + row['sick'] +
@@ -1144,97 +958,77 @@ def get_attendance_summary(year, month, *, is_follow_schedule=True, employee_qs=
         row['leave'] = leave_days
         row['absent'] = total_days - present - leave_days
         row['absent_list'] = absent_list
-        row['consideration'] = ', '.join(dict.fromkeys(consider))
+        row['consideration'] = ', '.join(dict.fromkeys(consider_for(emp.id)))
 
         summary.append(row)
 
     return summary
 
 
-def chunked(sequence, size):
-    return [sequence[i: i + size] for i in range(0, len(sequence), size)]
-
-def sync_attendance_logs_raw():
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    print(f"{now}  🔄 Syncing RAW attendance logs from devices…")
-
-    devices = Device.objects.filter(
-        status=Device.Status.ENABLED,
-        device_type=Device.DeviceType.ATTENDANCE
-    )
+_ABSENCE_RUNS_SQL = """
+WITH spans AS (
+    -- days covered by at least one punch
+    SELECT DISTINCT employee_id, "timestamp"::date AS s, "timestamp"::date AS e
+    FROM {logs}
+    WHERE employee_id = ANY(%(emps)s) AND "timestamp" >= %(lo)s AND "timestamp" < %(hi)s
+    UNION ALL
+    -- approved vacation intervals clipped to the window
+    SELECT employee_id, GREATEST(start_date, %(start)s::date), LEAST(end_date, %(end)s::date)
+    FROM {vacations}
+    WHERE employee_id = ANY(%(emps)s) AND status = %(approved)s
+      AND start_date <= %(end)s::date AND end_date >= %(start)s::date
+    UNION ALL
+    -- sentinels just outside the window close leading / trailing runs
+    SELECT emp, %(start)s::date - 1, %(start)s::date - 1 FROM unnest(%(emps)s) AS emp
+    UNION ALL
+    SELECT emp, %(end)s::date + 1, %(end)s::date + 1 FROM unnest(%(emps)s) AS emp
+),
+gaps AS (
+    SELECT employee_id,
+           MAX(e) OVER (PARTITION BY employee_id ORDER BY s, e
+                        ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) + 1 AS run_start,
+           s - 1 AS run_end
+    FROM spans
+)
+SELECT DISTINCT ON (employee_id) employee_id, run_start, run_end
+FROM gaps
+WHERE run_end - run_start + 1 >= %(min_days)s
+ORDER BY employee_id, run_start DESC
+"""
+
+
+def get_absence_runs(employees, start, end, min_days):
+    """
+    Latest run of at least min_days consecutive absent days per employee,
+    between start and end (inclusive). A day is covered by any punch or an
+    approved vacation; everything else counts as absent.
 
-    total_fetched = 0
-    total_saved = 0
+    Computed in the database (gaps between covered intervals), so the cost
+    follows the number of punch days, not employees × calendar days.
 
-    for device in devices:
-        cfg = DeviceConfig(
-            ip=device.ip_address,
-            port=device.port,
-            com_key=device.com_key
-        )
+    Returns: {employee_id: (run_start, run_end)}
+    """
+    emp_ids = [getattr(e, 'pk', e) for e in employees]
+    if not emp_ids:
+        return {}
 
-        if not is_device_online(cfg):
-            print(f"❌ Device {device.name} offline—skipping.")
-            continue
-
-        try:
-            logs = get_attendance_logs(cfg)
-        except Exception as e:
-            print(f"❌ Failed to fetch from {device.name}: {e}")
-            continue
-
-        total_fetched += len(logs)
-        if not logs:
-            print(f"ℹ️ No new logs on {device.name}.")
-            continue
-
-        entries = []
-        for raw in logs:
-            uid = raw.get('user_id')
-            ts = raw.get('timestamp')
-            try:
-                emp = Employee.objects.get(employee_id=uid)
-            except Employee.DoesNotExist:
-                continue
+    sql = _ABSENCE_RUNS_SQL.format(
+        logs=AttendanceLog._meta.db_table,
+        vacations=EmployeeVacation._meta.db_table,
+    )
+    params = {
+        'emps': emp_ids,
+        'start': start,
+        'end': end,
+        'lo': datetime.combine(start, datetime.min.time()),
+        'hi': datetime.combine(end + timedelta(days=1), datetime.min.time()),
+        'approved': EmployeeVacation.Status.APPROVED,
+        'min_days': min_days,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {eid: (run_start, run_end) for eid, run_start, run_end in cursor.fetchall()}
 
-            # make sure timestamp is timezone-aware
-            if ts.tzinfo is None:
-                ts = make_aware(ts)
-
-            raw_status = raw.get('status', 1)
-            try:
-                raw_status = int(raw_status)
-            except (TypeError, ValueError):
-                raw_status = 1  # default to fingerprint if it’s really busted
-
-            entries.append(AttendanceLog(
-                employee=emp,
-                device=device,
-                timestamp=ts,
-                status=raw.get('punch'),
-                verification_type=VERIFICATION_MAP.get(
-                    raw.get('status'),
-                    AttendanceLog.VerificationType.MANUAL
-                ),
-                # leave log_type alone (it will be NULL in the DB)
-            ))
 
-        # bulk save all raw punches
-        try:
-            with transaction.atomic():
-                AttendanceLog.objects.bulk_create(entries, ignore_conflicts=True)
-                total_saved += len(entries)
-        except IntegrityError as e:
-            print(f"❌ Error saving logs for {device.name}: {e}")
-
-        # optional: clear devices if it has lots of logs
-        if len(logs) > CLEAR_ATT_LOGS_IF_MORE_THAN:
-            try:
-                delete_device_data(cfg, clear_logs=True)
-                print(f"🧹 Cleared logs on {device.name}")
-            except Exception as e:
-                print(f"⚠️ Couldn't clear {device.name}: {e}")
-
-    print("✅ Raw sync complete.")
-    print(f"  → Logs fetched: {total_fetched}")
-    print(f"  → Records saved: {total_saved}")
+def chunked(sequence, size):
+    return [sequence[i: i + size] for i in range(0, len(sequence), size)]
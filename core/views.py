@@ -1,11 +1,14 @@
 from datetime import date
 
 import jdatetime
+from django.conf import settings
 from django.contrib.auth.decorators import user_passes_test, login_required
 from django.http import JsonResponse, HttpResponseForbidden
-from django.shortcuts import render
+from django.shortcuts import redirect, render
 
 from config.constants import PERSIAN_MONTHS
+from core import request_profiler
+from core.query_budget import query_budget
 from core.utils import dashboard_get_monthly_attendance, dashboard_get_daily_attendance, dashboard_get_attendance_by_department, shifts_missing_schedule_of_months_for_year
 from employee.models import Employee, Department
 from django.utils.translation import gettext as _
@@ -29,6 +32,7 @@ def dashboard(request):
 
 @login_required(login_url='login')
 @user_passes_test(any_dashboard_perm, login_url='login')
+@query_budget(15)
 def dashboard_data(request):
     user = request.user
 
@@ -126,3 +130,21 @@ def dashboard_data(request):
         resp['department'] = dept_data
 
     return JsonResponse(resp)
+
+
+@login_required(login_url='login')
+@user_passes_test(lambda user: user.is_superuser, login_url='login')
+def request_profiles(request):
+    """
+    p50/p95 per view of the requests profiled by this process; POST empties the buffer.
+    """
+    if request.method == 'POST':
+        request_profiler.clear()
+        return redirect('request_profiles')
+    profiles = request_profiler.entries()
+    return render(request, 'core/request_profiles.html', {
+        'enabled': settings.REQUEST_PROFILING,
+        'sample_rate': settings.REQUEST_PROFILING_SAMPLE_RATE,
+        'total': len(profiles),
+        'stats': request_profiler.view_stats(profiles),
+    })
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-17 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0013_alter_shift_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleVersion',
+            fields=[
+                ('year', models.PositiveIntegerField(primary_key=True, serialize=False, verbose_name='Year')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Version')),
+            ],
+            options={
+                'verbose_name': 'Schedule Version',
+                'verbose_name_plural': 'Schedule Versions',
+                'default_permissions': (),
+            },
+        ),
+    ]
@@ -99,6 +99,21 @@ class ShiftSchedule(models.Model):
         )
 
 
+class ScheduleVersion(models.Model):
+    """
+    Change counter of the ShiftSchedule rows of a Jalali year, bumped by
+    invalidate_schedule_calendar() so every process drops its cached calendar.
+    Year 0 counts changes that affect every year.
+    """
+    year = models.PositiveIntegerField(_('Year'), primary_key=True)
+    version = models.PositiveIntegerField(_('Version'), default=0)
+
+    class Meta:
+        verbose_name = _('Schedule Version')
+        verbose_name_plural = _('Schedule Versions')
+        default_permissions = ()
+
+
 class Department(models.Model):
     name = models.CharField(_('Department Name'), max_length=150, unique=True)
     created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
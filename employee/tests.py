@@ -1,3 +1,34 @@
-from django.test import TestCase
+from core.query_budget import QueryBudgetTestCase
+from employee import views
+from employee.models import Employee, Shift
 
-# Create your tests here.
+
+class QueryBudgetTests(QueryBudgetTestCase):
+    """
+    The employee, department and shift list endpoints stay within their
+    @query_budget and do not run more queries when the data grows.
+    """
+    workload = dict(departments=2, employees=12, shifts=2, months=1, holidays=0, seed=21)
+    growth = dict(departments=3, employees=20, shifts=3, months=1, holidays=0, seed=22)
+
+    def grow(self):
+        super().grow()
+        # a few archived ones for the archive list
+        Employee.objects.filter(pk__in=Employee.objects.order_by('-pk').values('pk')[:8]).update(is_archive=True)
+
+    def test_fetch_employees(self):
+        self.check(views.fetch_employees, 'fetch_employees', {'page': 1, 'page_size': 25})
+
+    def test_fetch_emp_archive(self):
+        Employee.objects.filter(pk__in=Employee.objects.order_by('pk').values('pk')[:4]).update(is_archive=True)
+        self.check(views.fetch_emp_archive, 'fetch_emp_archive', {'page': 1, 'page_size': 25})
+
+    def test_fetch_departments(self):
+        self.check(views.fetch_departments, 'fetch_departments', {'page': 1, 'page_size': 25})
+
+    def test_fetch_shifts(self):
+        self.check(views.fetch_shifts, 'fetch_shifts', {'page': 1, 'page_size': 25})
+
+    def test_fetch_shift_years(self):
+        shift = Shift.objects.first()
+        self.check(views.fetch_shift_years, 'fetch_shift_years', query={'shift_id': shift.id})
@@ -19,7 +19,10 @@ from django.views.decorators.http import require_POST
 
 from attendance.models import BiometricRecord
 from config.constants import PERSIAN_MONTHS
-from core.utils import get_employee_leave_summary
+from core.device_sync import replay_quarantined_logs
+from core.query_budget import query_budget
+from core.schedule_calendar import invalidate_schedule_calendar
+from core.utils import get_employee_leave_summary, invalidate_daily_attendance, invalidate_daily_attendance_for_shift
 from employee.models import Department, Shift, Employee, ShiftSchedule, EmployeeDocument
 from libraries.pdate.calendar_utils import get_today_persian_date, jalali_datetime_str
 from users.models import User
@@ -31,6 +34,7 @@ def employees(request):
 
 @login_required(login_url='login')
 @permission_required('core.view_employee_list', raise_exception=True)
+@query_budget(6)
 def fetch_employees(request):
     if request.method != 'POST':
         return JsonResponse({'error': _("Invalid request method.")}, status=400)
@@ -44,7 +48,7 @@ def fetch_employees(request):
     # ─── pull in optional dept filter ───────────────────────────
     dept_id = request.POST.get('department')
     # only active employees here
-    qs = Employee.objects.select_related('user').filter(is_archive=False)
+    qs = Employee.objects.select_related('user', 'department', 'shift').filter(is_archive=False)
     # apply department filter if provided
     if dept_id:
         qs = qs.filter(department_id=dept_id)
@@ -113,6 +117,7 @@ def emp_archive(request):
 
 @login_required(login_url='login')
 @permission_required('core.view_employee_archive_list', raise_exception=True)
+@query_budget(6)
 def fetch_emp_archive(request):
     if request.method != 'POST':
         return JsonResponse({'error': _("Invalid request method.")}, status=400)
@@ -123,11 +128,10 @@ def fetch_emp_archive(request):
     order_by = request.POST.get('order_by', 'employee_id')
     order_dir = request.POST.get('order_dir', 'asc')
 
-    qs = Employee.objects.select_related('user').filter(is_archive=True)
     # ─── pull in optional dept filter ───────────────────────────
     dept_id = request.POST.get('department')
-    # only active employees here
-    qs = Employee.objects.select_related('user').filter(is_archive=True)
+    # only archived employees here
+    qs = Employee.objects.select_related('user', 'department', 'shift').filter(is_archive=True)
     # apply department filter if provided
     if dept_id:
         qs = qs.filter(department_id=dept_id)
@@ -516,7 +520,7 @@ def add_employee(request):
                 dept = Department.objects.filter(id=dept_id).first()
                 shift = Shift.objects.filter(id=shift_id).first()
 
-                Employee.objects.create(
+                emp = Employee.objects.create(
                     user=user,
                     employee_id=employee_id or default_employee_id,
                     father_name=father_name,
@@ -538,6 +542,8 @@ def add_employee(request):
                     is_head_of_dep=is_head_of_dep,
                     address=address,
                 )
+                # punches synced before this employee was enrolled
+                replay_quarantined_logs([emp])
 
             messages.success(request, _("Employee “%(name)s” added.") % {'name': user.get_full_name() or user.username})
             return redirect('employees')
@@ -678,12 +684,14 @@ def edit_employee(request, employee_id):
                 user.save()
 
                 # — update Employee —
+                old_employee_id = emp.employee_id
                 emp.employee_id = emp_id_val
                 emp.father_name = father_name
                 emp.grand_father_name = grand_father
                 emp.position = position
                 emp.is_device_admin = is_device_admin
                 emp.department = Department.objects.filter(id=dept_id).first()
+                old_shift_id = emp.shift_id
                 emp.shift = Shift.objects.filter(id=shift_id).first()
                 emp.work_type = work_type
                 emp.duty_days = duty_days
@@ -698,6 +706,10 @@ def edit_employee(request, employee_id):
                 emp.extra_info = extra_info
                 emp.is_head_of_dep = is_head
                 emp.save()
+                if emp.shift_id != old_shift_id:
+                    invalidate_daily_attendance(employee_ids=[emp.id])
+                if emp.employee_id != old_employee_id:
+                    replay_quarantined_logs([emp])
 
             messages.success(
                 request,
@@ -748,6 +760,7 @@ def departments(request):
 
 @login_required(login_url='login')
 @permission_required('core.view_department_list', raise_exception=True)
+@query_budget(5)
 def fetch_departments(request):
     if request.method != 'POST':
         return JsonResponse({'error': _("Invalid request method.")}, status=400)
@@ -893,6 +906,7 @@ def shifts(request):
 
 @login_required(login_url='login')
 @permission_required('core.view_shift_list', raise_exception=True)
+@query_budget(5)
 def fetch_shifts(request):
     if request.method != 'POST':
         return JsonResponse({'error': _("Invalid request method.")}, status=400)
@@ -949,6 +963,7 @@ def fetch_shifts(request):
 
 @login_required(login_url='login')
 @permission_required('core.view_shift_list', raise_exception=True)
+@query_budget(3)
 def fetch_shift_years(request):
     """
     AJAX: given ?shift_id=NNN, return all the distinct years
@@ -1022,6 +1037,8 @@ def add_shift_year(request):
             cursor.execute(sql)
 
         ShiftSchedule.objects.bulk_create(clones)
+        invalidate_schedule_calendar(new_year)
+        invalidate_daily_attendance_for_shift(shift.id, new_year)
 
     return JsonResponse({'success': True})
 
@@ -1051,6 +1068,8 @@ def delete_shift_year(request):
 
     # delete all schedules for that year
     ShiftSchedule.objects.filter(shift=shift, year=year).delete()
+    invalidate_schedule_calendar(year)
+    invalidate_daily_attendance_for_shift(shift.id, year)
     return JsonResponse({'success': True})
 
 @login_required(login_url='login')
@@ -1097,6 +1116,7 @@ def add_shift(request):
                             # in_*/out_* times left NULL for later editing
                         ))
                 ShiftSchedule.objects.bulk_create(schedules)
+            invalidate_schedule_calendar(current_date.year)
 
             messages.success(request, _("Shift “%(name)s” created.") % {'name': name})
             return redirect('shifts')
@@ -1150,8 +1170,12 @@ def delete_shift(request):
 
         # Atomically delete schedules then the shift
         with transaction.atomic():
+            years = list(shift.schedules.values_list('year', flat=True).distinct())
+            for year in years:
+                invalidate_daily_attendance_for_shift(shift.id, year)
             ShiftSchedule.objects.filter(shift=shift).delete()
             shift.delete()
+        invalidate_schedule_calendar()
 
         return JsonResponse({'success': True})
 
@@ -1180,6 +1204,8 @@ def view_shift(request, shift_id):
             # active flag
             sched.is_active = request.POST.get(f'active_{sched.id}') == 'on'
             sched.save()
+        invalidate_schedule_calendar(year)
+        invalidate_daily_attendance_for_shift(shift.id, year)
         messages.success(request, _("Shift schedule for %(year)s updated.") % {'year': year})
         # redirect to clean the POST
         return redirect(f"{reverse('view_shift', args=[shift_id])}?year={year}")
@@ -1,9 +1,8 @@
 from datetime import date
 from types import SimpleNamespace
 
-import jdatetime
-
 from libraries.pdate.civil_date import CivilDate
+from libraries.pdate.persian.jalali_table import JalaliTable
 from libraries.pdate.persian_date import PersianDate
 
 _DIGITS = "0123456789"
@@ -48,8 +47,8 @@ def get_today_persian_date():
 
 def jalali_datetime_str(gregorian_dt):
     # 1) Convert just the date to Jalali
-    jdate = jdatetime.date.fromgregorian(date=gregorian_dt.date())
+    jdate = JalaliTable.format(gregorian_dt.date())
     # 2) Format the time with Python's datetime (which handles %I correctly)
     time_str = gregorian_dt.strftime('%I:%M %p')  # e.g. "10:33 PM"
     # 3) Build the final string
-    return f"{jdate.year}/{jdate.month:02d}/{jdate.day:02d} {time_str}"
\ No newline at end of file
+    return f"{jdate} {time_str}"
\ No newline at end of file
@@ -0,0 +1,105 @@
+from datetime import date
+
+import numpy as np
+
+from libraries.pdate.persian.lookup_table_converter import LookupTableConverter
+from libraries.pdate.persian_date import PersianDate
+
+
+class JalaliTable:
+    """
+    Day-indexed Jalali calendar built from LookupTableConverter.years_starting_jdn.
+
+    Entry i describes Gregorian ordinal first_ordinal + i: Jalali year, month,
+    day and Python weekday (Monday=0). Covers 1206/01/01 to the last day of the
+    year before the table's final year start; dates outside fall back to PersianDate.
+    """
+    jdn_offset = 1721425  # jdn - date.toordinal()
+    first_ordinal = 0
+    last_ordinal = -1
+    years = None
+    months = None
+    days = None
+    weekdays = None
+    month_starts = None  # (year - starting_year, month - 1) -> Gregorian ordinal of day 1
+
+    @staticmethod
+    def initialize():
+        starts = np.array(LookupTableConverter.years_starting_jdn, dtype=np.int64) - JalaliTable.jdn_offset
+        days_to_month = np.array(PersianDate.days_to_month, dtype=np.int64)
+
+        ordinals = np.arange(starts[0], starts[-1], dtype=np.int64)
+        year_idx = np.searchsorted(starts, ordinals, side='right') - 1
+        day_of_year = ordinals - starts[year_idx]
+        month = np.searchsorted(days_to_month, day_of_year, side='right')
+
+        JalaliTable.first_ordinal = int(starts[0])
+        JalaliTable.last_ordinal = int(starts[-1]) - 1
+        JalaliTable.years = (year_idx + LookupTableConverter.starting_year).astype(np.int16)
+        JalaliTable.months = month.astype(np.int8)
+        JalaliTable.days = (day_of_year - days_to_month[month - 1] + 1).astype(np.int8)
+        JalaliTable.weekdays = ((ordinals + 6) % 7).astype(np.int8)
+        JalaliTable.month_starts = starts[:-1, np.newaxis] + days_to_month[np.newaxis, :12]
+
+    @staticmethod
+    def from_gregorian(value: date):
+        """
+        Returns (year, month, day) of a Gregorian date.
+        """
+        i = value.toordinal() - JalaliTable.first_ordinal
+        if 0 <= i <= JalaliTable.last_ordinal - JalaliTable.first_ordinal:
+            return int(JalaliTable.years[i]), int(JalaliTable.months[i]), int(JalaliTable.days[i])
+        p = PersianDate(jdn=value.toordinal() + JalaliTable.jdn_offset)
+        return p.year, p.month, p.day_of_month
+
+    @staticmethod
+    def from_ordinals(ordinals):
+        """
+        Vectorized conversion of Gregorian ordinals.
+        Returns (years, months, days, weekdays) arrays; raises ValueError outside the table.
+        """
+        i = np.asarray(ordinals, dtype=np.int64) - JalaliTable.first_ordinal
+        if i.size and (i.min() < 0 or i.max() > JalaliTable.last_ordinal - JalaliTable.first_ordinal):
+            raise ValueError("date outside the Jalali lookup table")
+        return JalaliTable.years[i], JalaliTable.months[i], JalaliTable.days[i], JalaliTable.weekdays[i]
+
+    @staticmethod
+    def from_dates(dates):
+        """
+        Vectorized conversion of a sequence of Gregorian dates (see from_ordinals).
+        """
+        return JalaliTable.from_ordinals([d.toordinal() for d in dates])
+
+    @staticmethod
+    def to_gregorian(year: int, month: int, day: int) -> date:
+        """
+        Gregorian date of a Jalali year/month/day.
+        """
+        yi = year - LookupTableConverter.starting_year
+        if 0 <= yi < len(JalaliTable.month_starts):
+            return date.fromordinal(int(JalaliTable.month_starts[yi, month - 1]) + day - 1)
+        return date.fromordinal(PersianDate(year, month, day).to_jdn() - JalaliTable.jdn_offset)
+
+    @staticmethod
+    def month_bounds(year: int, month: int):
+        """
+        Returns (first, last) Gregorian dates of a Jalali month.
+        """
+        first = JalaliTable.to_gregorian(year, month, 1)
+        if month == 12:
+            nxt = JalaliTable.to_gregorian(year + 1, 1, 1)
+        else:
+            nxt = JalaliTable.to_gregorian(year, month + 1, 1)
+        return first, date.fromordinal(nxt.toordinal() - 1)
+
+    @staticmethod
+    def format(value: date, sep='/'):
+        """
+        'YYYY/MM/DD' string of a Gregorian date.
+        """
+        y, m, d = JalaliTable.from_gregorian(value)
+        return f"{y:04d}{sep}{m:02d}{sep}{d:02d}"
+
+
+# Build the day table once
+JalaliTable.initialize()
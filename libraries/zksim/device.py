@@ -0,0 +1,320 @@
+# libraries/zksim/device.py
+"""
+In-memory ZKTeco terminal.
+
+SimulatedDevice holds the users, fingerprint templates and attendance log of
+one terminal; Connection answers the commands of one client session against
+it. Both are transport-agnostic: Connection.handle() takes a bare request
+packet and returns the bare reply packets, the server frames and sends them.
+"""
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from struct import calcsize, pack, unpack
+
+from libraries.zksim import protocol as p
+
+USER_SIZE = calcsize(p.USER_FORMAT)
+USER_SIZE_ZK6 = calcsize(p.USER_FORMAT_ZK6)
+UPLOAD_USER_SIZE = calcsize(p.UPLOAD_USER_FORMAT)
+UPLOAD_USER_SIZE_ZK6 = calcsize(p.UPLOAD_USER_FORMAT_ZK6)
+UPLOAD_TABLE_SIZE = calcsize(p.UPLOAD_TABLE_FORMAT)
+
+TEMPLATE_SIZE = (400, 700)  # bytes of a generated fingerprint template
+
+
+@dataclass
+class User:
+    uid: int
+    user_id: str
+    name: str = ''
+    privilege: int = 0
+    password: str = ''
+    card: int = 0
+    group_id: str = ''
+
+
+class SimulatedDevice:
+    """
+    State of one terminal.
+
+    users/templates/logs are generated from `seed`, so devices built with the
+    same seed enroll the same people; `log_seed` varies the punches per device.
+    """
+
+    def __init__(self, serial, users=0, templates=0, logs=0, first_user_id=1, com_key=0,
+                 seed=0, log_seed=None, log_days=30, users_cap=10000, fingers_cap=10000, rec_cap=200000):
+        self.serial = serial
+        self.com_key = com_key
+        self.users_cap = users_cap
+        self.fingers_cap = fingers_cap
+        self.rec_cap = rec_cap
+        self.clock_offset = timedelta()  # device clock minus host clock
+        self.users = {}  # uid → User
+        self.templates = {}  # (uid, fid) → template bytes
+        self.logs = []  # (uid, user_id, status, timestamp, punch), oldest first
+
+        rng = random.Random(seed)
+        for i in range(users):
+            uid = i + 1
+            self.users[uid] = User(uid=uid, user_id=str(first_user_id + i), card=rng.randrange(10**6, 10**8))
+            for fid in range(templates):
+                self.templates[(uid, fid)] = rng.randbytes(rng.randint(*TEMPLATE_SIZE))
+
+        rng = random.Random(seed if log_seed is None else log_seed)
+        start = datetime.now() - timedelta(days=log_days)
+        span = int(timedelta(days=log_days).total_seconds())
+        stamps = sorted(start + timedelta(seconds=rng.randrange(span)) for _ in range(logs if users else 0))
+        uids = list(self.users)
+        for ts in stamps:
+            self.punch(rng.choice(uids), ts, punch=rng.randint(0, 1))
+
+    def now(self):
+        return datetime.now() + self.clock_offset
+
+    def punch(self, uid, timestamp=None, status=1, punch=0):
+        """
+        Record an attendance punch (status 1 = fingerprint, punch 0 = check-in).
+        """
+        if len(self.logs) >= self.rec_cap:
+            return
+        user = self.users.get(uid)
+        user_id = user.user_id if user else str(uid)
+        self.logs.append((uid, user_id, status, (timestamp or self.now()).replace(microsecond=0), punch))
+
+    def random_punch(self, rng=random):
+        if self.users:
+            self.punch(rng.choice(list(self.users)), punch=rng.randint(0, 1))
+
+    # ---- stored data ------------------------------------------------------------------
+
+    def set_user(self, user):
+        for uid in [uid for uid, u in self.users.items() if u.user_id == user.user_id and uid != user.uid]:
+            self.delete_user(uid)
+        self.users[user.uid] = user
+
+    def delete_user(self, uid):
+        self.users.pop(uid, None)
+        for key in [key for key in self.templates if key[0] == uid]:
+            del self.templates[key]
+
+    def uid_of(self, user_id):
+        for uid, user in self.users.items():
+            if user.user_id == user_id:
+                return uid
+        return None
+
+    def free_sizes(self):
+        users, fingers, records = len(self.users), len(self.templates), len(self.logs)
+        cards = sum(1 for u in self.users.values() if u.card)
+        fields = [0] * 20
+        fields[4], fields[6], fields[8], fields[12] = users, fingers, records, cards
+        fields[14], fields[15], fields[16] = self.fingers_cap, self.users_cap, self.rec_cap
+        fields[17], fields[18], fields[19] = self.fingers_cap - fingers, self.users_cap - users, self.rec_cap - records
+        return pack('<20i', *fields) + pack('<3i', 0, 0, 0)  # no faces
+
+    def user_table(self):
+        data = b''.join(
+            pack(p.USER_FORMAT, u.uid, u.privilege, u.password.encode(), u.name.encode(), u.card,
+                 u.group_id.encode(), u.user_id.encode())
+            for u in self.users.values()
+        )
+        return pack('<I', len(data)) + data
+
+    def template_table(self):
+        data = b''.join(
+            pack('<HHbb', len(tpl) + 6, uid, fid, 1) + tpl
+            for (uid, fid), tpl in sorted(self.templates.items())
+        )
+        return pack('<i', len(data)) + data
+
+    def attlog_table(self):
+        data = b''.join(
+            pack(p.ATTLOG_FORMAT, uid, user_id.encode(), status, pack('<I', p.encode_time(ts)), punch)
+            for uid, user_id, status, ts, punch in self.logs
+        )
+        return pack('<I', len(data)) + data
+
+    def save_user_templates(self, buffer):
+        """
+        Apply a CMD_SAVE_USERTEMPS upload: users, then their templates.
+        """
+        user_len, table_len, finger_len = unpack('<III', buffer[:12])
+        users = buffer[12:12 + user_len]
+        table = buffer[12 + user_len:12 + user_len + table_len]
+        fingers = buffer[12 + user_len + table_len:12 + user_len + table_len + finger_len]
+
+        if user_len % UPLOAD_USER_SIZE == 0:
+            for i in range(0, user_len, UPLOAD_USER_SIZE):
+                _tag, uid, privilege, password, name, card, _valid, group_id, user_id = unpack(
+                    p.UPLOAD_USER_FORMAT, users[i:i + UPLOAD_USER_SIZE])
+                self.set_user(User(uid, p.cstr(user_id), p.cstr(name), privilege, p.cstr(password), card, p.cstr(group_id)))
+        else:
+            for i in range(0, user_len, UPLOAD_USER_SIZE_ZK6):
+                _tag, uid, privilege, password, name, card, group_id, _tz, user_id = unpack(
+                    p.UPLOAD_USER_FORMAT_ZK6, users[i:i + UPLOAD_USER_SIZE_ZK6])
+                self.set_user(User(uid, str(user_id), p.cstr(name), privilege, p.cstr(password), card, str(group_id)))
+
+        for i in range(0, table_len, UPLOAD_TABLE_SIZE):
+            _tag, uid, fid, start = unpack(p.UPLOAD_TABLE_FORMAT, table[i:i + UPLOAD_TABLE_SIZE])
+            (size,) = unpack('<H', fingers[start:start + 2])
+            self.templates[(uid, fid - 0x10)] = fingers[start + 2:start + 2 + size]
+
+
+class Connection:
+    """
+    One client session on a SimulatedDevice.
+    """
+
+    def __init__(self, device, tcp=True, session_id=None):
+        self.device = device
+        self.tcp = tcp
+        self.session_id = session_id or random.randrange(1, p.USHRT_MAX)
+        self.authenticated = False
+        self.buffer = b''  # prepared by CMD_PREPARE_BUFFER for CMD_READ_BUFFER
+        self.upload = None  # bytearray filled by CMD_DATA after CMD_PREPARE_DATA
+
+    def handle(self, packet):
+        """
+        Returns: the reply packets of one request packet.
+        """
+        command, _session, reply_id, data = p.parse_packet(packet)
+        replies = []
+
+        def reply(code, payload=b''):
+            replies.append(p.make_packet(code, self.session_id, reply_id, payload))
+
+        if command == p.CMD_CONNECT:
+            self.authenticated = not self.device.com_key
+            reply(p.CMD_ACK_OK if self.authenticated else p.CMD_ACK_UNAUTH)
+        elif command == p.CMD_AUTH:
+            self.authenticated = data[:4] == p.make_commkey(self.device.com_key, self.session_id)
+            reply(p.CMD_ACK_OK if self.authenticated else p.CMD_ACK_UNAUTH)
+        elif not self.authenticated:
+            reply(p.CMD_ACK_UNAUTH)
+        else:
+            self._dispatch(command, data, reply)
+        return replies
+
+    def _dispatch(self, command, data, reply):
+        device = self.device
+        if command in (p.CMD_EXIT, p.CMD_ENABLEDEVICE, p.CMD_DISABLEDEVICE, p.CMD_REFRESHDATA,
+                       p.CMD_REFRESHOPTION, p.CMD_OPTIONS_WRQ, p.CMD_RESTART):
+            reply(p.CMD_ACK_OK)
+        elif command == p.CMD_GET_FREE_SIZES:
+            reply(p.CMD_ACK_OK, device.free_sizes())
+        elif command == p.CMD_GET_TIME:
+            reply(p.CMD_ACK_OK, pack('<I', p.encode_time(device.now())))
+        elif command == p.CMD_SET_TIME:
+            device.clock_offset = p.decode_time(unpack('<I', data[:4])[0]) - datetime.now().replace(microsecond=0)
+            reply(p.CMD_ACK_OK)
+        elif command == p.CMD_GET_VERSION:
+            reply(p.CMD_ACK_OK, b'Ver 6.60 Sim\x00')
+        elif command == p.CMD_GET_PINWIDTH:
+            reply(p.CMD_ACK_OK, b'\x09\x00')
+        elif command == p.CMD_OPTIONS_RRQ:
+            reply(p.CMD_ACK_OK, self._option(p.cstr(data)))
+
+        # buffered reads
+        elif command == p.CMD_PREPARE_BUFFER:
+            _one, what, fct, _ext = unpack('<bhii', data[:11])
+            if what == p.CMD_USERTEMP_RRQ and fct == p.FCT_USER:
+                self.buffer = device.user_table()
+            elif what == p.CMD_DB_RRQ and fct == p.FCT_FINGERTMP:
+                self.buffer = device.template_table()
+            elif what == p.CMD_ATTLOG_RRQ:
+                self.buffer = device.attlog_table()
+            else:
+                reply(p.CMD_ACK_ERROR)
+                return
+            if len(self.buffer) <= p.DATA_CHUNK - 8:
+                reply(p.CMD_DATA, self.buffer)
+            else:
+                reply(p.CMD_ACK_OK, pack('<BI', 0, len(self.buffer)) + bytes(4))
+        elif command == p.CMD_READ_BUFFER:
+            start, size = unpack('<ii', data[:8])
+            self._send_data(self.buffer[start:start + size], reply)
+        elif command == p.CMD_FREE_DATA:
+            self.buffer, self.upload = b'', None
+            reply(p.CMD_ACK_OK)
+        elif command == p.CMD_GET_USERTEMP:
+            uid, fid = unpack('<hb', data[:3])
+            template = device.templates.get((uid, fid))
+            if template is None:
+                reply(p.CMD_ACK_ERROR)
+            else:
+                self._send_data(template + b'\x00', reply)
+
+        # writes
+        elif command == p.CMD_PREPARE_DATA:
+            self.upload = bytearray()
+            reply(p.CMD_ACK_OK)
+        elif command == p.CMD_DATA:
+            if self.upload is None:
+                reply(p.CMD_ACK_ERROR)
+                return
+            self.upload += data
+            reply(p.CMD_ACK_OK)
+        elif command == p.CMD_SAVE_USERTEMPS:
+            try:
+                device.save_user_templates(bytes(self.upload or b''))
+            except Exception:
+                reply(p.CMD_ACK_ERROR)
+                return
+            self.upload = None
+            reply(p.CMD_ACK_OK)
+        elif command == p.CMD_USER_WRQ:
+            self._write_user(data)
+            reply(p.CMD_ACK_OK)
+        elif command == p.CMD_DELETE_USER:
+            device.delete_user(unpack('<h', data[:2])[0])
+            reply(p.CMD_ACK_OK)
+        elif command == p.CMD_DELETE_USERTEMP:
+            uid, fid = unpack('<hb', data[:3])
+            reply(p.CMD_ACK_OK if device.templates.pop((uid, fid), None) is not None else p.CMD_ACK_ERROR)
+        elif command == p.CMD_DEL_USER_TEMP:
+            user_id, fid = unpack('<24sB', data[:25])
+            uid = device.uid_of(p.cstr(user_id))
+            reply(p.CMD_ACK_OK if device.templates.pop((uid, fid), None) is not None else p.CMD_ACK_ERROR)
+        elif command == p.CMD_CLEAR_ATTLOG:
+            device.logs.clear()
+            reply(p.CMD_ACK_OK)
+        elif command == p.CMD_CLEAR_DATA:
+            device.users.clear()
+            device.templates.clear()
+            device.logs.clear()
+            reply(p.CMD_ACK_OK)
+        else:
+            reply(p.CMD_ACK_UNKNOWN)
+
+    def _send_data(self, data, reply):
+        if self.tcp:
+            # one CMD_DATA packet; the client reads it to the length in the TCP top
+            reply(p.CMD_DATA, data)
+            return
+        # UDP: announce the size, then datagrams of DATA_CHUNK bytes and a closing ACK
+        reply(p.CMD_PREPARE_DATA, pack('<I', len(data)))
+        for i in range(0, len(data), p.DATA_CHUNK):
+            reply(p.CMD_DATA, data[i:i + p.DATA_CHUNK])
+        reply(p.CMD_ACK_OK)
+
+    def _write_user(self, data):
+        if len(data) >= USER_SIZE:
+            uid, privilege, password, name, card, group_id, user_id = unpack(p.USER_FORMAT, data[:USER_SIZE])
+            user = User(uid, p.cstr(user_id), p.cstr(name), privilege, p.cstr(password), card, p.cstr(group_id))
+        else:
+            uid, privilege, password, name, card, group_id, _tz, user_id = unpack(
+                p.USER_FORMAT_ZK6, data[:USER_SIZE_ZK6].ljust(USER_SIZE_ZK6, b'\x00'))
+            user = User(uid, str(user_id), p.cstr(name), privilege, p.cstr(password), card, str(group_id))
+        self.device.set_user(user)
+
+    def _option(self, key):
+        values = {
+            '~SerialNumber': self.device.serial,
+            '~Platform': 'ZMM220_TFT',
+            '~DeviceName': 'ZKSim',
+            '~ZKFPVersion': '10',
+            '~ZKFaceVersion': '0',
+            '~OS': '1',
+        }
+        return f"{key}={values.get(key, '')}\x00".encode()
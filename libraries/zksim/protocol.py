@@ -0,0 +1,153 @@
+# libraries/zksim/protocol.py
+"""
+Wire format of the ZKTeco standalone SDK protocol (port 4370), as spoken by
+pyzk-based clients such as vendors.build.manager.
+
+Every packet starts with an 8-byte header (command, checksum, session id,
+reply id). Over TCP the packet is prefixed with an 8-byte top carrying the
+two magic words and the packet length; over UDP it is sent bare.
+"""
+from datetime import datetime
+from struct import pack, unpack
+
+USHRT_MAX = 65535
+
+# commands
+CMD_DB_RRQ = 7
+CMD_USER_WRQ = 8
+CMD_USERTEMP_RRQ = 9
+CMD_OPTIONS_RRQ = 11
+CMD_OPTIONS_WRQ = 12
+CMD_ATTLOG_RRQ = 13
+CMD_CLEAR_DATA = 14
+CMD_CLEAR_ATTLOG = 15
+CMD_DELETE_USER = 18
+CMD_DELETE_USERTEMP = 19
+CMD_GET_FREE_SIZES = 50
+CMD_GET_PINWIDTH = 69
+CMD_GET_USERTEMP = 88
+CMD_SAVE_USERTEMPS = 110
+CMD_DEL_USER_TEMP = 134
+CMD_GET_TIME = 201
+CMD_SET_TIME = 202
+CMD_CONNECT = 1000
+CMD_EXIT = 1001
+CMD_ENABLEDEVICE = 1002
+CMD_DISABLEDEVICE = 1003
+CMD_RESTART = 1004
+CMD_REFRESHDATA = 1013
+CMD_REFRESHOPTION = 1014
+CMD_GET_VERSION = 1100
+CMD_AUTH = 1102
+CMD_PREPARE_DATA = 1500
+CMD_DATA = 1501
+CMD_FREE_DATA = 1502
+CMD_PREPARE_BUFFER = 1503
+CMD_READ_BUFFER = 1504
+
+# replies
+CMD_ACK_OK = 2000
+CMD_ACK_ERROR = 2001
+CMD_ACK_UNAUTH = 2005
+CMD_ACK_UNKNOWN = 0xFFFF
+
+# read_with_buffer function codes
+FCT_FINGERTMP = 2
+FCT_USER = 5
+
+MACHINE_PREPARE_DATA_1 = 0x5050
+MACHINE_PREPARE_DATA_2 = 0x7D82
+
+# record layouts
+USER_FORMAT = '<HB8s24sIx7sx24s'  # 72 bytes: uid, privilege, password, name, card, group, user_id
+USER_FORMAT_ZK6 = '<HB5s8sIxBhI'  # 28 bytes: uid, privilege, password, name, card, group, timezone, user_id
+ATTLOG_FORMAT = '<H24sB4sB8x'  # 40 bytes: uid, user_id, status, timestamp, punch
+UPLOAD_USER_FORMAT = '<BHB8s24sIB7sx24s'  # 73 bytes (the 72-byte record behind a 0x02 tag)
+UPLOAD_USER_FORMAT_ZK6 = '<BHB5s8sIxBhI'  # 29 bytes
+UPLOAD_TABLE_FORMAT = '<bHbI'  # 8 bytes: tag, uid, 0x10 + fid, offset into the template block
+
+DATA_CHUNK = 1024  # payload of a CMD_DATA packet in a chunked transfer
+
+
+def checksum(packet):
+    """
+    Packet checksum (zkemsdk.c): one's complement of the 16-bit word sum.
+    """
+    if len(packet) % 2:
+        packet += b'\x00'
+    total = 0
+    for (word,) in _words(packet):
+        total += word
+        if total > USHRT_MAX:
+            total -= USHRT_MAX
+    total = ~total
+    while total < 0:
+        total += USHRT_MAX
+    return total
+
+
+def _words(packet):
+    for i in range(0, len(packet), 2):
+        yield unpack('<H', packet[i:i + 2])
+
+
+def make_packet(command, session_id, reply_id, data=b''):
+    head = pack('<4H', command, 0, session_id, reply_id)
+    return pack('<4H', command, checksum(head + data), session_id, reply_id) + data
+
+
+def parse_packet(packet):
+    """
+    Returns: (command, session id, reply id, data) of a bare packet.
+    """
+    command, _checksum, session_id, reply_id = unpack('<4H', packet[:8])
+    return command, session_id, reply_id, packet[8:]
+
+
+def tcp_top(packet):
+    return pack('<HHI', MACHINE_PREPARE_DATA_1, MACHINE_PREPARE_DATA_2, len(packet)) + packet
+
+
+def parse_tcp_top(top):
+    """
+    Returns: the length of the packet behind an 8-byte TCP top, or None if the magic is wrong.
+    """
+    magic1, magic2, length = unpack('<HHI', top)
+    if (magic1, magic2) != (MACHINE_PREPARE_DATA_1, MACHINE_PREPARE_DATA_2):
+        return None
+    return length
+
+
+def encode_time(t):
+    return (
+        ((t.year % 100) * 12 * 31 + (t.month - 1) * 31 + t.day - 1) * 86400
+        + (t.hour * 60 + t.minute) * 60 + t.second
+    )
+
+
+def decode_time(value):
+    second, value = value % 60, value // 60
+    minute, value = value % 60, value // 60
+    hour, value = value % 24, value // 24
+    day, value = value % 31 + 1, value // 31
+    month, value = value % 12 + 1, value // 12
+    return datetime(value + 2000, month, day, hour, minute, second)
+
+
+def make_commkey(key, session_id, ticks=50):
+    """
+    Scrambled communication key a client sends with CMD_AUTH (commpro.c MakeKey).
+    """
+    k = 0
+    for i in range(32):
+        k = (k << 1 | 1) if key & (1 << i) else k << 1
+    k += session_id
+    b = pack('<I', k & 0xFFFFFFFF)
+    b = bytes([b[0] ^ ord('Z'), b[1] ^ ord('K'), b[2] ^ ord('S'), b[3] ^ ord('O')])
+    b = b[2:] + b[:2]
+    ticks &= 0xFF
+    return bytes([b[0] ^ ticks, b[1] ^ ticks, ticks, b[3] ^ ticks])
+
+
+def cstr(value, encoding='utf-8'):
+    return value.split(b'\x00')[0].decode(encoding, errors='ignore')
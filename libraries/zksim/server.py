@@ -0,0 +1,174 @@
+# libraries/zksim/server.py
+"""
+asyncio servers exposing SimulatedDevice terminals on local ports.
+
+Each DeviceServer listens on TCP and UDP on the same port, like a real
+terminal. Network conditions are injected per server:
+  - latency/jitter: seconds added before the replies to every request;
+  - loss: probability that a request goes unanswered (the client times out);
+  - silent: the port accepts connections but never answers;
+  - offline: nothing listens on the port (connection refused).
+"""
+import asyncio
+import random
+
+from libraries.zksim import protocol as p
+from libraries.zksim.device import Connection, SimulatedDevice
+
+
+class DeviceServer:
+    """
+    One simulated terminal on host:port.
+    """
+
+    def __init__(self, device, host='127.0.0.1', port=4370, latency=0.0, jitter=0.0, loss=0.0,
+                 silent=False, offline=False, seed=None):
+        self.device = device
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.silent = silent
+        self.offline = offline
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.dropped = 0
+        self._tcp = None
+        self._udp = None
+        self._clients = set()  # tasks serving open TCP connections
+
+    async def start(self):
+        if self.offline:
+            return
+        loop = asyncio.get_running_loop()
+        self._tcp = await asyncio.start_server(self._serve_tcp, self.host, self.port)
+        self._udp, _ = await loop.create_datagram_endpoint(
+            lambda: _UdpProtocol(self), local_addr=(self.host, self.port))
+
+    async def stop(self):
+        for task in list(self._clients):
+            task.cancel()
+        if self._tcp is not None:
+            self._tcp.close()
+            await self._tcp.wait_closed()
+            self._tcp = None
+        if self._udp is not None:
+            self._udp.close()
+            self._udp = None
+
+    def _answer(self, connection, packet):
+        """
+        Returns: (delay, reply packets), or None when the request is dropped.
+        """
+        self.requests += 1
+        if self.silent:
+            return None
+        if self.loss and self.rng.random() < self.loss:
+            self.dropped += 1
+            return None
+        delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        return delay, connection.handle(packet)
+
+    async def _serve_tcp(self, reader, writer):
+        connection = Connection(self.device, tcp=True)
+        task = asyncio.current_task()
+        self._clients.add(task)
+        try:
+            while True:
+                length = p.parse_tcp_top(await reader.readexactly(8))
+                if length is None:
+                    break
+                packet = await reader.readexactly(length)
+                answer = self._answer(connection, packet)
+                if answer is None:
+                    continue
+                delay, replies = answer
+                if delay:
+                    await asyncio.sleep(delay)
+                writer.write(b''.join(p.tcp_top(reply) for reply in replies))
+                await writer.drain()
+                if p.parse_packet(packet)[0] == p.CMD_EXIT:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # client went away
+        finally:
+            self._clients.discard(task)
+            writer.close()
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, server):
+        self.server = server
+        self.connections = {}  # client address → Connection
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        connection = self.connections.get(addr)
+        if connection is None or p.parse_packet(data)[0] == p.CMD_CONNECT:
+            connection = self.connections[addr] = Connection(self.server.device, tcp=False)
+        answer = self.server._answer(connection, data)
+        if answer is None:
+            return
+        delay, replies = answer
+        asyncio.get_running_loop().call_later(delay, self._send, replies, addr)
+        if p.parse_packet(data)[0] == p.CMD_EXIT:
+            self.connections.pop(addr, None)
+
+    def _send(self, replies, addr):
+        if self.transport is not None and not self.transport.is_closing():
+            for reply in replies:
+                self.transport.sendto(reply, addr)
+
+
+def build_fleet(count, host='127.0.0.1', base_port=4370, users=0, templates=0, logs=0, first_user_id=1,
+                com_key=0, latency=0.0, jitter=0.0, loss=0.0, offline=0, silent=0, seed=0):
+    """
+    `count` servers on consecutive ports. All devices enroll the same users;
+    the last `offline` devices do not listen and the `silent` ones before
+    them never answer.
+    Returns: list of DeviceServer.
+    """
+    servers = []
+    for i in range(count):
+        device = SimulatedDevice(
+            serial=f'SIM{i + 1:05d}', users=users, templates=templates, logs=logs,
+            first_user_id=first_user_id, com_key=com_key, seed=seed, log_seed=seed + i + 1,
+        )
+        from_end = count - i
+        servers.append(DeviceServer(
+            device, host=host, port=base_port + i, latency=latency, jitter=jitter, loss=loss,
+            offline=from_end <= offline, silent=offline < from_end <= offline + silent, seed=seed + i,
+        ))
+    return servers
+
+
+async def serve_fleet(servers, punch_rate=0.0, stop=None):
+    """
+    Run the servers until `stop` (an asyncio.Event) is set, adding
+    `punch_rate` random punches per minute to every listening device.
+    """
+    stop = stop or asyncio.Event()
+    for server in servers:
+        await server.start()
+    rng = random.Random()
+    try:
+        due = 0.0
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+            due += punch_rate / 60
+            while due >= 1:
+                for server in servers:
+                    if not server.offline:
+                        server.device.random_punch(rng)
+                due -= 1
+    finally:
+        for server in servers:
+            await server.stop()
@@ -7,16 +7,23 @@ from django import template
 register = template.Library()
 
 
+def _unread_count(request):
+    # both tags render on every page: count once per request
+    if not hasattr(request, "_unread_notifications"):
+        request._unread_notifications = request.user.notifications.filter(unread=True).count()
+    return request._unread_notifications
+
+
 @register.simple_tag(takes_context=True)
 def unread_count(context):
-    return context["request"].user.notifications.filter(unread=True).count()
+    return _unread_count(context["request"])
 
 
 @register.inclusion_tag("notifications/dropdown.html", takes_context=True)
 def notifications_dropdown(context, limit=5):
     user = context["request"].user
     qs   = user.notifications.all()[:limit]
-    unread = user.notifications.filter(unread=True).count()
+    unread = _unread_count(context["request"])
 
     # Use plain Python dates to avoid naive‐datetime / timezone conflicts
     today = datetime.date.today()